@@ -28,6 +28,19 @@ cd milsymbol
 ./combine.sh
 cd ..
 
+# The checked-in previews are packed unless RENDER_PREVIEWS is set, then
+# they are rendered with the bundled milsymbol into preview_cache, which
+# needs node and rsvg-convert
+PREVIEW_DIR="img/preview"
+if [ -n "$RENDER_PREVIEWS" ]; then
+    echo "Rendering preview icons..."
+    python3 tools/render_previews.py --output preview_cache
+    PREVIEW_DIR="preview_cache"
+fi
+
+echo "Compiling symbol catalog..."
+(cd source && python3 -m data.catalog)
+
 # Create temporary directory
 mkdir -p "$TEMP_DIR"
 
@@ -37,6 +50,7 @@ echo "Copying files to temporary directory..."
 rsync -av \
     --exclude="README.md" \
     --exclude="build.sh" \
+    --exclude="tools/" \
     --exclude="milsymbol/combine.sh" \
     --exclude="milsymbol/milsymbol-3.0.3.js" \
     --exclude="milsymbol/paths-reinforced.js" \
@@ -44,6 +58,8 @@ rsync -av \
     --exclude="milsymbol/stack-extension.mjs" \
     --exclude="milsymbol/country-flags.js" \
     --exclude="milsymbol/convert-to-unicode.py" \
+    --exclude="img/preview/" \
+    --exclude="preview_cache/" \
     --exclude=".*" \
     --exclude="*~" \
     --exclude="__pycache__" \
@@ -53,6 +69,9 @@ rsync -av \
     --exclude="*.oxt" \
     . "$TEMP_DIR/"
 
+echo "Packing preview icons..."
+python3 tools/pack_previews.py "$PREVIEW_DIR" "$TEMP_DIR/img/preview.zip"
+
 echo "Creating .oxt archive..."
 
 # Create the .oxt file (which is just a zip file with different extension)
@@ -45,18 +45,41 @@ parts.splice(6, 0, sigintReinforced); // Insert sigintReinforced in the begining
 parts.unshift(stack); // Insert stack at the begining
 ms.setSymbolParts(parts);
 
-var options = {};
-for (var i = 1; i < ARGUMENTS.length; ++i) {
-    var name = ARGUMENTS[i].Name;
-    var value = String(ARGUMENTS[i].Value);
-
+function toOptionValue(name, value) {
+    value = String(value);
     if (String(name) == "fill") {
-        value = String(value) === "true";
+        return value === "true";
     }
+    return value;
+}
+
+function renderSymbol(sidc, options) {
+    return new ms.Symbol(String(sidc), options).asSVG();
+}
 
-    options[name] = value;
+if (String(ARGUMENTS[0]) == "batch") {
+    // ARGUMENTS[1] is a JSON list of [sidc, {name: value}], the result is a
+    // JSON list of SVGs, so many symbols are rendered with one invocation
+    var requests = JSON.parse(String(ARGUMENTS[1]));
+    var results = [];
+    for (var i = 0; i < requests.length; ++i) {
+        var batchOptions = {};
+        for (var key in requests[i][1]) {
+            batchOptions[key] = toOptionValue(key, requests[i][1][key]);
+        }
+        results.push(String(renderSymbol(requests[i][0], batchOptions)));
+    }
+    JSON.stringify(results);
+} else {
+    var options = {};
+    for (var i = 1; i < ARGUMENTS.length; ++i) {
+        options[ARGUMENTS[i].Name] = toOptionValue(
+            ARGUMENTS[i].Name,
+            ARGUMENTS[i].Value
+        );
+    }
+    renderSymbol(ARGUMENTS[0], options);
 }
-new ms.Symbol(String(ARGUMENTS[0]), options).asSVG();
 EOF
 
 echo "Successfully created $OUTPUT_FILE"
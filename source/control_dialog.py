@@ -8,7 +8,6 @@
 
 import json
 import os
-import shutil
 
 import uno
 import unohelper
@@ -26,6 +25,7 @@ from com.sun.star.view.SelectionType import (
     MULTI as SELECTION_TYPE_MULTI,
 )
 from com.sun.star.view import XSelectionChangeListener
+from com.sun.star.awt.tree import XTreeExpansionListener
 from com.sun.star.datatransfer.dnd import XDragGestureListener, XDropTargetListener
 from com.sun.star.datatransfer.dnd import XDragSourceListener
 from com.sun.star.datatransfer.dnd.DNDConstants import ACTION_MOVE
@@ -35,12 +35,15 @@ from com.sun.star.document import XUndoAction
 from utils import (
     extractGraphicAttributes,
     generate_icon_svg,
+    get_icon_render_args,
     insertGraphicAttributes,
     createMilSymbolScriptInstance,
 )
-from unohelper import systemPathToFileUrl
 from translator import translate
-import tempfile
+from selection_coalescer import SelectionCoalescer
+from symbol_labels import SymbolLabelIndex
+from icon_store import IconStore
+from undo_log import UndoLog, apply_attribute_diff, diff_attributes, estimate_size
 
 
 class ControlDlgHandler(
@@ -48,21 +51,27 @@ class ControlDlgHandler(
 ):
     buttons = ["addShape", "removeShape", "editShape"]
 
+    # Levels of the ORBAT whose children are created when the tree is shown,
+    # deeper levels are created when the user expands them
+    DEFAULT_AUTO_EXPAND_DEPTH = 3
+
     def __init__(self, dialog, x_context, model):
         self.dialog = dialog
         self.x_context = x_context
         self.tree_control = None
         self._populate_tree_on_show = True
         self._parent_before_add = None
-        self._temp_dir: str | None = None
         self._clipboard = None
-        self._node_to_tree_item_map = {}
+        self._auto_expand_depth = self.DEFAULT_AUTO_EXPAND_DEPTH
+        self._reset_tree_nodes()
         self._syncing_selection = False
         self._syncing_from_tree = False
         self._is_dragging = False
         self._unit_str = translate(x_context, "ControlDialog.Unit")
         self._placeholder_str = translate(x_context, "ControlDialog.Placeholder")
-        self._undo_actions = []  # Track all undo actions for cleanup on document close
+        self._label_index = None
+        # Track all undo actions for cleanup on document close, within a memory budget
+        self._undo_log = UndoLog(self._load_undo_memory_limit())
         self.script = createMilSymbolScriptInstance(x_context, model)
 
     def callHandlerMethod(self, dialog, eventObject, methodName):
@@ -96,8 +105,7 @@ class ControlDlgHandler(
                         undo_action = AddShapeUndoAction(
                             self, added_shape, parent_tree_item
                         )
-                        undo_manager.addUndoAction(undo_action)
-                        self._undo_actions.append(undo_action)
+                        self._undo_log.add(undo_manager, undo_action)
                     except Exception as e:
                         print(f"Failed to register undo action: {e}")
 
@@ -117,7 +125,8 @@ class ControlDlgHandler(
                 return True
 
             original_attributes = extractGraphicAttributes(selected_shape)
-            self.dialog.execute_properties_dialog()
+            with self.get_controller().changing_diagram():
+                self.dialog.execute_properties_dialog()
             edited_attributes = extractGraphicAttributes(selected_shape)
 
             if original_attributes != edited_attributes:
@@ -127,8 +136,7 @@ class ControlDlgHandler(
                         undo_action = EditShapeUndoAction(
                             self, selected_shape, original_attributes, edited_attributes
                         )
-                        undo_manager.addUndoAction(undo_action)
-                        self._undo_actions.append(undo_action)
+                        self._undo_log.add(undo_manager, undo_action)
                     except Exception as e:
                         print(f"Failed to register edit undo action: {e}")
 
@@ -252,8 +260,7 @@ class ControlDlgHandler(
             if selected_node is None or not hasattr(selected_node, "getDisplayValue"):
                 return
 
-            node_name = selected_node.getDisplayValue()
-            target_tree_item = self._node_to_tree_item_map.get(node_name)
+            target_tree_item = self._get_tree_item_for_node(selected_node)
             if target_tree_item is None:
                 return
 
@@ -268,23 +275,18 @@ class ControlDlgHandler(
                 if undo_manager:
                     undo_manager.lock()
 
-                # Paste all clipboard items and track pasted shapes
+                # Paste all clipboard items in one batch and track pasted shapes
                 pasted_shapes = []
                 any_success = False
 
                 try:
-                    for clipboard_item in clipboard_items:
-                        success = diagram.paste_subtree(
-                            target_tree_item, clipboard_item, self.script
-                        )
-                        if success:
-                            any_success = True
-                            # Find the newly added shape for this paste
-                            pasted_shape = self._find_newly_added_shape(
-                                target_tree_item
-                            )
-                            if pasted_shape:
-                                pasted_shapes.append(pasted_shape)
+                    pasted_items = diagram.paste_subtrees(
+                        target_tree_item, clipboard_items, self.script
+                    )
+                    pasted_shapes = [
+                        item.get_rectangle_shape() for item in pasted_items
+                    ]
+                    any_success = bool(pasted_items)
 
                     if any_success:
                         diagram.refresh_diagram()
@@ -304,8 +306,7 @@ class ControlDlgHandler(
                                 target_tree_item,
                                 pasted_shapes,
                             )
-                            undo_manager.addUndoAction(undo_action)
-                            self._undo_actions.append(undo_action)
+                            self._undo_log.add(undo_manager, undo_action)
                         except Exception as e:
                             print(f"Failed to register paste undo action: {e}")
 
@@ -357,10 +358,7 @@ class ControlDlgHandler(
             selection = controller._x_controller.getSelection()
             if selection and selection.getCount() > 0:
                 selected_shape = selection.getByIndex(0)
-                # Find the tree item for this shape
-                for tree_item in self._node_to_tree_item_map.values():
-                    if tree_item.get_rectangle_shape() == selected_shape:
-                        return tree_item
+                return self._get_tree_item_for_shape(selected_shape)
         except Exception as e:
             print(f"Error getting selected tree item: {e}")
         return None
@@ -389,11 +387,9 @@ class ControlDlgHandler(
                 nodes = list(selection)
 
             for node in nodes:
-                if node is not None and hasattr(node, "getDisplayValue"):
-                    node_name = node.getDisplayValue()
-                    tree_item = self._node_to_tree_item_map.get(node_name)
-                    if tree_item is not None:
-                        tree_items.append(tree_item)
+                tree_item = self._get_tree_item_for_node(node)
+                if tree_item is not None:
+                    tree_items.append(tree_item)
 
         except Exception as e:
             print(f"Error getting selected tree items: {e}")
@@ -520,34 +516,40 @@ class ControlDlgHandler(
 
             # Collect data for undo before removal
             undo_manager = self._get_undo_manager()
-            removal_data = []  # List of (serialized_data, parent_tree_item, child_shapes, prev_sibling_shape)
+            # List of (shape_name, serialized_data, parent_name, child_names, prev_sibling_name)
+            removal_data = []
 
             for tree_item in selected_items:
                 parent = tree_item.get_dad()
                 serialized = self._serialize_tree_item_only(tree_item)
 
-                # Get the previous sibling shape (to restore correct position on undo)
-                prev_sibling_shape = None
+                # Get the previous sibling (to restore correct position on undo)
+                prev_sibling_name = None
                 diagram = self.get_controller().get_diagram()
                 if diagram and diagram.get_diagram_tree():
                     prev_sibling = diagram.get_diagram_tree().get_previous_sibling(
                         tree_item
                     )
-                    if prev_sibling:
-                        prev_sibling_shape = prev_sibling.get_rectangle_shape()
+                    prev_sibling_name = get_tree_item_name(prev_sibling)
 
                 # Collect child shapes that will be re-parented during removal
-                child_shapes = []
+                child_names = []
                 child_item = tree_item.get_first_child()
                 while child_item is not None:
-                    child_shape = child_item.get_rectangle_shape()
-                    if child_shape:
-                        child_shapes.append(child_shape)
+                    child_name = get_tree_item_name(child_item)
+                    if child_name:
+                        child_names.append(child_name)
                     child_item = child_item.get_first_sibling()
 
                 if serialized and parent:
                     removal_data.append(
-                        (serialized, parent, child_shapes, prev_sibling_shape)
+                        (
+                            get_tree_item_name(tree_item),
+                            serialized,
+                            get_tree_item_name(parent),
+                            child_names,
+                            prev_sibling_name,
+                        )
                     )
 
             # Remove shapes (order: process items with deeper levels first to avoid
@@ -566,8 +568,7 @@ class ControlDlgHandler(
             if undo_manager and removal_data:
                 try:
                     undo_action = RemoveShapeUndoAction(self, removal_data)
-                    undo_manager.addUndoAction(undo_action)
-                    self._undo_actions.append(undo_action)
+                    self._undo_log.add(undo_manager, undo_action)
                 except Exception as e:
                     print(f"Failed to register undo action: {e}")
 
@@ -709,6 +710,10 @@ class ControlDlgHandler(
             tree_key_handler = TreeKeyHandler(self)
             self.tree_control.addKeyListener(tree_key_handler)
 
+            # Create child nodes when the user expands a node
+            self._tree_expansion_handler = TreeExpansionHandler(self)
+            self.tree_control.addTreeExpansionListener(self._tree_expansion_handler)
+
             # Set up selection listener for bidirectional selection
             self._setup_selection_listener()
             # Enable drag & drop functionality
@@ -748,174 +753,463 @@ class ControlDlgHandler(
                 print("Could not create tree data model")
                 return
 
-            # Create root node with proper name
-            root_node_name = "Root"  # Default fallback
-            # Try to get proper root name if diagram tree is available
-            try:
-                # Get the current diagram
-                controller = self.get_controller()
-                diagram = controller.get_diagram()
+            self._reset_tree_nodes()
+            self._data_model = data_model
+            self._auto_expand_depth = self._load_auto_expand_depth()
 
-                if diagram is None:
-                    print("No diagram available")
-                    return
-                temp_diagram_tree = diagram.get_diagram_tree()
-                if temp_diagram_tree:
-                    temp_root_item = temp_diagram_tree.get_root_item()
-                    if temp_root_item:
-                        root_node_name = self._get_tree_node_display_name(
-                            temp_root_item, 1
-                        )
-            except:
-                pass
+            # Build all nodes before setting the data model, so the tree
+            # control is not notified of every single insertion
+            if not self._update_tree_nodes(diagram):
+                root_node = data_model.createNode("Root", True)
+                data_model.setRoot(root_node)
+                self._add_icon_preview_tree_node(None, root_node)
 
-            root_node = data_model.createNode(root_node_name, True)
-            data_model.setRoot(root_node)
             tree_model = self.tree_control.getModel()
-
-            # Add icon preview before setting data_model
-            diagram_tree = diagram.get_diagram_tree()
-            if diagram_tree is not None:
-                root_item = diagram_tree.get_root_item()
-                if root_item is not None:
-                    shape = root_item.get_rectangle_shape()
-                    root_name = self._get_tree_node_display_name(root_item, 1)
-                    self._add_icon_preview_tree_node(shape, root_name, root_node)
-
             tree_model.setPropertyValue("DataModel", data_model)
 
-            diagram_tree = diagram.get_diagram_tree()
-            if diagram_tree is not None:
-                root_item = diagram_tree.get_root_item()
-                if root_item is not None:
-                    # Get the root name (should match what we used during creation)
-                    root_name = self._get_tree_node_display_name(root_item, 1)
-
-                    # Store root item in mapping for selection
-                    self._node_to_tree_item_map = {}
-                    self._node_to_tree_item_map.clear()
-                    self._node_to_tree_item_map[root_name] = root_item
-
-                    # Populate children of root item
-                    self._populate_tree_children(data_model, root_node, root_item)
-                else:
-                    print("No root item found in diagram tree")
-            else:
-                print("No diagram tree available or invalid structure")
-
-            # Expand all nodes in the tree to show full structure
+            # Expand the levels that were loaded up front
             try:
-                self._expand_all_nodes(root_node)
+                for key in self._pending_expand_keys:
+                    node = self._item_nodes.get(key)
+                    if node is not None:
+                        self.tree_control.expandNode(node)
+                self._pending_expand_keys.clear()
             except:
                 pass
 
         except Exception as e:
             print(f"Error populating tree: {e}")
 
-    def _populate_tree_children(self, data_model, parent_node, tree_item):
-        """Populate children of a tree node from organization chart tree items"""
-        try:
-            if tree_item is None:
-                return
+    def _reset_tree_nodes(self):
+        """Forget the tree nodes of the current data model"""
+        self._data_model = None
+        self._root_key = None
+        # Every node stores the key of its tree item (the shape name) as
+        # DataValue. key <-> tree item and key -> tree node and its state
+        self._tree_items = {}
+        self._item_keys = {}
+        self._item_nodes = {}
+        self._node_names = {}
+        self._node_attributes = {}
+        self._child_keys = {}
+        self._parent_keys = {}
+        self._on_demand_keys = {}
+        # collected entries of the last refresh
+        self._tree_entries = {}
+        # items whose children are materialized
+        self._loaded_keys = set()
+        self._pending_expand_keys = set()
+
+    def _get_tree_item_name(self, tree_item):
+        """Get the name of the shape of tree_item, empty if it has none"""
+        shape = tree_item.get_rectangle_shape()
+        return shape.getName() if shape is not None else ""
 
-            # Add children
-            child_count = 0
-            if tree_item.get_first_child() is not None:
-                child_item = tree_item.get_first_child()
-                child_num = 1
-                while child_item is not None:
-                    child_name = self._get_tree_node_display_name(child_item, child_num)
-                    child_name = self._make_unique_display_name(child_name)
-                    self._populate_tree_node(
-                        data_model, parent_node, child_item, child_name
-                    )
+    def _get_tree_item_key(self, name, parent_key=None, ordinal=0):
+        """Get a key of a tree item that stays the same across refreshes
 
-                    # Move to next sibling
-                    child_item = child_item.get_first_sibling()
-                    child_num += 1
-                    child_count += 1
+        The key is name, the name of the shape of the item. Shapes without
+        a name or with the name of another shape get a key made of the key
+        of their parent, their name and ordinal, the number of preceding
+        siblings with the same name.
+        """
+        if name and name not in self._tree_items:
+            return name
+        return f"{parent_key}/{name}#{ordinal}"
 
-        except Exception as e:
-            print(f"Error populating tree children: {e}")
+    def _collect_tree_items(
+        self, tree_item, key, item_number, entries, parent_key=None, depth=0
+    ):
+        """Collect key -> TreeEntry of tree_item and its loaded descendants
+
+        Entries are in pre-order. The children of items that are not loaded
+        are only collected when they are needed, see _collect_child_items().
+        """
+        shape = tree_item.get_rectangle_shape()
+        attributes = extractGraphicAttributes(shape) if shape is not None else None
+        display_name = self._get_tree_node_display_name(
+            tree_item, item_number, attributes
+        )
+        entry = TreeEntry(tree_item, display_name, attributes, parent_key, depth)
+        entries[key] = entry
+        self._tree_items[key] = tree_item
+        self._item_keys[tree_item] = key
+
+        # New items less than the auto-expand depth deep are loaded when
+        # their node is created
+        if key in self._loaded_keys or depth < self._auto_expand_depth:
+            self._collect_child_items(key, entries)
+        else:
+            entry.has_children = tree_item.get_first_child() is not None
+
+    def _collect_child_items(self, key, entries):
+        """Collect the children of the entry of key, if not collected yet"""
+        entry = entries[key]
+        if entry.children_collected:
+            return
+        entry.children_collected = True
+
+        child_item = entry.tree_item.get_first_child()
+        child_num = 1
+        name_counts = {}
+        while child_item is not None:
+            name = self._get_tree_item_name(child_item)
+            ordinal = name_counts.get(name, 0)
+            name_counts[name] = ordinal + 1
+            child_key = self._get_tree_item_key(name, key, ordinal)
+            entry.child_keys.append(child_key)
+            self._collect_tree_items(
+                child_item, child_key, child_num, entries, key, entry.depth + 1
+            )
+
+            # Move to next sibling
+            child_item = child_item.get_first_sibling()
+            child_num += 1
+        entry.has_children = bool(entry.child_keys)
 
-    def _make_unique_display_name(self, base_name):
-        """Ensure display name is unique by appending suffix if needed"""
-        if not hasattr(self, "_node_to_tree_item_map"):
-            return base_name
+    def _collect_tree_path(self, tree_item):
+        """Collect the children of the ancestors of tree_item down to it
+
+        Returns the key of tree_item, None if it is not in the diagram tree.
+        """
+        path = []
+        item = tree_item
+        while item is not None and item not in self._item_keys:
+            path.append(item)
+            item = item.get_dad()
+        if item is None:
+            return None
+        for item in reversed(path):
+            parent_key = self._item_keys.get(item.get_dad())
+            if parent_key is None:
+                return None
+            self._collect_child_items(parent_key, self._tree_entries)
+        return self._item_keys.get(tree_item)
 
-        if base_name not in self._node_to_tree_item_map:
-            return base_name
+    def _update_tree_nodes(self, diagram):
+        """Apply the changes of the diagram tree to the tree nodes
 
-        # Name exists, append suffix to make unique
-        counter = 2
-        while f"{base_name} #{counter}" in self._node_to_tree_item_map:
-            counter += 1
-        return f"{base_name} #{counter}"
+        Nodes are kept across refreshes, keyed by the name of their shape.
+        Only inserted, removed, moved, renamed or edited items touch the
+        tree, so expansion state and selection are preserved. Returns False
+        if the nodes have to be rebuilt from scratch.
+        """
+        diagram_tree = diagram.get_diagram_tree()
+        if diagram_tree is None:
+            print("No diagram tree available or invalid structure")
+            return False
+        root_item = diagram_tree.get_root_item()
+        if root_item is None:
+            print("No root item found in diagram tree")
+            return False
+
+        selected_keys = self._get_selected_node_keys()
+
+        self._tree_items = {}
+        self._item_keys = {}
+        entries = {}
+        root_key = self._get_tree_item_key(self._get_tree_item_name(root_item))
+        if self._root_key is not None and root_key != self._root_key:
+            return False
+        self._tree_entries = entries
+        self._collect_tree_items(root_item, root_key, 1, entries)
+
+        self._apply_tree_entries(root_key, selected_keys)
+        return True
+
+    def _apply_tree_entries(self, root_key, selected_keys=()):
+        """Create, update, move and remove nodes to match the collected entries
+
+        Children are only materialized for loaded items. A new item is
+        loaded when it is less than the auto-expand depth deep, other items
+        are loaded when the user expands them.
+        """
+        entries = self._tree_entries
+        # The root and the children of loaded items have nodes, entries are
+        # in pre-order so parents are visited before their children
+        visible = {root_key}
+
+        created = set()
+        for key, entry in entries.items():
+            if key not in visible:
+                continue
+            node = self._item_nodes.get(key)
+            is_new = node is None
+            if is_new:
+                if key == root_key:
+                    node = self._data_model.createNode(entry.display_name, True)
+                    self._data_model.setRoot(node)
+                    self._root_key = root_key
+                else:
+                    node = self._data_model.createNode(entry.display_name, False)
+                node.setDataValue(key)
+                self._item_nodes[key] = node
+                created.add(key)
+                if entry.depth < self._auto_expand_depth:
+                    self._loaded_keys.add(key)
+            elif self._node_names.get(key) != entry.display_name:
+                node.setDisplayValue(entry.display_name)
+
+            if is_new or self._node_attributes.get(key) != entry.attributes:
+                self._update_tree_node_icon(node, entry.tree_item, entry.attributes)
+            self._node_names[key] = entry.display_name
+            self._node_attributes[key] = entry.attributes
+            if key in self._loaded_keys:
+                visible.update(entry.child_keys)
+
+            # Unloaded items show an expander and load their children on demand
+            on_demand = key not in self._loaded_keys and entry.has_children
+            if self._on_demand_keys.get(key) != on_demand:
+                node.setHasChildrenOnDemand(on_demand)
+                self._on_demand_keys[key] = on_demand
+
+        moved = set()
+        expand_keys = set()
+        for key, entry in entries.items():
+            if key not in visible:
+                continue
+            child_keys = entry.child_keys if key in self._loaded_keys else []
+            if child_keys and (key in created or not self._child_keys.get(key)):
+                expand_keys.add(key)
+            self._sync_child_nodes(key, child_keys, moved)
+
+        # Forget removed and hidden items, their nodes left the tree with
+        # their parent
+        for key in list(self._item_nodes):
+            if key not in visible:
+                self._item_nodes.pop(key, None)
+                self._node_names.pop(key, None)
+                self._node_attributes.pop(key, None)
+                self._child_keys.pop(key, None)
+                self._parent_keys.pop(key, None)
+                self._on_demand_keys.pop(key, None)
+        for key in list(self._loaded_keys):
+            if key not in entries:
+                self._loaded_keys.discard(key)
+
+        if self._is_tree_model_set():
+            for key in expand_keys:
+                self.tree_control.expandNode(self._item_nodes[key])
+            if moved & set(selected_keys):
+                self._select_node_keys(selected_keys)
+        else:
+            self._pending_expand_keys.update(expand_keys)
 
-    def _populate_tree_node(self, data_model, parent_node, tree_item, display_name):
-        """Recursively populate tree nodes from organization chart tree items"""
+    def load_child_nodes(self, node):
+        """Materialize the children of a node the user expands"""
         try:
-            if tree_item is None:
+            key = self._get_node_key(node)
+            if key is None or key in self._loaded_keys:
                 return
+            self._loaded_keys.add(key)
+            self._collect_child_items(key, self._tree_entries)
+            self._apply_tree_entries(self._root_key)
+        except Exception as e:
+            print(f"Error loading child nodes: {e}")
+
+    def _ensure_tree_node(self, key):
+        """Get the node of key, loading and expanding its ancestors if needed"""
+        if key in self._item_nodes:
+            return self._item_nodes[key]
+        entry = self._tree_entries.get(key)
+        if entry is None:
+            return None
 
-            # Create node for this tree item
-            node = data_model.createNode(display_name, False)  # Start with no children
-            parent_node.appendChild(node)
+        ancestors = []
+        parent_key = entry.parent_key
+        while parent_key is not None:
+            ancestors.append(parent_key)
+            parent_key = self._tree_entries[parent_key].parent_key
+        self._loaded_keys.update(ancestors)
+        for parent_key in ancestors:
+            self._collect_child_items(parent_key, self._tree_entries)
+        self._apply_tree_entries(self._root_key)
+
+        if self._is_tree_model_set():
+            for parent_key in reversed(ancestors):
+                parent_node = self._item_nodes.get(parent_key)
+                if parent_node is not None:
+                    self.tree_control.expandNode(parent_node)
+        return self._item_nodes.get(key)
+
+    def _sync_child_nodes(self, key, child_keys, moved):
+        """Make the child nodes of key match child_keys with minimal changes"""
+        node = self._item_nodes[key]
+        current = self._child_keys.get(key, [])
+        wanted = set(child_keys)
+
+        # Remove children that were deleted or moved to another parent
+        for index in reversed(range(len(current))):
+            if current[index] not in wanted:
+                node.removeChildByIndex(index)
+                self._parent_keys[current[index]] = None
+                del current[index]
+
+        # Insert new children and reorder the remaining ones
+        for index, child_key in enumerate(child_keys):
+            if index < len(current) and current[index] == child_key:
+                continue
+
+            if child_key in current:
+                old_index = current.index(child_key)
+                node.removeChildByIndex(old_index)
+                del current[old_index]
+                moved.add(child_key)
+            else:
+                old_parent_key = self._parent_keys.get(child_key)
+                old_siblings = self._child_keys.get(old_parent_key)
+                if old_siblings and child_key in old_siblings:
+                    old_index = old_siblings.index(child_key)
+                    self._item_nodes[old_parent_key].removeChildByIndex(old_index)
+                    del old_siblings[old_index]
+                if child_key in self._parent_keys:
+                    moved.add(child_key)
+
+            node.insertChildByIndex(index, self._item_nodes[child_key])
+            current.insert(index, child_key)
+            self._parent_keys[child_key] = key
+
+        self._child_keys[key] = current
+
+    def _update_tree_node_icon(self, node, tree_item, attributes):
+        """Set the icon of a tree node from the attributes of its shape"""
+        shape = tree_item.get_rectangle_shape()
+        self._add_icon_preview_tree_node(
+            attributes if shape is not None else None, node
+        )
 
-            # Store reference to tree item in a class attribute for later selection
-            if not hasattr(self, "_node_to_tree_item_map"):
-                self._node_to_tree_item_map = {}
-            self._node_to_tree_item_map[display_name] = tree_item
+    def _is_tree_model_set(self):
+        """Check if the tree control shows the current data model"""
+        try:
+            tree_model = self.tree_control.getModel()
+            return tree_model.getPropertyValue("DataModel") == self._data_model
+        except Exception:
+            return False
 
-            shape = tree_item.get_rectangle_shape()
-            self._add_icon_preview_tree_node(shape, display_name, node)
+    def _get_selected_node_keys(self):
+        """Get the keys of the selected tree nodes, in selection order"""
+        keys = []
+        for node in self._get_selected_nodes():
+            key = self._get_node_key(node)
+            if key is not None:
+                keys.append(key)
+        return keys
+
+    def _get_selected_nodes(self):
+        """Get the selected tree nodes"""
+        try:
+            if self.tree_control is None:
+                return []
+            selection = self.tree_control.getSelection()
+            if selection is None:
+                return []
+            if hasattr(selection, "getDisplayValue"):
+                # Single node selected
+                return [selection]
+            # Sequence of nodes
+            return list(selection)
+        except Exception as e:
+            print(f"Error getting selected tree nodes: {e}")
+            return []
 
-            # Add children
-            child_count = 0
-            if tree_item.get_first_child() is not None:
-                child_item = tree_item.get_first_child()
-                child_num = 1
-                while child_item is not None:
-                    child_name = self._get_tree_node_display_name(child_item, child_num)
-                    child_name = self._make_unique_display_name(child_name)
-                    self._populate_tree_node(data_model, node, child_item, child_name)
+    def _get_node_key(self, node):
+        """Get the key of the tree item of a node, stored as its DataValue"""
+        if node is None or not hasattr(node, "getDataValue"):
+            return None
+        key = node.getDataValue()
+        return key if isinstance(key, str) else None
 
-                    # Move to next sibling
-                    child_item = child_item.get_first_sibling()
-                    child_num += 1
-                    child_count += 1
+    def _get_tree_item_for_node(self, node):
+        """Get the diagram tree item of a tree node"""
+        key = self._get_node_key(node)
+        return self._tree_items.get(key) if key is not None else None
 
-            # Update node to show it has children if any were added
-            if child_count > 0:
-                node.setHasChildrenOnDemand(True)
+    def _get_key_for_shape(self, shape):
+        """Get the key of the tree item of a shape, None if it is not in the tree
 
+        Items below unloaded items are collected on the way.
+        """
+        try:
+            key = shape.getName()
+        except Exception:
+            return None
+        if key in self._tree_items:
+            return key
+        tree_item = self._get_tree_item_by_name(key)
+        return self._collect_tree_path(tree_item) if tree_item is not None else None
+
+    def _get_tree_item_for_shape(self, shape):
+        """Get the diagram tree item of a shape"""
+        key = self._get_key_for_shape(shape)
+        return self._tree_items.get(key) if key is not None else None
+
+    def _get_tree_item_by_name(self, name):
+        """Get the diagram tree item of the shape called name, None if it is gone"""
+        if not name:
+            return None
+        try:
+            diagram = self.get_controller().get_diagram()
+            diagram_tree = diagram.get_diagram_tree() if diagram else None
+            if diagram_tree is None:
+                return None
+            root_item = diagram_tree.get_root_item()
+
+            tree_item = self._tree_items.get(name)
+            if tree_item is not None:
+                shape = tree_item.get_rectangle_shape()
+                if (
+                    shape is not None
+                    and shape.getName() == name
+                    and (tree_item.get_dad() is not None or tree_item is root_item)
+                ):
+                    return tree_item
+
+            # Not shown in the control tree (yet), walk the diagram tree
+            stack = [root_item] if root_item is not None else []
+            while stack:
+                tree_item = stack.pop()
+                if get_tree_item_name(tree_item) == name:
+                    return tree_item
+                child = tree_item.get_first_child()
+                while child is not None:
+                    stack.append(child)
+                    child = child.get_first_sibling()
         except Exception as e:
-            print(f"Error populating tree node: {e}")
+            print(f"Error finding tree item {name}: {e}")
+        return None
+
+    def _get_shape_by_name(self, name):
+        """Get the diagram shape called name, None if it is gone"""
+        tree_item = self._get_tree_item_by_name(name)
+        return tree_item.get_rectangle_shape() if tree_item is not None else None
+
+    def _select_node_keys(self, keys):
+        """Select the tree nodes of keys"""
+        first = True
+        for key in keys:
+            node = self._item_nodes.get(key)
+            if node is None:
+                continue
+            if first:
+                self.tree_control.select(node)
+                first = False
+            else:
+                self.tree_control.addSelection(node)
 
     def refresh_tree(self):
-        """Refresh the tree structure"""
+        """Apply the changes of the diagram structure to the tree"""
         try:
             if self.tree_control is not None:
-                # Clear the node mapping before repopulating
-                self._node_to_tree_item_map.clear()
-                self.populate_tree()
+                diagram = self.get_controller().get_diagram()
+                if (
+                    diagram is None
+                    or self._data_model is None
+                    or not self._update_tree_nodes(diagram)
+                ):
+                    self.populate_tree()
         except Exception as e:
             print(f"Error refreshing tree: {e}")
 
-    def _expand_all_nodes(self, node):
-        """Recursively expand all nodes in the tree"""
-        try:
-            if node is not None:
-                # Expand current node
-                self.tree_control.expandNode(node)
-
-                # Recursively expand all children
-                for i in range(node.getChildCount()):
-                    child_node = node.getChildAt(i)
-                    self._expand_all_nodes(child_node)
-        except Exception as e:
-            print(f"Error expanding node: {e}")
-
     def _setup_drag_and_drop(self):
         """Setup drag & drop functionality for the tree control"""
         try:
@@ -954,73 +1248,51 @@ class ControlDlgHandler(
         except Exception as e:
             print(f"Error setting up drag & drop: {e}")
 
-    def _add_icon_preview_tree_node(self, shape, name, node):
+    def _add_icon_preview_tree_node(self, attributes, node):
+        """Set the 14 px symbol icon of the attributes of a shape on a node"""
         try:
-            if shape is None:
+            render_args = None
+            if attributes:
+                render_args = get_icon_render_args(attributes, 14.0)
+            if render_args is None:
                 node.setNodeGraphicURL(
                     "vnd.sun.star.extension://com.collabora.milsymbol/img/orbat_base_small.svg"
                 )
                 return
 
-            attributes = extractGraphicAttributes(shape)
-            if attributes and attributes.get("MilSymCode"):
-                svg_data = generate_icon_svg(self.script, attributes, 14.0)
-                if svg_data:
-                    svg_url = self._save_svg_to_temp_and_get_url(svg_data, name)
-                    if svg_url:
-                        node.setNodeGraphicURL(svg_url)
-            else:
-                node.setNodeGraphicURL(
-                    "vnd.sun.star.extension://com.collabora.milsymbol/img/orbat_base_small.svg"
-                )
+            # Icons are stored by their render arguments, an icon that
+            # changed gets a new URL, so the tree control reloads it
+            svg_url = IconStore.get_instance(self.x_context).get_url(
+                render_args,
+                lambda: generate_icon_svg(self.script, attributes, 14.0),
+            )
+            if svg_url:
+                node.setNodeGraphicURL(svg_url)
         except Exception as e:
-            print(f"Error adding root node icon: {e}")
+            print(f"Error adding tree node icon: {e}")
 
-    def _save_svg_to_temp_and_get_url(self, svg_data, node_identifier):
-        """Save SVG to temp file and return file URL for setNodeGraphicURL()
+    def _get_label_index(self):
+        """Get the SIDC label index of the current locale"""
+        if self._label_index is None:
+            self._label_index = SymbolLabelIndex.get_instance(self.x_context)
+        return self._label_index
 
-        Args:
-            svg_data: SVG content as string
-            node_identifier: Unique identifier for the node (used in filename)
+    def _get_tree_node_display_name(self, tree_item, item_number, attributes):
+        """Get a meaningful display name for a tree node
 
-        Returns:
-            file:// URL string or None if save fails
+        attributes are the graphic attributes of the shape of tree_item.
         """
-        try:
-            if not svg_data:
-                return None
-
-            safe_name = "".join(
-                c if c.isalnum() or c in ("-", "_") else "_" for c in node_identifier
-            )
-            safe_name = safe_name[:50]
-
-            if not hasattr(self, "_temp_dir") or self._temp_dir is None:
-                self._temp_dir = tempfile.mkdtemp(prefix="orbat_icons_")
-
-            temp_path = os.path.join(self._temp_dir, f"{safe_name}.svg")
-
-            with open(temp_path, "w", encoding="utf-8") as f:
-                f.write(svg_data)
-
-            file_url = systemPathToFileUrl(temp_path)
-            return file_url
-
-        except Exception as e:
-            print(f"Error saving SVG to temp file: {e}")
-            return None
-
-    def _get_tree_node_display_name(self, tree_item, item_number):
-        """Get a meaningful display name for a tree node"""
         try:
             # Try to get shape information
             shape = tree_item.get_rectangle_shape()
             if shape is not None:
                 # Try to get MilSym information
                 milsym_code = ""
-                attributes = extractGraphicAttributes(shape)
+                milsym_label = None
                 if attributes and attributes.get("MilSymCode"):
-                    milsym_code = attributes.get("MilSymCode").rstrip("0")
+                    milsym_code = attributes.get("MilSymCode")
+                    milsym_label = self._get_label_index().get_label(milsym_code)
+                    milsym_code = milsym_code.rstrip("0")
 
                 # Try to get MilSym unique designation, headquarters and higher formation
                 milsym_hier = ""
@@ -1032,7 +1304,11 @@ class ControlDlgHandler(
                     milsym_hier += attributes.get("MilSymUniqueDesignation")
 
                 # Build display name
-                if milsym_code.strip() and milsym_hier.strip():
+                if milsym_label and milsym_hier.strip():
+                    return f"{milsym_label} {milsym_hier.strip()}"
+                elif milsym_label:
+                    return milsym_label
+                elif milsym_code.strip() and milsym_hier.strip():
                     return f"{self._unit_str} {milsym_hier} ({milsym_code})"
                 elif milsym_code.strip():
                     return f"{self._unit_str} ({milsym_code})"
@@ -1059,8 +1335,7 @@ class ControlDlgHandler(
             if not hasattr(selected_node, "getDisplayValue"):
                 return
 
-            node_name = selected_node.getDisplayValue()
-            tree_item = self._node_to_tree_item_map.get(node_name)
+            tree_item = self._get_tree_item_for_node(selected_node)
             if tree_item:
                 shape = tree_item.get_rectangle_shape()
                 if shape:
@@ -1075,6 +1350,7 @@ class ControlDlgHandler(
                                 controller._x_controller.select(shape)
                             except:
                                 pass
+                        self._record_document_selection()
                     finally:
                         self._syncing_selection = False
                         self._syncing_from_tree = False
@@ -1188,12 +1464,28 @@ class ControlDlgHandler(
                         shape_collection.add(shape)
 
                     controller._x_controller.select(shape_collection)
+                self._record_document_selection()
             finally:
                 if undo_manager:
                     undo_manager.unlock()
         except Exception as e:
             print(f"Error selecting shapes in document: {e}")
 
+    def _record_document_selection(self):
+        """Record the document selection made from the tree as handled
+
+        The tree already shows it, so the selection events it causes are not
+        synced back to the tree.
+        """
+        listener = getattr(self, "_selection_listener", None)
+        if listener is None:
+            return
+        try:
+            selection = self.get_controller()._x_controller.getSelection()
+            SelectionCoalescer.instance(self.x_context).record(listener, selection)
+        except Exception as e:
+            print(f"Error recording document selection: {e}")
+
     def _select_tree_nodes_for_shapes(self, shapes):
         """Select all tree nodes corresponding to the given shapes.
 
@@ -1209,12 +1501,9 @@ class ControlDlgHandler(
             for shape in shapes:
                 if shape is None:
                     continue
-                for node_name, tree_item in self._node_to_tree_item_map.items():
-                    if tree_item.get_rectangle_shape() == shape:
-                        node = self._find_node_in_tree(node_name)
-                        if node:
-                            matching_nodes.append(node)
-                        break
+                node = self._ensure_tree_node(self._get_key_for_shape(shape))
+                if node:
+                    matching_nodes.append(node)
 
             if not matching_nodes:
                 return
@@ -1251,16 +1540,11 @@ class ControlDlgHandler(
             if not self.tree_control:
                 return
 
-            # Find the tree item that matches this shape
-            matching_node_name = None
-            for node_name, tree_item in self._node_to_tree_item_map.items():
-                if tree_item.get_rectangle_shape() == shape:
-                    matching_node_name = node_name
-                    break
-
-            if matching_node_name:
-                # Find and select the corresponding tree node
-                self._select_tree_node_by_name(matching_node_name)
+            # Find the node of this shape, creating it if its parent was
+            # not expanded yet
+            node = self._ensure_tree_node(self._get_key_for_shape(shape))
+            if node:
+                self.tree_control.select(node)
 
         except Exception as e:
             print(f"Error selecting tree node for shape: {e}")
@@ -1284,12 +1568,9 @@ class ControlDlgHandler(
                     shape = selection.getByIndex(i)
                     if shape:
                         # Find the tree node for this shape
-                        for node_name, tree_item in self._node_to_tree_item_map.items():
-                            if tree_item.get_rectangle_shape() == shape:
-                                node = self._find_node_in_tree(node_name)
-                                if node:
-                                    matching_nodes.append(node)
-                                break
+                        node = self._ensure_tree_node(self._get_key_for_shape(shape))
+                        if node:
+                            matching_nodes.append(node)
                 except Exception:
                     continue
 
@@ -1309,88 +1590,28 @@ class ControlDlgHandler(
         finally:
             self._update_button_states()
 
-    def _find_node_in_tree(self, node_name):
-        """Find a tree node by name in the current tree model
-
-        Args:
-            node_name: Display name of the node to find
-
-        Returns:
-            Tree node or None if not found
-        """
-        try:
-            tree_model = self.tree_control.getModel()
-            data_model = tree_model.getPropertyValue("DataModel")
-            if data_model:
-                root_node = data_model.getRoot()
-                return self._find_node_by_name(root_node, node_name)
-        except Exception:
-            pass
-        return None
-
-    def _select_tree_node_by_name(self, node_name):
-        """Select a tree node by its display name"""
-        try:
-            if not self.tree_control:
-                return
-
-            # Get the tree model and find the node
-            tree_model = self.tree_control.getModel()
-            data_model = tree_model.getPropertyValue("DataModel")
-
-            if data_model:
-                root_node = data_model.getRoot()
-                target_node = self._find_node_by_name(root_node, node_name)
-
-                if target_node:
-                    # Select the node in the tree using the tree control directly
-                    self.tree_control.select(target_node)
-
-        except Exception as e:
-            print(f"Error selecting tree node by name: {e}")
-
-    def _find_node_by_name(self, node, target_name):
-        """Recursively find a tree node by its display name"""
-        try:
-            if node.getDisplayValue() == target_name:
-                return node
-
-            # Search children
-            for i in range(node.getChildCount()):
-                child = node.getChildAt(i)
-                result = self._find_node_by_name(child, target_name)
-                if result:
-                    return result
-
-            return None
-        except Exception:
-            return None
-
-    def move_tree_item(self, source_node_names, target_node_name, drop_position):
+    def move_tree_item(self, source_node_keys, target_node_key, drop_position):
         """Move tree item(s) to a new position and update the diagram
 
         Args:
-            source_node_names: Single node name (str) or list of node names
-            target_node_name: Target node name to move items to
+            source_node_keys: Single node key (str) or list of node keys
+            target_node_key: Key of the target node to move items to
             drop_position: 'child' or 'sibling'
         """
         try:
-            if not hasattr(self, "_node_to_tree_item_map"):
-                return False
-
             # Normalize to list
-            if isinstance(source_node_names, str):
-                source_node_names = [source_node_names]
+            if isinstance(source_node_keys, str):
+                source_node_keys = [source_node_keys]
 
-            target_tree_item = self._node_to_tree_item_map.get(target_node_name)
+            target_tree_item = self._tree_items.get(target_node_key)
             if not target_tree_item:
                 print("Could not find target tree item")
                 return False
 
             # Get all source tree items
             source_items = []
-            for name in source_node_names:
-                item = self._node_to_tree_item_map.get(name)
+            for key in source_node_keys:
+                item = self._tree_items.get(key)
                 if item:
                     source_items.append(item)
 
@@ -1444,8 +1665,7 @@ class ControlDlgHandler(
                         undo_action = DragDropUndoAction(
                             self, move_data, target_tree_item, drop_position
                         )
-                        undo_manager.addUndoAction(undo_action)
-                        self._undo_actions.append(undo_action)
+                        self._undo_log.add(undo_manager, undo_action)
                     except Exception as e:
                         print(f"Failed to register drag and drop undo action: {e}")
 
@@ -1465,11 +1685,10 @@ class ControlDlgHandler(
             selection = controller._x_controller.getSelection()
             if selection and selection.getCount() > 0:
                 selected_shape = selection.getByIndex(0)
-                # Find the tree item for this shape
-                for tree_item in self._node_to_tree_item_map.values():
-                    if tree_item.get_rectangle_shape() == selected_shape:
-                        self._parent_before_add = tree_item
-                        return
+                self._parent_before_add = self._get_tree_item_for_shape(
+                    selected_shape
+                )
+                return
             self._parent_before_add = None
         except Exception as e:
             print(f"Error storing selection before add: {e}")
@@ -1484,21 +1703,12 @@ class ControlDlgHandler(
 
             parent_tree_item = self._parent_before_add
 
-            # Find the parent in the current tree mapping
-            parent_node_name = None
-            for node_name, tree_item in self._node_to_tree_item_map.items():
-                if tree_item == parent_tree_item:
-                    parent_node_name = node_name
-                    break
-
-            if not parent_node_name:
-                # Try to find parent by shape
+            # The tree item may have been replaced, find the parent by shape
+            if parent_tree_item not in self._item_keys:
                 parent_shape = parent_tree_item.get_rectangle_shape()
-                for node_name, tree_item in self._node_to_tree_item_map.items():
-                    if tree_item.get_rectangle_shape() == parent_shape:
-                        parent_node_name = node_name
-                        parent_tree_item = tree_item
-                        break
+                current_tree_item = self._get_tree_item_for_shape(parent_shape)
+                if current_tree_item is not None:
+                    parent_tree_item = current_tree_item
 
             if parent_tree_item and parent_tree_item.get_first_child():
                 # Look for the last (newest) child
@@ -1570,14 +1780,16 @@ class ControlDlgHandler(
                     )
                 except Exception:
                     pass
+                SelectionCoalescer.discard(self._selection_listener)
                 self._selection_listener = None
 
-            if hasattr(self, "_node_to_tree_item_map"):
-                self._node_to_tree_item_map.clear()
+            self._reset_tree_nodes()
 
             if hasattr(self, "_clipboard"):
                 self._clipboard = None
 
+            if hasattr(self, "_tree_expansion_handler"):
+                self._tree_expansion_handler = None
             if hasattr(self, "_drag_handler"):
                 self._drag_handler = None
             if hasattr(self, "_drop_handler"):
@@ -1585,11 +1797,6 @@ class ControlDlgHandler(
 
             self.tree_control = None
 
-            # Clean up temp directory
-            if self._temp_dir is not None:
-                shutil.rmtree(self._temp_dir, ignore_errors=True)
-                self._temp_dir = None
-
             self._populate_tree_on_show = True
 
         except Exception as e:
@@ -1641,12 +1848,51 @@ class ControlDlgHandler(
             if settings_path is None:
                 return
 
+            # Keep the other settings stored in the same file
+            settings = self._load_settings()
+            settings.update(geometry)
+
             with open(settings_path, "w", encoding="utf-8") as f:
-                json.dump(geometry, f, indent=2)
+                json.dump(settings, f, indent=2)
 
         except Exception as e:
             print(f"Error saving dialog geometry: {e}")
 
+    def _load_settings(self):
+        """Load all dialog settings from the JSON file.
+
+        Returns:
+            Dictionary of settings, empty if not found/error.
+        """
+        try:
+            settings_path = self._get_settings_file_path()
+            if settings_path is None or not os.path.exists(settings_path):
+                return {}
+
+            with open(settings_path, "r", encoding="utf-8") as f:
+                settings = json.load(f)
+
+            return settings if isinstance(settings, dict) else {}
+        except Exception as e:
+            print(f"Error loading dialog settings: {e}")
+            return {}
+
+    def _load_auto_expand_depth(self):
+        """Get the number of tree levels created up front ("auto_expand_depth")"""
+        depth = self._load_settings().get(
+            "auto_expand_depth", self.DEFAULT_AUTO_EXPAND_DEPTH
+        )
+        if not isinstance(depth, int) or depth < 1:
+            return self.DEFAULT_AUTO_EXPAND_DEPTH
+        return depth
+
+    def _load_undo_memory_limit(self):
+        """Get the memory budget of the undo log in bytes ("undo_memory_kb")"""
+        limit = self._load_settings().get("undo_memory_kb")
+        if not isinstance(limit, int) or limit < 1:
+            return UndoLog.DEFAULT_MAX_BYTES
+        return limit * 1024
+
     def _load_dialog_geometry(self):
         """Load saved dialog geometry from JSON file.
 
@@ -1704,18 +1950,25 @@ class ControlDlgHandler(
         the underlying C++ objects. This prevents SIGSEGV crashes on close.
         """
         try:
-            if hasattr(self, "_undo_actions") and self._undo_actions:
-                for action in self._undo_actions:
-                    if action is not None and hasattr(action, "clear_references"):
-                        try:
-                            action.clear_references()
-                        except Exception as e:
-                            print(f"Error clearing undo action references: {e}")
-                self._undo_actions.clear()
+            self._undo_log.clear()
         except Exception as e:
             print(f"Error in clear_all_undo_action_references: {e}")
 
 
+class TreeEntry:
+    """Diagram tree item as collected when the control tree is refreshed"""
+
+    def __init__(self, tree_item, display_name, attributes, parent_key, depth):
+        self.tree_item = tree_item
+        self.display_name = display_name
+        self.attributes = attributes  # Shape attributes, to detect edits
+        self.parent_key = parent_key
+        self.depth = depth
+        self.child_keys = []
+        self.children_collected = False  # child_keys are filled
+        self.has_children = False
+
+
 class ClipboardItem:
     """Stores data for a copied tree item and its children"""
 
@@ -1724,58 +1977,83 @@ class ClipboardItem:
         self.children = children if children is not None else []
 
 
+def get_tree_item_name(tree_item):
+    """Get the name of the shape of a diagram tree item, None if it has none"""
+    if tree_item is None:
+        return None
+    shape = tree_item.get_rectangle_shape()
+    return shape.getName() if shape is not None else None
+
+
 class EditShapeUndoAction(unohelper.Base, XUndoAction):
     """Undo action for editing a shape in the diagram"""
 
     def __init__(self, dialog_handler, shape, original_attributes, edited_attributes):
         self.dialog_handler = dialog_handler
-        self.original_attributes = original_attributes
-        self.edited_attributes = edited_attributes
-        self.shape = shape
+        self.shape_name = shape.getName()
+        # Only the attributes that changed, as {name: (original, edited)}
+        self.changes = diff_attributes(original_attributes, edited_attributes)
         self.Title = "Edit Shape"
 
+    def get_size(self):
+        return estimate_size((self.shape_name, self.changes))
+
     def undo(self):
         """Undo the edit by restoring original attributes"""
         try:
-            self._apply_attributes(self.original_attributes)
+            self._apply_changes(0)
         except Exception as e:
             print(f"Error during undo edit shape: {e}")
 
     def redo(self):
         """Redo the edit by restoring edited attributes"""
         try:
-            self._apply_attributes(self.edited_attributes)
+            self._apply_changes(1)
         except Exception as e:
             print(f"Error during redo edit shape: {e}")
 
-    def _apply_attributes(self, attributes):
-        """Apply attributes to the shape and regenerate its graphic"""
-        if self.shape is None or self.dialog_handler is None:
+    def _apply_changes(self, side):
+        """Apply one side of the changes to the shape and update its graphic"""
+        if self.dialog_handler is None:
+            return
+        shape = self.dialog_handler._get_shape_by_name(self.shape_name)
+        if shape is None:
             return
         controller = self.dialog_handler.get_controller()
         if controller is None:
             return
-        controller.remove_selection_listener()
-
         diagram = controller.get_diagram()
         if diagram is None:
             return
+        controller.remove_selection_listener()
 
-        if len(attributes) == 0:
-            insertGraphicAttributes(self.shape, [""])  # Empty SIDC code, no other attrs
-            diagram.set_shape_properties(self.shape, diagram.DIAGRAM_SHAPE_TYPE)
-            diagram.refresh_diagram()
-        else:
-            params = self._attributes_to_params(attributes)
-            insertGraphicAttributes(self.shape, params)
-
-            # Regenerate SVG and update graphic
-            svg_data = generate_icon_svg(self.dialog_handler.script, attributes, 32.0)
-            if svg_data:
-                diagram.set_new_shape_properties(
-                    self.shape, diagram.DIAGRAM_SHAPE_TYPE, svg_data
-                )
+        with controller.changing_diagram():
+            attributes = apply_attribute_diff(
+                extractGraphicAttributes(shape), self.changes, side
+            )
+            if len(attributes) == 0:
+                insertGraphicAttributes(shape, [""])  # Empty SIDC code, no other attrs
+                diagram.set_shape_properties(shape, diagram.DIAGRAM_SHAPE_TYPE)
                 diagram.refresh_diagram()
+            else:
+                params = self._attributes_to_params(attributes)
+                insertGraphicAttributes(shape, params)
+
+                # The graphic is looked up in the icon store, it is only rendered
+                # if it is not stored yet. The shape keeps its size, so the
+                # diagram layout does not change.
+                render_args = get_icon_render_args(attributes, 32.0)
+                if render_args is not None:
+                    script = self.dialog_handler.script
+                    svg_data = IconStore.get_instance(
+                        self.dialog_handler.x_context
+                    ).get_svg(
+                        render_args, lambda: generate_icon_svg(script, attributes, 32.0)
+                    )
+                    if svg_data:
+                        diagram.set_new_shape_properties(
+                            shape, diagram.DIAGRAM_SHAPE_TYPE, svg_data
+                        )
 
         self.dialog_handler.refresh_tree()
         controller.add_selection_listener()
@@ -1807,15 +2085,14 @@ class EditShapeUndoAction(unohelper.Base, XUndoAction):
         return params
 
     def clear_references(self):
-        """Clear all shape references to prevent memory leaks during document close.
+        """Clear all references to release memory.
 
         This is called explicitly before document close since disposing() is not
-        reliably called by the undo manager.
+        reliably called by the undo manager, and when the undo log evicts the
+        action.
         """
         self.dialog_handler = None
-        self.shape = None
-        self.original_attributes = None
-        self.edited_attributes = None
+        self.changes = {}
 
     def disposing(self, event):
         """Handle disposing event"""
@@ -1829,13 +2106,13 @@ class RemoveShapeUndoAction(unohelper.Base, XUndoAction):
         """
         Args:
             dialog_handler: Reference to ControlDlgHandler
-            removal_data: List of (serialized_data, parent_tree_item, child_shapes, prev_sibling_shape) tuples
-                          child_shapes are the shapes that were re-parented to grandparent
-                          prev_sibling_shape is the previous sibling (for restoring correct position)
+            removal_data: List of (shape_name, serialized_data, parent_name, child_names, prev_sibling_name) tuples
+                          child_names are the shapes that were re-parented to grandparent
+                          prev_sibling_name is the previous sibling (for restoring correct position)
         """
         self.dialog_handler = dialog_handler
         self.removal_data = removal_data
-        self._restored_shapes = []
+        self._restored_names = []
 
         count = len(removal_data)
         if count == 1:
@@ -1843,71 +2120,79 @@ class RemoveShapeUndoAction(unohelper.Base, XUndoAction):
         else:
             self.Title = f"Remove {count} Shape(s)"
 
+    def get_size(self):
+        return estimate_size((self.removal_data, self._restored_names))
+
     def undo(self):
         """Undo the removal by re-adding all shapes and re-attaching children"""
         try:
-            controller = self.dialog_handler.get_controller()
+            if not self.removal_data:
+                return
+
+            handler = self.dialog_handler
+            controller = handler.get_controller()
             diagram = controller.get_diagram()
             if diagram is None:
                 return
 
             controller.remove_selection_listener()
-            self._restored_shapes = []
+            self._restored_names = []
+
+            # Restored shapes get new names, and a removed shape may be the
+            # parent, sibling or child of another one
+            restored_items = {}
+
+            def get_item(name):
+                if name in restored_items:
+                    return restored_items[name]
+                return handler._get_tree_item_by_name(name)
 
             for (
+                shape_name,
                 serialized_data,
-                parent_tree_item,
-                child_shapes,
-                prev_sibling_shape,
+                parent_name,
+                child_names,
+                prev_sibling_name,
             ) in reversed(self.removal_data):
+                parent_tree_item = get_item(parent_name)
+                if parent_tree_item is None:
+                    continue
+
                 # Create the removed shape (without children - they already exist)
                 success = diagram.paste_subtree(
-                    parent_tree_item, serialized_data, self.dialog_handler.script
+                    parent_tree_item, serialized_data, handler.script
                 )
-                if success:
-                    restored = self.dialog_handler._find_newly_added_shape(
-                        parent_tree_item
-                    )
-                    if restored:
-                        self._restored_shapes.append(restored)
+                if not success:
+                    continue
 
-                        # Move to correct sibling position if we have a previous sibling
-                        self._restore_sibling_position(
-                            diagram, restored, parent_tree_item, prev_sibling_shape
-                        )
+                restored_item = parent_tree_item.get_last_child()
+                if restored_item is None:
+                    continue
+                restored_items[shape_name] = restored_item
+                self._restored_names.append(get_tree_item_name(restored_item))
+
+                # Move to correct sibling position if we have a previous sibling
+                prev_sibling_item = (
+                    get_item(prev_sibling_name) if prev_sibling_name else None
+                )
+                self._restore_sibling_position(
+                    diagram, restored_item, parent_tree_item, prev_sibling_item
+                )
 
-                        # Re-attach children to the restored shape
-                        if child_shapes:
-                            self._reattach_children(diagram, restored, child_shapes)
+                # Re-attach children to the restored shape
+                for child_name in child_names:
+                    child_item = get_item(child_name)
+                    if child_item is not None:
+                        diagram.move_tree_item(child_item, restored_item, "child")
 
             diagram.refresh_diagram()
-            self.dialog_handler.refresh_tree()
+            handler.refresh_tree()
             controller.add_selection_listener()
         except Exception as e:
             print(f"Error during undo remove shape: {e}")
 
-    def _reattach_children(self, diagram, parent_shape, child_shapes):
-        """Re-attach child shapes to the restored parent shape"""
-        try:
-            diagram_tree = diagram.get_diagram_tree()
-            if diagram_tree is None:
-                return
-
-            parent_tree_item = diagram_tree.get_tree_item(parent_shape)
-            if parent_tree_item is None:
-                return
-
-            for child_shape in child_shapes:
-                if child_shape is None:
-                    continue
-                child_tree_item = diagram_tree.get_tree_item(child_shape)
-                if child_tree_item is not None:
-                    diagram.move_tree_item(child_tree_item, parent_tree_item, "child")
-        except Exception as e:
-            print(f"Error re-attaching children: {e}")
-
     def _restore_sibling_position(
-        self, diagram, restored_shape, parent_tree_item, prev_sibling_shape
+        self, diagram, restored_tree_item, parent_tree_item, prev_sibling_tree_item
     ):
         """Move the restored shape to its original sibling position.
 
@@ -1916,21 +2201,13 @@ class RemoveShapeUndoAction(unohelper.Base, XUndoAction):
 
         Args:
             diagram: The diagram object
-            restored_shape: The shape that was just restored
+            restored_tree_item: The tree item that was just restored
             parent_tree_item: The parent tree item
-            prev_sibling_shape: The shape that was the previous sibling (or None if first child)
+            prev_sibling_tree_item: The previous sibling (or None if first child)
         """
         try:
-            diagram_tree = diagram.get_diagram_tree()
-            if diagram_tree is None:
-                return
-
-            restored_tree_item = diagram_tree.get_tree_item(restored_shape)
-            if restored_tree_item is None:
-                return
-
             # If there was no previous sibling, the item should be the first child
-            if prev_sibling_shape is None:
+            if prev_sibling_tree_item is None:
                 first_child = parent_tree_item.get_first_child()
                 if first_child and first_child != restored_tree_item:
                     # Remove restored_tree_item from its current position
@@ -1939,64 +2216,51 @@ class RemoveShapeUndoAction(unohelper.Base, XUndoAction):
                     restored_tree_item.set_dad(parent_tree_item)
                     restored_tree_item.set_first_sibling(first_child)
                     parent_tree_item.set_first_child(restored_tree_item)
-            else:
-                # The restored item should be after prev_sibling_shape
-                prev_sibling_tree_item = diagram_tree.get_tree_item(prev_sibling_shape)
-                if (
-                    prev_sibling_tree_item
-                    and prev_sibling_tree_item != restored_tree_item
-                ):
-                    diagram._remove_item_from_tree(restored_tree_item)
-                    diagram._insert_as_sibling_after(
-                        restored_tree_item, prev_sibling_tree_item
-                    )
+            elif prev_sibling_tree_item != restored_tree_item:
+                # The restored item should be after the previous sibling
+                diagram._remove_item_from_tree(restored_tree_item)
+                diagram._insert_as_sibling_after(
+                    restored_tree_item, prev_sibling_tree_item
+                )
         except Exception as e:
             print(f"Error restoring sibling position: {e}")
 
     def redo(self):
         """Redo the removal by removing the restored shapes"""
         try:
-            if not self._restored_shapes:
+            if not self._restored_names:
                 return
 
-            controller = self.dialog_handler.get_controller()
+            handler = self.dialog_handler
+            controller = handler.get_controller()
             diagram = controller.get_diagram()
             if diagram is None:
                 return
 
             controller.remove_selection_listener()
 
-            for shape in self._restored_shapes:
+            for name in self._restored_names:
+                shape = handler._get_shape_by_name(name)
                 if shape:
                     diagram.remove_shape(shape)
 
             diagram.refresh_diagram()
-            self.dialog_handler.refresh_tree()
-            self._restored_shapes = []
+            handler.refresh_tree()
+            self._restored_names = []
             controller.add_selection_listener()
         except Exception as e:
             print(f"Error during redo remove shape: {e}")
 
     def clear_references(self):
-        """Clear all shape references to prevent memory leaks during document close.
+        """Clear all references to release memory.
 
         This is called explicitly before document close since disposing() is not
-        reliably called by the undo manager.
+        reliably called by the undo manager, and when the undo log evicts the
+        action.
         """
         self.dialog_handler = None
-
-        # Clear shape references in removal_data
-        if self.removal_data:
-            for item in self.removal_data:
-                # Clear the child_shapes list (index 2) which contains shape references
-                if len(item) >= 3 and item[2] is not None:
-                    item[2].clear()
         self.removal_data = None
-
-        # Clear restored shapes list to release shape references
-        if self._restored_shapes:
-            self._restored_shapes.clear()
-        self._restored_shapes = None
+        self._restored_names = []
 
     def disposing(self, event):
         """Handle disposing event"""
@@ -2018,22 +2282,28 @@ class PasteShapeUndoAction(unohelper.Base, XUndoAction):
         """
         self.dialog_handler = dialog_handler
         self.clipboard_data_list = clipboard_data_list
-        self.parent_tree_item = parent_tree_item
-        self.pasted_shapes = list(pasted_shapes) if pasted_shapes else []
+        self.parent_name = get_tree_item_name(parent_tree_item)
+        self.pasted_names = [shape.getName() for shape in pasted_shapes or [] if shape]
 
-        count = len(self.pasted_shapes)
+        count = len(self.pasted_names)
         if count == 1:
             self.Title = "Paste Shape"
         else:
             self.Title = f"Paste {count} Shape(s)"
 
+    def get_size(self):
+        return estimate_size(
+            (self.clipboard_data_list, self.parent_name, self.pasted_names)
+        )
+
     def undo(self):
         """Undo the paste by removing all pasted shapes and their subtrees"""
         try:
-            if not self.pasted_shapes:
+            if not self.pasted_names:
                 return
 
-            controller = self.dialog_handler.get_controller()
+            handler = self.dialog_handler
+            controller = handler.get_controller()
             diagram = controller.get_diagram()
             if diagram is None:
                 return
@@ -2041,27 +2311,24 @@ class PasteShapeUndoAction(unohelper.Base, XUndoAction):
             controller.remove_selection_listener()
 
             # Lock undo manager to prevent Writer from creating internal undo records
-            undo_manager = self.dialog_handler._get_undo_manager()
+            undo_manager = handler._get_undo_manager()
             if undo_manager:
                 undo_manager.lock()
             try:
                 # Remove shapes in reverse order (last pasted first)
-                for shape in reversed(self.pasted_shapes):
-                    if shape is None:
-                        continue
-                    pasted_tree_item = self._find_tree_item_for_shape(shape)
+                for name in reversed(self.pasted_names):
+                    pasted_tree_item = handler._get_tree_item_by_name(name)
                     if pasted_tree_item:
                         self._remove_subtree(diagram, controller, pasted_tree_item)
 
-                # Clear references to removed shapes
-                self.pasted_shapes = []
+                self.pasted_names = []
 
                 diagram.refresh_diagram()
             finally:
                 if undo_manager:
                     undo_manager.unlock()
 
-            self.dialog_handler.refresh_tree()
+            handler.refresh_tree()
             controller.add_selection_listener()
         except Exception as e:
             print(f"Error during undo paste shape: {e}")
@@ -2082,71 +2349,61 @@ class PasteShapeUndoAction(unohelper.Base, XUndoAction):
         if shape:
             diagram.remove_shape(shape)
 
-    def _find_tree_item_for_shape(self, shape):
-        """Find the tree item corresponding to a shape"""
-        for tree_item in self.dialog_handler._node_to_tree_item_map.values():
-            if tree_item.get_rectangle_shape() == shape:
-                return tree_item
-        return None
-
     def redo(self):
         """Redo the paste by re-pasting all clipboard items"""
         try:
-            controller = self.dialog_handler.get_controller()
+            if not self.clipboard_data_list:
+                return
+
+            handler = self.dialog_handler
+            controller = handler.get_controller()
             diagram = controller.get_diagram()
             if diagram is None:
                 return
 
+            parent_tree_item = handler._get_tree_item_by_name(self.parent_name)
+            if parent_tree_item is None:
+                return
+
             controller.remove_selection_listener()
 
             # Lock undo manager to prevent Writer from creating internal undo records
-            undo_manager = self.dialog_handler._get_undo_manager()
+            undo_manager = handler._get_undo_manager()
             if undo_manager:
                 undo_manager.lock()
+            pasted_shapes = []
             try:
-                self.pasted_shapes = []
-                for clipboard_data in self.clipboard_data_list:
-                    success = diagram.paste_subtree(
-                        self.parent_tree_item,
-                        clipboard_data,
-                        self.dialog_handler.script,
-                    )
-                    if success:
-                        pasted_shape = self.dialog_handler._find_newly_added_shape(
-                            self.parent_tree_item
-                        )
-                        if pasted_shape:
-                            self.pasted_shapes.append(pasted_shape)
+                pasted_items = diagram.paste_subtrees(
+                    parent_tree_item, self.clipboard_data_list, handler.script
+                )
+                pasted_shapes = [item.get_rectangle_shape() for item in pasted_items]
+                self.pasted_names = [shape.getName() for shape in pasted_shapes]
 
                 diagram.refresh_diagram()
             finally:
                 if undo_manager:
                     undo_manager.unlock()
 
-            self.dialog_handler.refresh_tree()
+            handler.refresh_tree()
 
             # Select all re-pasted shapes
-            if self.pasted_shapes:
-                self.dialog_handler._select_tree_nodes_for_shapes(self.pasted_shapes)
+            if pasted_shapes:
+                handler._select_tree_nodes_for_shapes(pasted_shapes)
 
             controller.add_selection_listener()
         except Exception as e:
             print(f"Error during redo paste shape: {e}")
 
     def clear_references(self):
-        """Clear all shape references to prevent memory leaks during document close.
+        """Clear all references to release memory.
 
         This is called explicitly before document close since disposing() is not
-        reliably called by the undo manager.
+        reliably called by the undo manager, and when the undo log evicts the
+        action.
         """
         self.dialog_handler = None
         self.clipboard_data_list = None
-        self.parent_tree_item = None
-
-        # Clear pasted_shapes list to release shape references
-        if self.pasted_shapes:
-            self.pasted_shapes.clear()
-        self.pasted_shapes = None
+        self.pasted_names = []
 
     def disposing(self, event):
         """Handle disposing event"""
@@ -2158,42 +2415,45 @@ class AddShapeUndoAction(unohelper.Base, XUndoAction):
 
     def __init__(self, dialog_handler, added_shape, parent_tree_item):
         self.dialog_handler = dialog_handler
-        self.added_shape = added_shape
-        self.parent_tree_item = parent_tree_item
+        self.added_name = added_shape.getName()
+        self.parent_name = get_tree_item_name(parent_tree_item)
         self.Title = "Add Shape"
 
+    def get_size(self):
+        return estimate_size((self.added_name, self.parent_name))
+
     def undo(self):
         """Undo the add shape operation by removing the added shape"""
         try:
-            if self.added_shape and self.dialog_handler:
-                controller = self.dialog_handler.get_controller()
-                if controller and controller.get_diagram():
+            if self.added_name and self.dialog_handler:
+                handler = self.dialog_handler
+                controller = handler.get_controller()
+                added_shape = handler._get_shape_by_name(self.added_name)
+                if controller and controller.get_diagram() and added_shape:
                     # Temporarily remove selection listener to avoid conflicts
                     controller.remove_selection_listener()
 
                     # Lock undo manager to prevent internal undo records during undo
-                    undo_manager = self.dialog_handler._get_undo_manager()
+                    undo_manager = handler._get_undo_manager()
                     if undo_manager:
                         undo_manager.lock()
                     try:
                         # Remove the shape using the diagram's remove method
-                        controller.get_diagram().remove_shape(self.added_shape)
+                        controller.get_diagram().remove_shape(added_shape)
                         controller.get_diagram().refresh_diagram()
                     finally:
                         if undo_manager:
                             undo_manager.unlock()
 
-                    # Clear reference to removed shape to prevent memory leak
-                    self.added_shape = None
+                    self.added_name = None
 
                     # Refresh the tree view
-                    self.dialog_handler.refresh_tree()
+                    handler.refresh_tree()
 
                     # Select the parent shape if it still exists
-                    if self.parent_tree_item:
-                        parent_shape = self.parent_tree_item.get_rectangle_shape()
-                        if parent_shape:
-                            controller.set_selected_shape(parent_shape)
+                    parent_shape = handler._get_shape_by_name(self.parent_name)
+                    if parent_shape:
+                        controller.set_selected_shape(parent_shape)
 
                     # Re-add selection listener
                     controller.add_selection_listener()
@@ -2204,40 +2464,35 @@ class AddShapeUndoAction(unohelper.Base, XUndoAction):
     def redo(self):
         """Redo the add shape operation"""
         try:
-            if self.parent_tree_item and self.dialog_handler:
-                controller = self.dialog_handler.get_controller()
-                if controller and controller.get_diagram():
+            if self.parent_name and self.dialog_handler:
+                handler = self.dialog_handler
+                controller = handler.get_controller()
+                parent_shape = handler._get_shape_by_name(self.parent_name)
+                if controller and controller.get_diagram() and parent_shape:
                     # Temporarily remove selection listener
                     controller.remove_selection_listener()
 
                     # Lock undo manager to prevent internal undo records during redo
-                    undo_manager = self.dialog_handler._get_undo_manager()
+                    undo_manager = handler._get_undo_manager()
                     if undo_manager:
                         undo_manager.lock()
                     try:
-                        parent_shape = self.parent_tree_item.get_rectangle_shape()
-
                         controller.get_diagram().add_shape(parent_shape)
                         controller.get_diagram().refresh_diagram()
 
-                        # Look up the CURRENT tree item from the diagram tree
-                        current_parent_tree_item = (
-                            controller.get_diagram()
-                            .get_diagram_tree()
-                            .get_tree_item(parent_shape)
-                        )
-
-                        # Store reference to newly added shape for subsequent undo
-                        self.added_shape = self.dialog_handler._find_newly_added_shape(
-                            current_parent_tree_item
+                        # Store the name of the newly added shape for subsequent undo
+                        added_shape = handler._find_newly_added_shape(
+                            handler._get_tree_item_by_name(self.parent_name)
                         )
+                        if added_shape:
+                            self.added_name = added_shape.getName()
                     finally:
                         if undo_manager:
                             undo_manager.unlock()
 
                     # Refresh tree and select newly added shape
-                    self.dialog_handler.refresh_tree()
-                    self.dialog_handler._select_newly_added_child()
+                    handler.refresh_tree()
+                    handler._select_newly_added_child()
 
                     # Re-add selection listener
                     controller.add_selection_listener()
@@ -2246,14 +2501,15 @@ class AddShapeUndoAction(unohelper.Base, XUndoAction):
             print(f"Error during redo add shape: {e}")
 
     def clear_references(self):
-        """Clear all shape references to prevent memory leaks during document close.
+        """Clear all references to release memory.
 
         This is called explicitly before document close since disposing() is not
-        reliably called by the undo manager.
+        reliably called by the undo manager, and when the undo log evicts the
+        action.
         """
         self.dialog_handler = None
-        self.added_shape = None
-        self.parent_tree_item = None
+        self.added_name = None
+        self.parent_name = None
 
     def disposing(self, event):
         """Handle disposing event"""
@@ -2272,8 +2528,12 @@ class DragDropUndoAction(unohelper.Base, XUndoAction):
             drop_position: "child" or "sibling"
         """
         self.dialog_handler = dialog_handler
-        self.move_data = move_data
-        self.target_tree_item = target_tree_item
+        # (source name, original parent name) of every moved item
+        self.move_data = [
+            (get_tree_item_name(source_item), get_tree_item_name(original_parent))
+            for source_item, original_parent, _ in move_data
+        ]
+        self.target_name = get_tree_item_name(target_tree_item)
         self.drop_position = drop_position
 
         count = len(move_data)
@@ -2282,10 +2542,17 @@ class DragDropUndoAction(unohelper.Base, XUndoAction):
         else:
             self.Title = f"Drag and Drop ({count} items)"
 
+    def get_size(self):
+        return estimate_size((self.move_data, self.target_name))
+
     def undo(self):
         """Undo by moving all items back to their original positions"""
         try:
-            controller = self.dialog_handler.get_controller()
+            if not self.move_data:
+                return
+
+            handler = self.dialog_handler
+            controller = handler.get_controller()
             diagram = controller.get_diagram()
             if diagram is None:
                 return
@@ -2293,12 +2560,14 @@ class DragDropUndoAction(unohelper.Base, XUndoAction):
             controller.remove_selection_listener()
 
             # Restore in reverse order to maintain tree structure
-            for source_item, original_parent, _ in reversed(self.move_data):
+            for source_name, original_parent_name in reversed(self.move_data):
+                source_item = handler._get_tree_item_by_name(source_name)
+                original_parent = handler._get_tree_item_by_name(original_parent_name)
                 if source_item and original_parent:
                     diagram.move_tree_item(source_item, original_parent, "child")
 
             diagram.refresh_diagram()
-            self.dialog_handler.refresh_tree()
+            handler.refresh_tree()
             controller.add_selection_listener()
         except Exception as e:
             print(f"Error during undo drag and drop: {e}")
@@ -2306,37 +2575,41 @@ class DragDropUndoAction(unohelper.Base, XUndoAction):
     def redo(self):
         """Redo by moving all items to the target again"""
         try:
-            controller = self.dialog_handler.get_controller()
+            if not self.move_data:
+                return
+
+            handler = self.dialog_handler
+            controller = handler.get_controller()
             diagram = controller.get_diagram()
             if diagram is None:
                 return
 
             controller.remove_selection_listener()
 
-            for source_item, _, _ in self.move_data:
-                if source_item and self.target_tree_item:
+            target_tree_item = handler._get_tree_item_by_name(self.target_name)
+            for source_name, _ in self.move_data:
+                source_item = handler._get_tree_item_by_name(source_name)
+                if source_item and target_tree_item:
                     diagram.move_tree_item(
-                        source_item, self.target_tree_item, self.drop_position
+                        source_item, target_tree_item, self.drop_position
                     )
 
             diagram.refresh_diagram()
-            self.dialog_handler.refresh_tree()
+            handler.refresh_tree()
             controller.add_selection_listener()
         except Exception as e:
             print(f"Error during redo drag and drop: {e}")
 
     def clear_references(self):
-        """Clear all shape references to prevent memory leaks during document close.
+        """Clear all references to release memory.
 
         This is called explicitly before document close since disposing() is not
-        reliably called by the undo manager.
+        reliably called by the undo manager, and when the undo log evicts the
+        action.
         """
         self.dialog_handler = None
-
-        if self.move_data:
-            self.move_data.clear()
         self.move_data = None
-        self.target_tree_item = None
+        self.target_name = None
 
     def disposing(self, event):
         """Handle disposing event"""
@@ -2473,6 +2746,37 @@ class TreeMouseHandler(unohelper.Base, XMouseListener):
         pass
 
 
+class TreeExpansionHandler(unohelper.Base, XTreeExpansionListener):
+    """Create the child nodes of a tree node when it is expanded"""
+
+    def __init__(self, dialog_handler):
+        self.dialog_handler = dialog_handler
+
+    def requestChildNodes(self, event):
+        """Handle request for the children of a node with children on demand"""
+        self.dialog_handler.load_child_nodes(event.Node)
+
+    def treeExpanding(self, event):
+        """Handle tree expanding event"""
+        pass
+
+    def treeCollapsing(self, event):
+        """Handle tree collapsing event"""
+        pass
+
+    def treeExpanded(self, event):
+        """Handle tree expanded event"""
+        pass
+
+    def treeCollapsed(self, event):
+        """Handle tree collapsed event"""
+        pass
+
+    def disposing(self, event):
+        """Handle disposing events"""
+        pass
+
+
 class TreeSelectionListener(unohelper.Base, XSelectionChangeListener):
     """Listen for shape selection changes to update tree selection"""
 
@@ -2499,6 +2803,16 @@ class TreeSelectionListener(unohelper.Base, XSelectionChangeListener):
             if getattr(self.dialog_handler, "_syncing_from_tree", False):
                 return
 
+            SelectionCoalescer.instance(self.dialog_handler.x_context).submit(
+                self, event, self._sync_selection
+            )
+        except Exception:
+            # Silently ignore selection errors to avoid spam
+            pass
+
+    def _sync_selection(self, event):
+        """Sync the final selection of a burst of selection events to the tree"""
+        try:
             # Get the selected shapes and sync ALL of them to tree
             selection = event.Source.getSelection()
             if selection and selection.getCount() > 0:
@@ -2519,7 +2833,7 @@ class TreeDragHandler(unohelper.Base, XDragGestureListener, XDragSourceListener)
 
     def __init__(self, dialog_handler):
         self.dialog_handler = dialog_handler
-        self.dragged_node_names = None
+        self.dragged_node_keys = None
 
     def dragGestureRecognized(self, event):
         """Handle drag gesture recognition"""
@@ -2535,44 +2849,33 @@ class TreeDragHandler(unohelper.Base, XDragGestureListener, XDragSourceListener)
             if not origin_node or not hasattr(origin_node, "getDisplayValue"):
                 return
 
-            origin_name = origin_node.getDisplayValue()
+            handler = self.dialog_handler
+            origin_key = handler._get_node_key(origin_node)
 
             # Don't allow dragging the root node
-            if origin_name == "Root" or "Diagram Structure" in origin_name:
+            if origin_key is None or origin_key == handler._root_key:
                 return
 
             # Check if origin node is part of current selection
-            dragged_names = []
-            if self.dialog_handler._is_node_selected(origin_node):
-                selection = tree_control.getSelection()
-                if selection is not None:
-                    # Handle both single node and sequence of nodes
-                    nodes = []
-                    if hasattr(selection, "getDisplayValue"):
-                        nodes = [selection]
-                    elif hasattr(selection, "__len__"):
-                        nodes = list(selection)
-                    elif hasattr(selection, "__iter__"):
-                        nodes = list(selection)
-
-                    for node in nodes:
-                        if node and hasattr(node, "getDisplayValue"):
-                            name = node.getDisplayValue()
-                            if name != "Root" and "Diagram Structure" not in name:
-                                dragged_names.append(name)
+            if handler._is_node_selected(origin_node):
+                dragged_keys = [
+                    key
+                    for key in handler._get_selected_node_keys()
+                    if key != handler._root_key
+                ]
             else:
                 # Drag only the origin node (not in selection)
-                dragged_names = [origin_name]
+                dragged_keys = [origin_key]
 
-            if not dragged_names:
+            if not dragged_keys:
                 return
 
             # Store for reference and set dragging flag
-            self.dragged_node_names = dragged_names
-            self.dialog_handler._is_dragging = True
+            self.dragged_node_keys = dragged_keys
+            handler._is_dragging = True
 
-            # Create transferable with all names
-            transferable = TreeNodeTransferable(dragged_names)
+            # Create transferable with all keys
+            transferable = TreeNodeTransferable(dragged_keys)
 
             event.DragSource.startDrag(event, ACTION_MOVE, 0, 0, transferable, self)
 
@@ -2602,35 +2905,15 @@ class TreeDragHandler(unohelper.Base, XDragGestureListener, XDragSourceListener)
         if event.DropSuccess:
             pass
         else:
-            if self.dragged_node_names:
-                self._restore_selection(self.dragged_node_names)
+            if self.dragged_node_keys:
+                self._restore_selection(self.dragged_node_keys)
 
-        self.dragged_node_names = None
+        self.dragged_node_keys = None
 
-    def _restore_selection(self, node_names):
-        """Restore tree selection to the given node names"""
+    def _restore_selection(self, node_keys):
+        """Restore tree selection to the given node keys"""
         try:
-            tree_control = self.dialog_handler.tree_control
-            if not tree_control:
-                return
-
-            tree_model = tree_control.getModel()
-            data_model = tree_model.getPropertyValue("DataModel")
-            if not data_model:
-                return
-
-            root_node = data_model.getRoot()
-
-            # Find and select each node
-            first = True
-            for name in node_names:
-                node = self.dialog_handler._find_node_by_name(root_node, name)
-                if node:
-                    if first:
-                        tree_control.select(node)
-                        first = False
-                    else:
-                        tree_control.addSelection(node)
+            self.dialog_handler._select_node_keys(node_keys)
         except Exception as e:
             print(f"Error restoring selection: {e}")
 
@@ -2662,16 +2945,16 @@ class TreeDropHandler(unohelper.Base, XDropTargetListener):
 
             data = uno.invoke(transferable, "getTransferData", (data_flavor,))
 
-            dragged_node_names = None
+            dragged_node_keys = None
             if data:
                 raw = str(data.value) if hasattr(data, "value") else str(data)
                 try:
-                    dragged_node_names = json.loads(raw)
+                    dragged_node_keys = json.loads(raw)
                 except json.JSONDecodeError:
-                    # Fallback: single name (backward compatibility)
-                    dragged_node_names = [raw]
+                    # Fallback: single key
+                    dragged_node_keys = [raw]
 
-            if not dragged_node_names:
+            if not dragged_node_keys:
                 event.Source.dropComplete(False)
                 return
 
@@ -2688,13 +2971,13 @@ class TreeDropHandler(unohelper.Base, XDropTargetListener):
                 event.Source.dropComplete(False)
                 return
 
-            target_node_name = target_node.getDisplayValue()
+            target_node_key = self.dialog_handler._get_node_key(target_node)
 
             # Don't allow dropping on root or on any of the dragged nodes
             if (
-                target_node_name == "Root"
-                or "Diagram Structure" in target_node_name
-                or target_node_name in dragged_node_names
+                target_node_key not in self.dialog_handler._tree_items
+                or target_node_key == self.dialog_handler._root_key
+                or target_node_key in dragged_node_keys
             ):
                 event.Source.rejectDrop()
                 return
@@ -2703,7 +2986,7 @@ class TreeDropHandler(unohelper.Base, XDropTargetListener):
 
             # Perform the move operation with all dragged nodes
             success = self.dialog_handler.move_tree_item(
-                dragged_node_names, target_node_name, drop_position
+                dragged_node_keys, target_node_key, drop_position
             )
 
             event.Source.dropComplete(success)
@@ -2755,19 +3038,19 @@ class TreeDropHandler(unohelper.Base, XDropTargetListener):
 class TreeNodeTransferable(unohelper.Base, XTransferable):
     """Transferable data for tree node drag & drop"""
 
-    def __init__(self, node_names):
-        # Accept single name (str) or list of names
-        if isinstance(node_names, str):
-            self.node_names = [node_names]
+    def __init__(self, node_keys):
+        # Accept single key (str) or list of keys
+        if isinstance(node_keys, str):
+            self.node_keys = [node_keys]
         else:
-            self.node_names = list(node_names)
+            self.node_keys = list(node_keys)
         self._data_flavor = self._create_data_flavor()
 
     def getTransferData(self, flavor):
         """Get transfer data for the given flavor"""
         if self.isDataFlavorSupported(flavor):
             # Return as JSON string for multi-node support
-            return json.dumps(self.node_names)
+            return json.dumps(self.node_keys)
         return None
 
     def getTransferDataFlavors(self):
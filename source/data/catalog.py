@@ -0,0 +1,244 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Lazily loaded symbol catalog
+
+symbols_data.py holds the catalog of every symbol set as one big literal.
+build.sh compiles it into one small index artifact (VERSION, BUTTONS,
+SYMBOLS) and one artifact per symbol set, so the dialog only unpickles the
+sets it actually shows. Without compiled artifacts, or if they are older
+than symbols_data.py, the catalog falls back to importing symbols_data.
+
+The module can be used like symbols_data: VERSION, BUTTONS and SYMBOLS are
+loaded on first access and SYMBOL_DETAILS is a mapping that loads a symbol
+set when it is looked up.
+
+Value lookups map the value of a catalog table entry to its
+(index, label, img), so a SIDC can be resolved to list positions without
+scanning the tables. The lookups of SYMBOLS and BUTTONS are compiled into
+the index, the ones of the symbol set tables are built once on first use.
+
+Compile the artifacts with:
+
+    cd source && python3 -m data.catalog
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+
+from collections.abc import Mapping
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOG_DIR = os.path.join(DATA_DIR, "catalog")
+SOURCE_FILE = os.path.join(DATA_DIR, "symbols_data.py")
+INDEX_FILE = "index.pickle"
+
+PICKLE_PROTOCOL = 4
+
+_index = None
+_symbol_sets = {}
+_lookups = {}
+
+
+def _get_source_digest():
+    """Get digest of symbols_data.py, or None if it is not available"""
+    try:
+        with open(SOURCE_FILE, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _read_artifact(file_name):
+    try:
+        with open(os.path.join(CATALOG_DIR, file_name), "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def _write_artifact(output_dir, file_name, data):
+    path = os.path.join(output_dir, file_name)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(data, f, protocol=PICKLE_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def build_value_lookup(items):
+    """Map value -> (index, label, img) of a catalog table, first entry wins"""
+    lookup = {}
+    for i, item in enumerate(items):
+        lookup.setdefault(item["value"], (i, item.get("label"), item.get("img")))
+    return lookup
+
+
+def _build_button_lookups(buttons):
+    """Map value -> button id per group and button id -> group"""
+    button_values = {}
+    button_groups = {}
+    for group_name, group_buttons in buttons.items():
+        values = button_values.setdefault(group_name, {})
+        for button_id, value in group_buttons.items():
+            values.setdefault(value, button_id)
+            button_groups.setdefault(button_id, group_name)
+    return button_values, button_groups
+
+
+def _build_index_from_source():
+    from data import symbols_data
+
+    button_values, button_groups = _build_button_lookups(symbols_data.BUTTONS)
+    return {
+        "version": symbols_data.VERSION,
+        "buttons": symbols_data.BUTTONS,
+        "symbols": symbols_data.SYMBOLS,
+        "set_ids": list(symbols_data.SYMBOL_DETAILS.keys()),
+        "symbol_lookup": build_value_lookup(symbols_data.SYMBOLS),
+        "button_values": button_values,
+        "button_groups": button_groups,
+        "source_digest": None,
+    }
+
+
+def get_index():
+    """Get catalog index with version, buttons, symbol sets and set ids"""
+    global _index
+    if _index is None:
+        index = _read_artifact(INDEX_FILE)
+        if index is not None:
+            digest = _get_source_digest()
+            if digest is not None and digest != index.get("source_digest"):
+                index = None
+            elif "symbol_lookup" not in index:
+                index = None
+        _index = index if index is not None else _build_index_from_source()
+    return _index
+
+
+def get_symbol_set_ids():
+    """Get ids of all symbol sets, in catalog order"""
+    return get_index()["set_ids"]
+
+
+def load_symbol_set(set_id):
+    """Get details (MainIcon, modifiers, ...) of one symbol set"""
+    symbol_set = _symbol_sets.get(set_id)
+    if symbol_set is None:
+        if get_index()["source_digest"] is not None:
+            symbol_set = _read_artifact(f"{set_id}.pickle")
+        if symbol_set is None:
+            from data import symbols_data
+
+            symbol_set = symbols_data.SYMBOL_DETAILS[set_id]
+        _symbol_sets[set_id] = symbol_set
+    return symbol_set
+
+
+def get_symbol_set_lookup():
+    """Get value -> (index, label, img) of SYMBOLS"""
+    return get_index()["symbol_lookup"]
+
+
+def get_table_lookup(set_id, table_name):
+    """Get value -> (index, label, img) of a table (MainIcon, ...) of a symbol set"""
+    key = (set_id, table_name)
+    lookup = _lookups.get(key)
+    if lookup is None:
+        lookup = build_value_lookup(load_symbol_set(set_id)[table_name])
+        _lookups[key] = lookup
+    return lookup
+
+
+def get_country_lookup():
+    """Get value -> (index, label, img) of the country codes"""
+    lookup = _lookups.get("COUNTRY_CODES")
+    if lookup is None:
+        from data import country_data
+
+        lookup = build_value_lookup(country_data.COUNTRY_CODES)
+        _lookups["COUNTRY_CODES"] = lookup
+    return lookup
+
+
+def get_button_id(group_name, value):
+    """Get id of the button of group_name that sets value, or None"""
+    return get_index()["button_values"].get(group_name, {}).get(value)
+
+
+def get_button_group(button_id):
+    """Get name of the button group containing button_id, or None"""
+    return get_index()["button_groups"].get(button_id)
+
+
+def clear_cache():
+    """Forget loaded index, symbol sets and lookups"""
+    global _index
+    _index = None
+    _symbol_sets.clear()
+    _lookups.clear()
+
+
+class SymbolDetails(Mapping):
+    """Symbol set details keyed by set id, each set is loaded on first access"""
+
+    def __getitem__(self, set_id):
+        if set_id not in get_symbol_set_ids():
+            raise KeyError(set_id)
+        return load_symbol_set(set_id)
+
+    def __iter__(self):
+        return iter(get_symbol_set_ids())
+
+    def __len__(self):
+        return len(get_symbol_set_ids())
+
+
+SYMBOL_DETAILS = SymbolDetails()
+
+_INDEX_ATTRIBUTES = {"VERSION": "version", "BUTTONS": "buttons", "SYMBOLS": "symbols"}
+
+
+def __getattr__(name):
+    if name in _INDEX_ATTRIBUTES:
+        return get_index()[_INDEX_ATTRIBUTES[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _intern_strings(data):
+    """Intern strings so repeated labels are stored once per artifact"""
+    if isinstance(data, str):
+        return sys.intern(data)
+    if isinstance(data, dict):
+        return {_intern_strings(k): _intern_strings(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_intern_strings(item) for item in data]
+    return data
+
+
+def compile_catalog(output_dir=CATALOG_DIR):
+    """Write the index and per symbol set artifacts from symbols_data.py"""
+    from data import symbols_data
+
+    os.makedirs(output_dir, exist_ok=True)
+    for set_id, details in symbols_data.SYMBOL_DETAILS.items():
+        _write_artifact(output_dir, f"{set_id}.pickle", _intern_strings(details))
+
+    # The index is written last, so it only validates complete set artifacts
+    index = _build_index_from_source()
+    index["source_digest"] = _get_source_digest()
+    _write_artifact(output_dir, INDEX_FILE, _intern_strings(index))
+    return len(index["set_ids"])
+
+
+if __name__ == "__main__":
+    count = compile_catalog()
+    print(f"Compiled {count} symbol sets into {CATALOG_DIR}")
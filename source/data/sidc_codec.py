@@ -0,0 +1,252 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Table-driven codec for APP-6D / MIL-STD-2525D symbol identification codes
+
+A SIDC has 20 digits. The extension stores an extended 30 digit form, which
+appends the sector indicators of the two icon modifiers, a reserved block
+and the country code. Shorter codes are padded with zeros when decoded.
+
+Single codes are decoded into Sidc objects. Batches are decoded into
+columns (one list per field), so thousands of codes can be validated with
+one pass per field and one catalog lookup per symbol set.
+"""
+
+from data import catalog
+
+SIDC_LENGTH = 20
+EXTENDED_SIDC_LENGTH = 30
+
+# (field, start, end) of every field of the extended SIDC, in code order
+FIELDS = (
+    ("version", 0, 2),
+    ("context", 2, 3),
+    ("affiliation", 3, 4),
+    ("symbol_set", 4, 6),
+    ("status", 6, 7),
+    ("hq_tf_dummy", 7, 8),
+    ("echelon_mobility", 8, 10),
+    ("entity", 10, 16),
+    ("modifier1", 16, 18),
+    ("modifier2", 18, 20),
+    ("modifier1_sector", 20, 21),
+    ("modifier2_sector", 21, 22),
+    ("reserved", 22, 27),
+    ("country", 27, 30),
+)
+
+FIELD_NAMES = tuple(name for name, _start, _end in FIELDS)
+
+# Fields validated against the button groups of the catalog
+BUTTON_FIELDS = (
+    ("context", "CONTEXT"),
+    ("affiliation", "AFFILIATION"),
+    ("status", "STATUS"),
+)
+
+# Fields validated against the tables of their symbol set
+SYMBOL_SET_FIELDS = (
+    ("hq_tf_dummy", "HeadquartersTaskforceDummy"),
+    ("echelon_mobility", "EchelonMobility"),
+    ("entity", "MainIcon"),
+    ("first_icon", "FirstIconModifier"),
+    ("second_icon", "SecondIconModifier"),
+)
+
+FORMAT_ERROR = "format"
+
+
+class Sidc:
+    """Decoded SIDC with one string attribute per field, see FIELDS"""
+
+    __slots__ = (
+        "version",
+        "context",
+        "affiliation",
+        "symbol_set",
+        "status",
+        "hq_tf_dummy",
+        "echelon_mobility",
+        "entity",
+        "modifier1",
+        "modifier2",
+        "modifier1_sector",
+        "modifier2_sector",
+        "reserved",
+        "country",
+    )
+
+    version: str
+    context: str
+    affiliation: str
+    symbol_set: str
+    status: str
+    hq_tf_dummy: str
+    echelon_mobility: str
+    entity: str
+    modifier1: str
+    modifier2: str
+    modifier1_sector: str
+    modifier2_sector: str
+    reserved: str
+    country: str
+
+    def __init__(self, **fields):
+        for name, start, end in FIELDS:
+            setattr(self, name, fields.pop(name, "0" * (end - start)))
+
+        # Catalog form of the modifiers: sector indicator + modifier
+        if "first_icon" in fields:
+            self.first_icon = fields.pop("first_icon")
+        if "second_icon" in fields:
+            self.second_icon = fields.pop("second_icon")
+        if fields:
+            raise TypeError(f"Unknown SIDC fields: {', '.join(fields)}")
+
+    @property
+    def first_icon(self):
+        return self.modifier1_sector + self.modifier1
+
+    @first_icon.setter
+    def first_icon(self, value):
+        self.modifier1_sector = value[0]
+        self.modifier1 = value[-2:]
+
+    @property
+    def second_icon(self):
+        return self.modifier2_sector + self.modifier2
+
+    @second_icon.setter
+    def second_icon(self, value):
+        self.modifier2_sector = value[0]
+        self.modifier2 = value[-2:]
+
+    def to_string(self):
+        return encode(self)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sidc):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in FIELD_NAMES)
+
+    def __repr__(self):
+        return f"Sidc({encode(self)!r})"
+
+
+def _normalize(code):
+    """Get code padded to the extended length, or None if it is malformed"""
+    if not isinstance(code, str):
+        return None
+    code = code.strip()
+    if not SIDC_LENGTH <= len(code) <= EXTENDED_SIDC_LENGTH or not code.isdigit():
+        return None
+    return code.ljust(EXTENDED_SIDC_LENGTH, "0")
+
+
+def is_well_formed(code):
+    """Check that code is a 20 to 30 digit SIDC"""
+    return _normalize(code) is not None
+
+
+def decode(code):
+    """Decode a SIDC string into a Sidc, raises ValueError if it is malformed"""
+    normalized = _normalize(code)
+    if normalized is None:
+        raise ValueError(f"Malformed SIDC: {code!r}")
+    return Sidc(**{name: normalized[start:end] for name, start, end in FIELDS})
+
+
+def encode(sidc):
+    """Encode a Sidc into its extended 30 digit string"""
+    parts = []
+    for name, start, end in FIELDS:
+        value = getattr(sidc, name)
+        if len(value) != end - start:
+            raise ValueError(f"SIDC field {name} must have {end - start} digits")
+        parts.append(value)
+    return "".join(parts)
+
+
+def decode_many(codes):
+    """Decode a batch of SIDCs into {field: [value of each code]}
+
+    Malformed codes have None in every column. The columns also include
+    first_icon and second_icon in the catalog form.
+    """
+    normalized = [_normalize(code) for code in codes]
+    columns = {
+        name: [code[start:end] if code is not None else None for code in normalized]
+        for name, start, end in FIELDS
+    }
+    columns["first_icon"] = _join_columns(
+        columns["modifier1_sector"], columns["modifier1"]
+    )
+    columns["second_icon"] = _join_columns(
+        columns["modifier2_sector"], columns["modifier2"]
+    )
+    return columns
+
+
+def _join_columns(sectors, modifiers):
+    return [
+        sector + modifier if sector is not None else None
+        for sector, modifier in zip(sectors, modifiers)
+    ]
+
+
+def validate_many(codes):
+    """Validate a batch of SIDCs against the symbol catalog
+
+    Returns {index of code: [invalid fields]} for the invalid codes only,
+    a malformed code is reported with the single field "format".
+    """
+    columns = decode_many(codes)
+    errors = {}
+
+    def add_error(i, field):
+        errors.setdefault(i, []).append(field)
+
+    for i, version in enumerate(columns["version"]):
+        if version is None:
+            add_error(i, FORMAT_ERROR)
+        elif version != catalog.VERSION:
+            add_error(i, "version")
+
+    for field, group_name in BUTTON_FIELDS:
+        allowed = set(catalog.BUTTONS[group_name].values())
+        for i, value in enumerate(columns[field]):
+            if value is not None and value not in allowed:
+                add_error(i, field)
+
+    # Group codes by symbol set, so each set is loaded once
+    symbol_set_lookup = catalog.get_symbol_set_lookup()
+    by_symbol_set = {}
+    for i, value in enumerate(columns["symbol_set"]):
+        if value is None:
+            continue
+        if value not in symbol_set_lookup:
+            add_error(i, "symbol_set")
+            continue
+        by_symbol_set.setdefault(value, []).append(i)
+
+    for value, indexes in by_symbol_set.items():
+        set_id = catalog.SYMBOLS[symbol_set_lookup[value][0]]["id"]
+        for field, table_name in SYMBOL_SET_FIELDS:
+            lookup = catalog.get_table_lookup(set_id, table_name)
+            column = columns[field]
+            for i in indexes:
+                if column[i] not in lookup:
+                    add_error(i, field)
+
+    return errors
+
+
+def validate(code):
+    """Get the invalid fields of a single SIDC, empty if it is valid"""
+    return validate_many([code]).get(0, [])
@@ -0,0 +1,187 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Full text search index of the favorites library
+
+The index is a SQLite database next to the favorites manifest with an FTS
+table over the name, category, SIDC and modifier text of every symbol. It
+only mirrors the manifest: it records the signature of the manifest it was
+built from and is rebuilt when they differ, so it can be deleted at any
+time. Python builds without sqlite3 or without FTS support get no index,
+and searching falls back to matching_words() over the manifest.
+"""
+
+import os
+import re
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+INDEX_FILE = "favorites.sqlite"
+INDEX_VERSION = "1"
+
+_WORD_SPLIT = re.compile(r"[^\w]+")
+
+
+def split_words(text):
+    """Split text into lower case words like the FTS tokenizer"""
+    return [word for word in _WORD_SPLIT.split(text.lower()) if word]
+
+
+def get_search_text(category_name, entry):
+    """Get (name, category, sidc, modifiers) to search for a manifest entry"""
+    params = entry["params"]
+    modifiers = " ".join(
+        str(value)
+        for key, value in params.items()
+        if key != "sidc" and isinstance(value, str) and value
+    )
+    return (entry["name"], category_name, str(params.get("sidc", "")), modifiers)
+
+
+def matching_words(query_words, texts):
+    """Check if every query word is the prefix of a word of texts"""
+    words = []
+    for text in texts:
+        words.extend(split_words(text))
+    return all(any(word.startswith(q) for word in words) for q in query_words)
+
+
+class FavoritesIndex:
+    """SQLite FTS index of (category, symbol) pairs"""
+
+    def __init__(self, connection, fts_module):
+        self._connection = connection
+        self._fts_module = fts_module
+
+    @classmethod
+    def open(cls, directory):
+        """Open the index of a favorites directory, None if it is not supported"""
+        if sqlite3 is None:
+            return None
+
+        try:
+            connection = sqlite3.connect(os.path.join(directory, INDEX_FILE))
+        except sqlite3.Error as e:
+            print(f"Error opening favorites index: {e}")
+            return None
+
+        for fts_module in ("fts5", "fts4"):
+            try:
+                index = FavoritesIndex(connection, fts_module)
+                index._create_tables()
+                return index
+            except sqlite3.Error:
+                continue
+
+        print("SQLite has no full text search, favorites are searched linearly")
+        connection.close()
+        return None
+
+    def _create_tables(self):
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            version = self._get_meta("version")
+            if version is not None and version != INDEX_VERSION + self._fts_module:
+                self._connection.execute("DROP TABLE IF EXISTS symbols")
+                self._connection.execute("DROP TABLE IF EXISTS symbols_fts")
+                self._connection.execute("DELETE FROM meta")
+
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS symbols ("
+                "id INTEGER PRIMARY KEY, category TEXT, name TEXT, "
+                "UNIQUE (category, name))"
+            )
+            self._connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS symbols_fts "
+                f"USING {self._fts_module}(name, category, sidc, modifiers)"
+            )
+            self._set_meta("version", INDEX_VERSION + self._fts_module)
+
+    def _get_meta(self, key):
+        row = self._connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def is_current(self, signature):
+        """Check if the index was built from the manifest with signature"""
+        return self._get_meta("manifest") == signature
+
+    def rebuild(self, categories, signature):
+        """Index all entries of {category: [entry]}"""
+        with self._connection:
+            self._connection.execute("DELETE FROM symbols")
+            self._connection.execute("DELETE FROM symbols_fts")
+            for category_name, entries in categories.items():
+                for entry in entries:
+                    self._insert(category_name, entry)
+            self._set_meta("manifest", signature)
+
+    def update(self, removed, added, signature):
+        """Remove [(category, name)] and add [(category, entry)] in one transaction"""
+        with self._connection:
+            for category_name, name in removed:
+                self._delete(category_name, name)
+            for category_name, entry in added:
+                self._delete(category_name, entry["name"])
+                self._insert(category_name, entry)
+            self._set_meta("manifest", signature)
+
+    def _insert(self, category_name, entry):
+        cursor = self._connection.execute(
+            "INSERT INTO symbols (category, name) VALUES (?, ?)",
+            (category_name, entry["name"]),
+        )
+        self._connection.execute(
+            "INSERT INTO symbols_fts (rowid, name, category, sidc, modifiers) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (cursor.lastrowid,) + get_search_text(category_name, entry),
+        )
+
+    def _delete(self, category_name, name):
+        row = self._connection.execute(
+            "SELECT id FROM symbols WHERE category = ? AND name = ?",
+            (category_name, name),
+        ).fetchone()
+        if row is None:
+            return
+        self._connection.execute("DELETE FROM symbols WHERE id = ?", row)
+        self._connection.execute("DELETE FROM symbols_fts WHERE rowid = ?", row)
+
+    def search(self, query_words):
+        """Get the set of (category, name) matching every query word"""
+        rows = self._connection.execute(
+            "SELECT symbols.category, symbols.name FROM symbols_fts "
+            "JOIN symbols ON symbols.id = symbols_fts.rowid "
+            "WHERE symbols_fts MATCH ?",
+            (self._make_match_query(query_words),),
+        )
+        return set(rows)
+
+    def _make_match_query(self, query_words):
+        """Get the MATCH expression of prefix queries for all words"""
+        if self._fts_module == "fts5":
+            return " ".join(
+                '"' + word.replace('"', '""') + '"*' for word in query_words
+            )
+        # FTS4 has no quoted prefix tokens, words never contain operators
+        return " ".join(word + "*" for word in query_words)
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,725 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Favorites library of the sidebar
+
+The order and the parameters of all favorites are kept in one manifest,
+favorites.json, in the favorites directory. The previews stay one SVG file
+per symbol, in one directory per category, since the sidebar tree shows
+them by URL. Loading the library reads the manifest only, and every change
+rewrites it atomically, so it never has to be rebuilt from the SVG files.
+
+Several office processes may share the directory. A change holds the lock
+file favorites.lock while it re-reads the manifest, applies the change and
+saves, so changes saved by another process in between are merged instead
+of overwritten.
+
+Manifest format:
+
+    {
+        "version": 1,
+        "categories": {
+            "<category>": [
+                {
+                    "name": "<symbol>",
+                    "params": {"sidc": ...},
+                    "svg": "<category>/<symbol>.svg",
+                    "hash": "<get_content_hash() of params and SVG>"
+                },
+                ...
+            ]
+        }
+    }
+
+Older versions stored a <symbol>.json file with the parameters and an
+"order_index" next to each SVG. Loading imports the ones whose symbol is
+not in the manifest yet, so a library is migrated on its first load and
+files dropped in later, e.g. by a deployment script, are picked up on the
+next one. Existing files are left in place and are removed, renamed and
+updated with their symbols, so a removed symbol is not imported again.
+Symbols added since get no such file, older versions of the extension do
+not show them.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+from favorites_index import (
+    FavoritesIndex,
+    get_search_text,
+    matching_words,
+    split_words,
+)
+
+MANIFEST_FILE = "favorites.json"
+LOCK_FILE = "favorites.lock"
+MANIFEST_VERSION = 1
+
+LEGACY_SUFFIX = ".json"
+SVG_SUFFIX = ".svg"
+# Appended to previews written by an import until the symbol is added
+IMPORT_SUFFIX = ".import"
+
+
+class FavoritesStore:
+    """Manifest backed favorites of one favorites directory"""
+
+    _instances = {}
+
+    def __init__(self, directory):
+        self.directory = directory
+        # category name -> [{"name", "params", "svg"}] in sidebar order
+        self._categories = {}
+        self._loaded = False
+        # optional search index, None if it is not available
+        self._index = None
+        self._index_opened = False
+        # nesting depth of _manifest_lock()
+        self._lock_depth = 0
+        # category name -> {symbol name: entry}
+        self._names = {}
+        # signature of the manifest as last read or written
+        self._signature = None
+        # incremented on every change, to detect outdated views
+        self.revision = 0
+        self._listeners = []
+
+    @classmethod
+    def get_instance(cls, directory):
+        """Get the store of a favorites directory, shared by all sidebars"""
+        store = cls._instances.get(directory)
+        if store is None:
+            store = FavoritesStore(directory)
+            cls._instances[directory] = store
+        return store
+
+    def get_manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def load(self, reload=False):
+        """Read the manifest, migrating legacy favorites if there is none"""
+        if self._loaded and not reload:
+            return
+
+        with self._manifest_lock():
+            manifest = self._read_manifest()
+            self._categories = (
+                {} if manifest is None else manifest.get("categories", {})
+            )
+            self._loaded = True
+            self._signature = self._get_manifest_signature()
+            self._index_names()
+
+            legacy_categories = self._read_legacy_favorites()
+            if legacy_categories:
+                for category_name, entries in legacy_categories.items():
+                    self._categories.setdefault(category_name, []).extend(entries)
+                self._index_names()
+                self.save()
+        self.revision += 1
+
+        index = self._get_index()
+        if index is not None:
+            signature = self._get_manifest_signature()
+            try:
+                if not index.is_current(signature):
+                    index.rebuild(self._categories, signature)
+            except Exception as e:
+                self._drop_index(e)
+
+    def _index_names(self):
+        self._names = {
+            category_name: {entry["name"]: entry for entry in entries}
+            for category_name, entries in self._categories.items()
+        }
+
+    def sync(self):
+        """Apply changes of the manifest made by other processes
+
+        Only the categories whose entries differ are compared symbol by
+        symbol, the listeners get the changed symbols only.
+
+        Returns:
+            True if the favorites changed
+        """
+        if not self._loaded:
+            return False
+
+        signature = self._get_manifest_signature()
+        if signature == self._signature:
+            return False
+
+        manifest = self._read_manifest()
+        if manifest is None:
+            return False
+        self._signature = signature
+
+        new_categories = manifest.get("categories", {})
+        changes = []
+        for category_name in sorted(self._categories.keys() | new_categories.keys()):
+            old_entries = self._categories.get(category_name, [])
+            new_entries = new_categories.get(category_name, [])
+            if old_entries != new_entries:
+                changes += _diff_entries(category_name, old_entries, new_entries)
+
+        self._categories = new_categories
+        self._index_names()
+        if changes:
+            self._publish(changes)
+        return bool(changes)
+
+    def _read_manifest(self):
+        try:
+            with open(self.get_manifest_path(), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading favorites manifest: {e}")
+            return None
+
+        if (
+            not isinstance(manifest, dict)
+            or manifest.get("version") != MANIFEST_VERSION
+        ):
+            print("Unsupported favorites manifest, ignoring it")
+            return None
+        return manifest
+
+    def _get_manifest_signature(self):
+        try:
+            stat = os.stat(self.get_manifest_path())
+        except OSError:
+            return ""
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    @contextmanager
+    def _manifest_lock(self):
+        """Hold the lock file of the directory, nested calls share the lock"""
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, LOCK_FILE), "a+b") as f:
+            _lock_file(f)
+            self._lock_depth = 1
+            try:
+                yield
+            finally:
+                self._lock_depth = 0
+                _unlock_file(f)
+
+    def save(self):
+        """Write the manifest atomically"""
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = {"version": MANIFEST_VERSION, "categories": self._categories}
+        write_atomic(
+            self.get_manifest_path(),
+            json.dumps(manifest, ensure_ascii=False, separators=(",", ":")),
+        )
+        self._signature = self._get_manifest_signature()
+
+    def _get_index(self):
+        if not self._index_opened:
+            self._index_opened = True
+            os.makedirs(self.directory, exist_ok=True)
+            self._index = FavoritesIndex.open(self.directory)
+        return self._index
+
+    def _drop_index(self, error):
+        print(f"Error updating favorites index, searching linearly: {error}")
+        if self._index is not None:
+            self._index.close()
+        self._index = None
+
+    def _update_index(self, removed, added):
+        """Apply a saved change to the search index
+
+        Args:
+            removed: List of (category, name) of the removed symbols
+            added: List of (category, entry) of the added or changed symbols
+        """
+        index = self._get_index()
+        if index is None:
+            return
+        try:
+            index.update(removed, added, self._get_manifest_signature())
+        except Exception as e:
+            self._drop_index(e)
+
+    def search(self, text):
+        """Get the set of (category, name) of the symbols matching text
+
+        Every word of text has to be the prefix of a word of the name,
+        category, SIDC or modifiers of a symbol.
+        """
+        self.load()
+        query_words = split_words(text)
+        if not query_words:
+            return {
+                (category_name, entry["name"])
+                for category_name, entries in self._categories.items()
+                for entry in entries
+            }
+
+        if self._index is not None:
+            try:
+                return self._index.search(query_words)
+            except Exception as e:
+                self._drop_index(e)
+
+        return {
+            (category_name, entry["name"])
+            for category_name, entries in self._categories.items()
+            for entry in entries
+            if matching_words(query_words, get_search_text(category_name, entry))
+        }
+
+    def _iter_category_dirs(self):
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError:
+            return
+        for name in names:
+            if os.path.isdir(os.path.join(self.directory, name)):
+                yield name
+
+    def _get_legacy_path(self, category_name, symbol_name):
+        return os.path.join(self.directory, category_name, symbol_name + LEGACY_SUFFIX)
+
+    def _read_legacy_favorites(self):
+        """Collect the per symbol JSON files of symbols missing in the manifest"""
+        categories = {}
+        for category_name in self._iter_category_dirs():
+            category_path = os.path.join(self.directory, category_name)
+            known_names = self._names.get(category_name, {})
+            items = []
+            for file_name in sorted(os.listdir(category_path)):
+                if not file_name.lower().endswith(LEGACY_SUFFIX):
+                    continue
+                symbol_name = file_name[: -len(LEGACY_SUFFIX)]
+                if symbol_name in known_names:
+                    continue
+                try:
+                    with open(
+                        os.path.join(category_path, file_name), "r", encoding="utf-8"
+                    ) as f:
+                        params = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"Error reading favorite {file_name}: {e}")
+                    continue
+                if not isinstance(params, dict):
+                    continue
+
+                order_index = params.pop("order_index", 0)
+                if not isinstance(order_index, (int, float)):
+                    order_index = 0
+                items.append(
+                    (order_index, _make_entry(category_name, symbol_name, params))
+                )
+
+            if items:
+                items.sort(key=lambda item: item[0])
+                categories[category_name] = [entry for _order, entry in items]
+        return categories
+
+    def _update_legacy_file(self, category_name, symbol_name, params):
+        """Write new parameters to the legacy file of a symbol, if it has one"""
+        path = self._get_legacy_path(category_name, symbol_name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                legacy_params = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        data = dict(params)
+        if isinstance(legacy_params, dict) and "order_index" in legacy_params:
+            data["order_index"] = legacy_params["order_index"]
+        try:
+            write_atomic(path, json.dumps(data, ensure_ascii=False))
+        except OSError as e:
+            print(f"Error updating legacy favorite {path}: {e}")
+
+    def get_category_names(self):
+        self.load()
+        return sorted(self._categories)
+
+    def get_symbols(self, category_name):
+        """Get the entries of a category in sidebar order"""
+        self.load()
+        return self._categories.get(category_name, [])
+
+    def get_symbol_names(self, category_name):
+        """Get the set of symbol names of a category"""
+        self.load()
+        return self._names.get(category_name, {}).keys()
+
+    def get_symbol(self, category_name, symbol_name):
+        self.load()
+        return self._names.get(category_name, {}).get(symbol_name)
+
+    def get_index(self, category_name, symbol_name):
+        """Get the position of a symbol in its category, -1 if it does not exist"""
+        entry = self.get_symbol(category_name, symbol_name)
+        if entry is None:
+            return -1
+        return self._categories[category_name].index(entry)
+
+    def has_symbol(self, category_name, symbol_name):
+        return self.get_symbol(category_name, symbol_name) is not None
+
+    def has_symbols(self):
+        self.load()
+        return any(self._categories.values())
+
+    def get_svg_path(self, category_name, symbol_name):
+        entry = self.get_symbol(category_name, symbol_name)
+        if entry is not None:
+            svg = entry["svg"]
+        else:
+            svg = os.path.join(category_name, symbol_name + SVG_SUFFIX)
+        return os.path.join(self.directory, svg)
+
+    def add_listener(self, listener):
+        """Call listener(changes) after every change of the favorites
+
+        changes is a list of tuples, in the order they were applied:
+            ("insert", category, index, entry)
+            ("update", category, entry)
+            ("remove", category, name)
+            ("rename", category, old name, entry)
+
+        Every call increases revision by one, so listeners that saw the
+        previous revision know they did not miss a change.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def add_symbol(self, category_name, symbol_name, params, svg_data, index=None):
+        """Add or replace a symbol, appended to its category unless index is given"""
+        with self._manifest_lock():
+            self._prepare()
+            changes = self._add(category_name, symbol_name, params, svg_data, index)
+            self._commit(changes)
+            return changes[-1][-1]
+
+    def move_symbol(
+        self, category_name, symbol_name, new_category_name, new_name, params, svg_data
+    ):
+        """Replace a symbol with a new one appended to another category"""
+        with self._manifest_lock():
+            self._prepare()
+            changes = self._remove(category_name, symbol_name)
+            changes += self._add(new_category_name, new_name, params, svg_data)
+            self._commit(changes)
+            return changes[-1][-1]
+
+    def remove_symbol(self, category_name, symbol_name):
+        """Remove a symbol and its preview, and its category once it is empty"""
+        with self._manifest_lock():
+            self._prepare()
+            changes = self._remove(category_name, symbol_name)
+            if not changes:
+                return False
+            self._commit(changes)
+            return True
+
+    def rename_symbol(self, category_name, old_name, new_name):
+        """Rename a symbol and its preview, returns the new SVG path or None
+
+        Raises ValueError if new_name is not a valid file name and OSError
+        if the preview cannot be renamed, the symbol is unchanged then.
+        """
+        if not is_file_name(new_name):
+            raise ValueError(f"Invalid favorite name: {new_name!r}")
+
+        with self._manifest_lock():
+            self._prepare()
+            entry = self.get_symbol(category_name, old_name)
+            if entry is None or self.has_symbol(category_name, new_name):
+                return None
+
+            new_svg = os.path.join(category_name, new_name + SVG_SUFFIX)
+            new_svg_path = os.path.join(self.directory, new_svg)
+            os.rename(os.path.join(self.directory, entry["svg"]), new_svg_path)
+            entry["name"] = new_name
+            entry["svg"] = new_svg
+            try:
+                os.rename(
+                    self._get_legacy_path(category_name, old_name),
+                    self._get_legacy_path(category_name, new_name),
+                )
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error renaming legacy favorite {old_name}: {e}")
+
+            names = self._names[category_name]
+            del names[old_name]
+            names[new_name] = entry
+
+            self._commit([("rename", category_name, old_name, entry)])
+            return new_svg_path
+
+    def add_imported_symbols(self, items):
+        """Add symbols whose previews were already written by an import
+
+        Args:
+            items: List of (category, name, params, content hash, path), the
+                preview at path replaces the one of the symbol. Symbols with
+                the name of an existing symbol replace it
+        """
+        with self._manifest_lock():
+            self._prepare()
+            changes = []
+            for category_name, symbol_name, params, content_hash, path in items:
+                try:
+                    os.replace(
+                        path,
+                        os.path.join(
+                            self.directory, category_name, symbol_name + SVG_SUFFIX
+                        ),
+                    )
+                except OSError as e:
+                    print(f"Error adding imported favorite {symbol_name}: {e}")
+                    continue
+                changes += self._add(
+                    category_name, symbol_name, params, None, content_hash=content_hash
+                )
+            if changes:
+                self._commit(changes)
+
+    def get_snapshot(self):
+        """Get a copy of {category: [entry]} for use off the main thread"""
+        self.load()
+        return {
+            category_name: [dict(entry) for entry in entries]
+            for category_name, entries in self._categories.items()
+        }
+
+    def _add(
+        self,
+        category_name,
+        symbol_name,
+        params,
+        svg_data,
+        index=None,
+        content_hash=None,
+    ):
+        """Write the preview and add or replace the entry in memory
+
+        svg_data is None if the preview was written already, then
+        content_hash is the get_content_hash() of the preview.
+        """
+        if svg_data is not None:
+            content_hash = get_content_hash(params, svg_data)
+        entry = _make_entry(category_name, symbol_name, params, content_hash)
+        if svg_data is not None:
+            svg_path = os.path.join(self.directory, entry["svg"])
+            os.makedirs(os.path.dirname(svg_path), exist_ok=True)
+            write_atomic(svg_path, svg_data)
+
+        symbols = self._categories.setdefault(category_name, [])
+        names = self._names.setdefault(category_name, {})
+        old_entry = names.get(symbol_name)
+        names[symbol_name] = entry
+
+        changes = []
+        if old_entry is not None:
+            self._update_legacy_file(category_name, symbol_name, params)
+            old_index = symbols.index(old_entry)
+            if index is None or index == old_index:
+                symbols[old_index] = entry
+                return [("update", category_name, entry)]
+            del symbols[old_index]
+            changes.append(("remove", category_name, symbol_name))
+
+        if index is None or index > len(symbols):
+            index = len(symbols)
+        symbols.insert(index, entry)
+        changes.append(("insert", category_name, index, entry))
+        return changes
+
+    def _remove(self, category_name, symbol_name):
+        """Remove the entry from memory and delete its preview"""
+        entry = self._names.get(category_name, {}).pop(symbol_name, None)
+        if entry is None:
+            return []
+
+        symbols = self._categories[category_name]
+        symbols.remove(entry)
+        for path in (
+            os.path.join(self.directory, entry["svg"]),
+            self._get_legacy_path(category_name, symbol_name),
+        ):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        if not symbols:
+            del self._categories[category_name]
+            del self._names[category_name]
+            category_path = os.path.join(self.directory, category_name)
+            try:
+                if os.path.isdir(category_path) and not os.listdir(category_path):
+                    os.rmdir(category_path)
+            except OSError:
+                pass
+
+        return [("remove", category_name, symbol_name)]
+
+    def _prepare(self):
+        """Load the favorites and pick up changes of other processes
+
+        Changing an outdated model would overwrite them with the next save.
+        Called with the manifest lock held until the change is committed.
+        """
+        self.load()
+        self.sync()
+
+    def _commit(self, changes):
+        """Save the manifest, then publish the changes"""
+        self.save()
+        self._publish(changes)
+
+    def _publish(self, changes):
+        """Pass saved changes to the index and the listeners"""
+        self.revision += 1
+
+        removed = []
+        added = []
+        for change in changes:
+            if change[0] == "remove":
+                removed.append((change[1], change[2]))
+            elif change[0] == "rename":
+                removed.append((change[1], change[2]))
+                added.append((change[1], change[3]))
+            else:
+                added.append((change[1], change[-1]))
+        self._update_index(removed, added)
+
+        for listener in list(self._listeners):
+            try:
+                listener(changes)
+            except Exception as e:
+                print(f"Error notifying favorites listener: {e}")
+
+
+def _diff_entries(category_name, old_entries, new_entries):
+    """Get the changes turning the entries of a category into new_entries
+
+    Removals come first, then updates, then insertions in increasing index
+    order, so every index is valid when the change is applied.
+    """
+    new_names = {entry["name"]: entry for entry in new_entries}
+    old_names = {entry["name"]: entry for entry in old_entries}
+
+    kept = [entry["name"] for entry in old_entries if entry["name"] in new_names]
+    new_order = [entry["name"] for entry in new_entries if entry["name"] in old_names]
+    if kept != new_order:
+        # reordered, reinsert all symbols instead of tracking moves
+        kept = []
+
+    changes = []
+    kept_names = set(kept)
+    for entry in old_entries:
+        if entry["name"] not in kept_names:
+            changes.append(("remove", category_name, entry["name"]))
+    for name in kept:
+        if old_names[name] != new_names[name]:
+            changes.append(("update", category_name, new_names[name]))
+    for index, entry in enumerate(new_entries):
+        if entry["name"] not in kept_names:
+            changes.append(("insert", category_name, index, entry))
+    return changes
+
+
+def get_content_hash(params, svg_data):
+    """Get the hash identifying a symbol by its parameters and preview"""
+    if isinstance(svg_data, str):
+        svg_data = svg_data.encode("utf-8")
+    key = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(key.encode("utf-8") + b"\0" + svg_data).hexdigest()
+
+
+def is_file_name(name):
+    """Check that name can be used as a category or symbol file name"""
+    return (
+        isinstance(name, str)
+        and name not in ("", ".", "..")
+        and "/" not in name
+        and "\\" not in name
+    )
+
+
+def _make_entry(category_name, symbol_name, params, content_hash=None):
+    entry = {
+        "name": symbol_name,
+        "params": params,
+        "svg": os.path.join(category_name, symbol_name + SVG_SUFFIX),
+    }
+    if content_hash:
+        entry["hash"] = content_hash
+    return entry
+
+
+if sys.platform == "win32":
+
+    def _lock_file(f):
+        """Block until the exclusive lock on the open file f is acquired"""
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after 10 seconds
+                continue
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+else:
+
+    def _lock_file(f):
+        """Block until the exclusive lock on the open file f is acquired"""
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def write_atomic(path, data):
+    """Replace the file at path with text or bytes data"""
+    tmp_path = path + ".tmp"
+    if isinstance(data, bytes):
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,349 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Export and import of favorites libraries
+
+A bundle is a zip archive with favorites.json, a manifest in the format of
+FavoritesStore, and the SVG file of every symbol at the path named by the
+manifest. Bundles are written and read one symbol at a time, so memory use
+does not grow with the size of the library. The JSON files exported by
+older versions,
+
+    {"<category>": {"<symbol>": {"data": {"sidc": ...}, "svg": "<svg ...>"}}}
+
+can still be written, symbol by symbol, and read.
+
+Imports skip symbols whose content hash already exists in their category,
+so importing the same bundle again writes nothing, and symbols with a
+malformed SIDC, which could not be edited. SIDCs with values unknown to the
+catalog, e.g. from a newer version, are imported with a warning. Export and import run
+in a BackgroundTask, which reports progress in the status bar and hands the
+result over to the main thread, where the favorites store is changed.
+
+The background thread writes imported previews under temporary names. They
+replace the previews of existing symbols only when the store adds the
+symbols on the main thread, so the library never shows a preview that does
+not match its manifest entry.
+"""
+
+import json
+import os
+import threading
+import time
+import zipfile
+
+import unohelper
+
+from com.sun.star.awt import XCallback
+
+from data import sidc_codec
+from favorites_store import (
+    MANIFEST_FILE,
+    MANIFEST_VERSION,
+    IMPORT_SUFFIX,
+    SVG_SUFFIX,
+    get_content_hash,
+    is_file_name,
+    write_atomic,
+)
+
+BUNDLE_SUFFIX = ".zip"
+
+
+def export_favorites(path, directory, categories, progress):
+    """Write a bundle, or a JSON file if path does not end with .zip
+
+    Args:
+        path: System path of the export file
+        directory: Favorites directory
+        categories: FavoritesStore.get_snapshot() of the favorites
+        progress: Callable taking (exported symbols, all symbols)
+    """
+    if path.lower().endswith(BUNDLE_SUFFIX):
+        _write_bundle(path, directory, categories, progress)
+    else:
+        _write_json(path, directory, categories, progress)
+
+
+def _write_bundle(path, directory, categories, progress):
+    total = sum(len(entries) for entries in categories.values())
+    done = 0
+    manifest = {"version": MANIFEST_VERSION, "categories": {}}
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for category_name, entries in categories.items():
+            bundle_entries = manifest["categories"][category_name] = []
+            for entry in entries:
+                arcname = f"{category_name}/{entry['name']}{SVG_SUFFIX}"
+                bundle.write(os.path.join(directory, entry["svg"]), arcname)
+                bundle_entry = dict(entry)
+                bundle_entry["svg"] = arcname
+                bundle_entries.append(bundle_entry)
+
+                done += 1
+                progress(done, total)
+
+        bundle.writestr(
+            MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False, indent=1)
+        )
+    os.replace(tmp_path, path)
+
+
+def _write_json(path, directory, categories, progress):
+    total = sum(len(entries) for entries in categories.values())
+    done = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for i, (category_name, entries) in enumerate(categories.items()):
+            f.write("," if i else "")
+            f.write(f"\n    {json.dumps(category_name, ensure_ascii=False)}: {{")
+            for order_index, entry in enumerate(entries, start=1):
+                with open(
+                    os.path.join(directory, entry["svg"]), "r", encoding="utf-8"
+                ) as svg_file:
+                    svg_content = svg_file.read()
+
+                data = dict(entry["params"])
+                data["order_index"] = order_index
+                symbol = {"data": data, "svg": svg_content}
+                f.write("," if order_index > 1 else "")
+                f.write(f"\n        {json.dumps(entry['name'], ensure_ascii=False)}: ")
+                f.write(json.dumps(symbol, ensure_ascii=False))
+
+                done += 1
+                progress(done, total)
+            f.write("\n    }")
+        f.write("\n}\n")
+    os.replace(tmp_path, path)
+
+
+def import_favorites(path, directory, categories, progress):
+    """Write the previews of the new symbols of a bundle or JSON file
+
+    Args:
+        path: System path of the file to import
+        directory: Favorites directory
+        categories: FavoritesStore.get_snapshot() of the favorites
+        progress: Callable taking (read symbols, all symbols)
+
+    Returns:
+        List of (category, name, params, content hash, preview path) for
+        FavoritesStore.add_imported_symbols(), the previews are written
+        under temporary names
+    """
+    existing_hashes = {
+        category_name: {_get_entry_hash(directory, entry) for entry in entries}
+        for category_name, entries in categories.items()
+    }
+
+    if zipfile.is_zipfile(path):
+        total, symbols = _read_bundle(path)
+    else:
+        total, symbols = _read_json(path)
+
+    items = []
+    try:
+        _import_symbols(directory, symbols, total, existing_hashes, items, progress)
+    except Exception:
+        discard_imported_previews(items)
+        raise
+    return items
+
+
+def _import_symbols(directory, symbols, total, existing_hashes, items, progress):
+    for done, (category_name, symbol_name, params, svg_data) in enumerate(
+        symbols, start=1
+    ):
+        progress(done, total)
+        if not (is_file_name(category_name) and is_file_name(symbol_name)):
+            print(f"Skipping favorite with invalid name: {category_name}/{symbol_name}")
+            continue
+        invalid_fields = sidc_codec.validate(params.get("sidc"))
+        if sidc_codec.FORMAT_ERROR in invalid_fields:
+            print(
+                f"Skipping favorite with malformed SIDC: {category_name}/{symbol_name}"
+            )
+            continue
+        if invalid_fields:
+            print(
+                f"Favorite {category_name}/{symbol_name} has unknown SIDC values: "
+                + ", ".join(invalid_fields)
+            )
+
+        content_hash = get_content_hash(params, svg_data)
+        hashes = existing_hashes.setdefault(category_name, set())
+        if content_hash in hashes:
+            continue
+        hashes.add(content_hash)
+
+        category_path = os.path.join(directory, category_name)
+        os.makedirs(category_path, exist_ok=True)
+        tmp_path = os.path.join(category_path, symbol_name + SVG_SUFFIX + IMPORT_SUFFIX)
+        write_atomic(tmp_path, svg_data)
+        items.append((category_name, symbol_name, params, content_hash, tmp_path))
+
+
+def discard_imported_previews(items):
+    """Delete the temporary previews of import_favorites() items"""
+    for item in items:
+        try:
+            os.remove(item[-1])
+        except OSError:
+            pass
+
+
+def _read_bundle(path):
+    """Get (symbol count, iterator of (category, name, params, SVG bytes))"""
+    bundle = zipfile.ZipFile(path)
+    try:
+        manifest = json.loads(bundle.read(MANIFEST_FILE).decode("utf-8"))
+    except Exception:
+        bundle.close()
+        raise
+    if manifest.get("version") != MANIFEST_VERSION:
+        bundle.close()
+        raise ValueError("Unsupported favorites bundle version")
+
+    categories = manifest.get("categories", {})
+
+    def symbols():
+        with bundle:
+            for category_name, entries in categories.items():
+                for entry in entries:
+                    svg_data = bundle.read(entry["svg"])
+                    yield category_name, entry["name"], entry["params"], svg_data
+
+    return sum(len(entries) for entries in categories.values()), symbols()
+
+
+def _read_json(path):
+    """Get (symbol count, iterator of (category, name, params, SVG text))"""
+    with open(path, "r", encoding="utf-8") as f:
+        all_data = json.load(f)
+
+    def symbols():
+        for category_name, category_symbols in all_data.items():
+            items = []
+            for symbol_name, symbol_content in category_symbols.items():
+                params = dict(symbol_content["data"])
+                order_index = params.pop("order_index", 0)
+                if not isinstance(order_index, (int, float)):
+                    order_index = 0
+                items.append((order_index, symbol_name, params, symbol_content["svg"]))
+            items.sort(key=lambda item: item[0])
+
+            for _order, symbol_name, params, svg_data in items:
+                yield category_name, symbol_name, params, svg_data
+
+    total = sum(len(category_symbols) for category_symbols in all_data.values())
+    return total, symbols()
+
+
+def _get_entry_hash(directory, entry):
+    """Get the content hash of an entry, from its preview if not recorded"""
+    content_hash = entry.get("hash")
+    if content_hash:
+        return content_hash
+    try:
+        with open(os.path.join(directory, entry["svg"]), "rb") as f:
+            return get_content_hash(entry["params"], f.read())
+    except OSError:
+        return None
+
+
+class BackgroundTask:
+    """Runs work off the main thread with progress in the status bar"""
+
+    # Seconds between two progress updates
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, ctx, frame, text):
+        self._text = text
+        self._indicator = None
+        self._started = False
+        self._last_progress = 0.0
+        self._async_callback = None
+        try:
+            if frame is not None:
+                self._indicator = frame.createStatusIndicator()
+            self._async_callback = ctx.getServiceManager().createInstanceWithContext(
+                "com.sun.star.awt.AsyncCallback", ctx
+            )
+        except Exception as e:
+            print(f"AsyncCallback not available, {text.lower()} directly: {e}")
+
+    def start(self, work, done=None):
+        """Call work(progress) in a thread, then done(result) on the main thread"""
+        if self._async_callback is None:
+            self._finish(work, done)
+            return
+
+        thread = threading.Thread(target=self._run, args=(work, done), daemon=True)
+        thread.start()
+
+    def _finish(self, work, done):
+        try:
+            result = work(lambda value, total: None)
+            if done is not None:
+                done(result)
+        except Exception as e:
+            print(f"Error {self._text.lower()}: {e}")
+
+    def _run(self, work, done):
+        try:
+            result = work(self._report)
+            error = None
+        except Exception as e:
+            result = None
+            error = e
+        self._post(lambda: self._end(done, result, error))
+
+    def _report(self, value, total):
+        """Progress callback of work, called in the thread"""
+        now = time.monotonic()
+        if value < total and now - self._last_progress < self.PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        self._post(lambda: self._set_progress(value, total))
+
+    def _set_progress(self, value, total):
+        if self._indicator is None:
+            return
+        if not self._started:
+            self._indicator.start(self._text, total)
+            self._started = True
+        self._indicator.setValue(value)
+
+    def _end(self, done, result, error):
+        if self._indicator is not None and self._started:
+            self._indicator.end()
+        if error is not None:
+            print(f"Error {self._text.lower()}: {error}")
+        elif done is not None:
+            done(result)
+
+    def _post(self, function):
+        if self._async_callback is None:
+            return
+        try:
+            self._async_callback.addCallback(_Call(function), None)
+        except Exception as e:
+            print(f"Error posting {self._text.lower()} to the main thread: {e}")
+
+
+class _Call(unohelper.Base, XCallback):
+    def __init__(self, function):
+        self._function = function
+
+    def notify(self, data):
+        try:
+            self._function()
+        except Exception as e:
+            print(f"Error in main thread callback: {e}")
@@ -0,0 +1,172 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Watcher of the favorites directory
+
+Other LibreOffice instances or deployment scripts may change the favorites
+library of the user profile. Every change of the library rewrites its
+manifest, so the watcher only has to notice when favorites.json changes:
+with inotify on Linux, by polling its size and modification time
+elsewhere. The background thread never touches the store, it posts a
+callback to the main thread which calls FavoritesStore.sync(), and the
+store reports the changed symbols to the open sidebar panels.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import threading
+
+import unohelper
+
+from com.sun.star.awt import XCallback
+
+# inotify_add_watch() mask: IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE
+_INOTIFY_MASK = 0x002 | 0x008 | 0x080 | 0x200
+
+
+def _open_inotify(directory):
+    """Get an inotify file descriptor watching directory, None if unavailable"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError, TypeError):
+        return None
+    if fd < 0:
+        return None
+
+    if libc.inotify_add_watch(fd, os.fsencode(directory), _INOTIFY_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class FavoritesWatcher:
+    """Keeps a FavoritesStore in sync while sidebar panels are open"""
+
+    _instances = {}
+
+    # Seconds between two checks of the manifest when polling
+    POLL_INTERVAL = 2.0
+    # Seconds to wait for the end of a burst of file events
+    SETTLE_DELAY = 0.2
+
+    def __init__(self, ctx, favorites_store):
+        self._store = favorites_store
+        self._users = 0
+        self._thread = None
+        self._stop = None
+        self._callback = _SyncCallback(favorites_store)
+        self._async_callback = None
+        try:
+            self._async_callback = ctx.getServiceManager().createInstanceWithContext(
+                "com.sun.star.awt.AsyncCallback", ctx
+            )
+        except Exception as e:
+            print(f"AsyncCallback not available, favorites are not watched: {e}")
+
+    @classmethod
+    def get_instance(cls, ctx, favorites_store):
+        """Get the watcher of a favorites store"""
+        watcher = cls._instances.get(favorites_store.directory)
+        if watcher is None:
+            watcher = FavoritesWatcher(ctx, favorites_store)
+            cls._instances[favorites_store.directory] = watcher
+        return watcher
+
+    def acquire(self):
+        """Start watching for one more user, e.g. a sidebar panel"""
+        self._users += 1
+        if self._users == 1 and self._async_callback is not None:
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(self._stop,),
+                name="favorites-watcher",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def release(self):
+        """Stop watching when the last user is gone"""
+        self._users = max(0, self._users - 1)
+        if self._users == 0 and self._stop is not None:
+            self._stop.set()
+            self._stop = None
+            self._thread = None
+
+    def _run(self, stop):
+        manifest_path = self._store.get_manifest_path()
+        fd = _open_inotify(self._store.directory)
+        try:
+            if fd is None:
+                self._poll(stop, manifest_path)
+            else:
+                self._wait_for_events(stop, fd)
+        except Exception as e:
+            print(f"Error watching favorites: {e}")
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _wait_for_events(self, stop, fd):
+        while not stop.is_set():
+            readable, _w, _x = select.select([fd], [], [], self.POLL_INTERVAL)
+            if not readable:
+                continue
+            # Let the writer finish, then handle the whole burst at once
+            stop.wait(self.SETTLE_DELAY)
+            self._drain(fd)
+            if not stop.is_set():
+                self._post_sync()
+
+    @staticmethod
+    def _drain(fd):
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _poll(self, stop, manifest_path):
+        last_signature = _stat_signature(manifest_path)
+        while not stop.wait(self.POLL_INTERVAL):
+            signature = _stat_signature(manifest_path)
+            if signature != last_signature:
+                last_signature = signature
+                self._post_sync()
+
+    def _post_sync(self):
+        """Hand the sync over to the main thread"""
+        if self._async_callback is None:
+            return
+        try:
+            self._async_callback.addCallback(self._callback, None)
+        except Exception as e:
+            print(f"Error posting favorites sync: {e}")
+
+
+def _stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class _SyncCallback(unohelper.Base, XCallback):
+    def __init__(self, favorites_store):
+        self._store = favorites_store
+
+    def notify(self, data):
+        try:
+            self._store.sync()
+        except Exception as e:
+            print(f"Error syncing favorites: {e}")
@@ -0,0 +1,505 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Content addressed store of rendered symbol icons
+
+Tree controls only show images from URLs, so rendered icons have to be
+written to files. The store names every file after a hash of the render
+arguments: units with the same symbol share one file, an icon is rendered
+and written only when its file is missing, and the files are reused across
+sessions from the user profile. The names also cover a digest of the
+bundled milsymbol.js, so icons of an older renderer are not reused after
+an update of the extension.
+
+The store is capped in size. When a write exceeds the cap, the least
+recently used files are deleted, the ones used in this session last, as
+they may still be shown by a tree. Another process sharing the profile may
+delete files too, so a file is checked before its URL is handed out again.
+
+ThumbnailStore keeps PNG thumbnails of SVG files the same way. A tree
+control decodes and scales an SVG every time it loads it; a thumbnail is
+rasterized once at the row height of the tree, under the content hash of
+its source, so a changed source gets a new thumbnail. Missing thumbnails
+can be rasterized later, a few per main loop iteration, while the tree
+shows the SVG files.
+"""
+
+import hashlib
+import json
+import os
+import struct
+
+from collections import OrderedDict
+
+import uno
+import unohelper
+
+from unohelper import fileUrlToSystemPath, systemPathToFileUrl
+
+from com.sun.star.awt import XCallback
+from com.sun.star.beans import PropertyValue
+
+from utils import get_package_location
+
+# Change to invalidate the stored icons when their rendering changes
+ICON_FORMAT = 1
+THUMBNAIL_FORMAT = 1
+
+ICON_SUFFIX = ".svg"
+THUMBNAIL_SUFFIX = ".png"
+
+# Row height of the trees showing thumbnails, in pixels
+THUMBNAIL_HEIGHT = 30
+# Thumbnails rasterized per main loop iteration
+THUMBNAIL_BATCH_SIZE = 8
+
+
+class IconStore:
+    """Icon files of the user profile keyed by their render arguments"""
+
+    _instance = None
+
+    DIRECTORY_NAME = "milsymbol_icons"
+    FORMAT = ICON_FORMAT
+    SUFFIX = ICON_SUFFIX
+    DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+    # Path of the renderer in the extension, None if it does not matter
+    RENDERER_PATH = ("milsymbol", "milsymbol.js")
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, renderer_digest=""):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._renderer_digest = renderer_digest
+        # file name -> size, least recently used first
+        self._files = OrderedDict()
+        self._index_loaded = False
+        self._total_bytes = 0
+        # file name -> URL of the files used in this session
+        self._used = {}
+
+    @classmethod
+    def get_instance(cls, ctx):
+        """Get the store of the user profile"""
+        if cls._instance is None:
+            ps = ctx.getByName("/singletons/com.sun.star.util.thePathSettings")
+            user_profile_path = os.path.dirname(ps.UserConfig)
+            directory = os.path.join(
+                fileUrlToSystemPath(user_profile_path), cls.DIRECTORY_NAME
+            )
+            cls._instance = cls(
+                directory, renderer_digest=cls.get_renderer_digest(ctx)
+            )
+        return cls._instance
+
+    @classmethod
+    def get_renderer_digest(cls, ctx):
+        """Get the digest of the renderer of the installed extension"""
+        if cls.RENDERER_PATH is None:
+            return ""
+        try:
+            package_path = fileUrlToSystemPath(get_package_location(ctx))
+            with open(os.path.join(package_path, *cls.RENDERER_PATH), "rb") as f:
+                return hashlib.sha1(f.read()).hexdigest()
+        except Exception as e:
+            print(f"Error reading the renderer for the icon store: {e}")
+            return ""
+
+    def get_file_name(self, render_args):
+        """Get the file name of the icon rendered from render_args"""
+        key = json.dumps(
+            [self.FORMAT, self._renderer_digest, render_args], separators=(",", ":")
+        )
+        return hashlib.sha1(key.encode("utf-8")).hexdigest() + self.SUFFIX
+
+    def get_url(self, render_args, render):
+        """Get the file URL of an icon, render() is only called on a miss
+
+        Args:
+            render_args: JSON serializable arguments identifying the icon
+            render: Callable returning the data of the icon, SVG text for
+                icons, PNG bytes for thumbnails
+
+        Returns:
+            file:// URL string or None if the icon cannot be stored
+        """
+        name = self.get_file_name(render_args)
+        url = self._used.get(name)
+        if url is not None:
+            if os.path.exists(os.path.join(self._directory, name)):
+                self._files.move_to_end(name)
+                return url
+            # Evicted by another process
+            self._forget(name)
+
+        try:
+            if self._store(name, render) is None:
+                return None
+            return self._used[name]
+        except Exception as e:
+            print(f"Error storing icon: {e}")
+            return None
+
+    def get_svg(self, render_args, render):
+        """Get the SVG data of an icon, render() is only called on a miss"""
+        name = self.get_file_name(render_args)
+        try:
+            path, svg_data = self._store(name, render) or (None, None)
+            if svg_data is None and path is not None:
+                with open(path, "r", encoding="utf-8") as f:
+                    svg_data = f.read()
+            return svg_data
+        except Exception as e:
+            print(f"Error reading stored icon: {e}")
+            return render()
+
+    def get_svgs(self, render_args_list, render_many):
+        """Get the SVG data of many icons, rendering the missing ones at once
+
+        Args:
+            render_args_list: List of JSON serializable render arguments
+            render_many: Callable rendering a list of render arguments into a
+                list of SVG data, called once with the unique missing icons
+
+        Returns:
+            List of SVG data in the order of render_args_list, None for the
+            icons that could not be rendered
+        """
+        names = [self.get_file_name(args) for args in render_args_list]
+        svgs = {}
+        missing = {}
+        for name, args in zip(names, render_args_list):
+            if name in svgs or name in missing:
+                continue
+            svg_data = self.get_svg(args, lambda: None)
+            if svg_data:
+                svgs[name] = svg_data
+            else:
+                missing[name] = args
+
+        if missing:
+            rendered = render_many(list(missing.values()))
+            for name, svg_data in zip(missing, rendered):
+                if not svg_data:
+                    continue
+                svgs[name] = svg_data
+                try:
+                    self._store(name, lambda: svg_data)
+                except Exception as e:
+                    print(f"Error storing icon: {e}")
+
+        return [svgs.get(name) for name in names]
+
+    def _store(self, name, render):
+        """Make sure the file of an icon exists and mark it used
+
+        Returns:
+            (path, rendered SVG data or None on a hit), None if render fails
+        """
+        self._load_index()
+        path = os.path.join(self._directory, name)
+        if name in self._files:
+            try:
+                # Persist the use for the eviction order of later sessions
+                if name not in self._used:
+                    os.utime(path)
+                self._files.move_to_end(name)
+                self._use(name, path)
+                return path, None
+            except OSError:
+                # Deleted behind our back
+                self._forget(name)
+
+        svg_data = render()
+        if not svg_data:
+            return None
+
+        data = svg_data.encode("utf-8") if isinstance(svg_data, str) else svg_data
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self._files[name] = len(data)
+        self._total_bytes += len(data)
+        self._use(name, path)
+        self._evict(keep=name)
+        return path, svg_data
+
+    def _use(self, name, path):
+        url = systemPathToFileUrl(path)
+        self._used[name] = url
+        return url
+
+    def _forget(self, name):
+        self._total_bytes -= self._files.pop(name, 0)
+        self._used.pop(name, None)
+
+    def _load_index(self):
+        """Scan the store directory once, oldest files first"""
+        if self._index_loaded:
+            return
+
+        os.makedirs(self._directory, exist_ok=True)
+        entries = []
+        with os.scandir(self._directory) as it:
+            for entry in it:
+                if not entry.name.endswith(self.SUFFIX) or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+
+        self._files = OrderedDict((name, size) for _mtime, name, size in entries)
+        self._index_loaded = True
+        self._total_bytes = sum(self._files.values())
+        self._evict()
+
+    def _evict(self, keep=None):
+        """Delete least recently used files until the store fits its cap
+
+        Files used in this session are deleted only when the other files do
+        not free enough space; keep, the file just written, never is.
+        """
+        if self._total_bytes <= self._max_bytes:
+            return
+
+        unused = [name for name in self._files if name not in self._used]
+        used = [name for name in self._files if name in self._used]
+        for name in unused + used:
+            if self._total_bytes <= self._max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(os.path.join(self._directory, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error evicting icon {name}: {e}")
+                continue
+            self._forget(name)
+
+
+class ThumbnailStore(IconStore):
+    """PNG thumbnails of SVG files keyed by the content hash of the source"""
+
+    _instance = None
+
+    DIRECTORY_NAME = "milsymbol_thumbnails"
+    FORMAT = THUMBNAIL_FORMAT
+    SUFFIX = THUMBNAIL_SUFFIX
+    DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+    # Thumbnails are keyed by the content of their source
+    RENDERER_PATH = None
+
+    # Component context used for rasterizing, set by get_instance()
+    _ctx = None
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, renderer_digest=""):
+        super().__init__(directory, max_bytes, renderer_digest)
+        # file name -> (render args, render, [on_ready]) of queued thumbnails
+        self._pending = OrderedDict()
+        self._async_callback = None
+        self._callback = _RasterizeCallback(self)
+        self._posted = False
+
+    @classmethod
+    def get_instance(cls, ctx):
+        """Get the thumbnail store of the user profile"""
+        store = super().get_instance(ctx)
+        store._ctx = ctx
+        return store
+
+    def get_thumbnail_url(
+        self, source_path, content_hash=None, height=THUMBNAIL_HEIGHT, on_ready=None
+    ):
+        """Get the URL of the thumbnail of an SVG file, the file URL on failure
+
+        Args:
+            source_path: System path of the SVG file
+            content_hash: Hash of the content of the file, its path, size
+                and modification time if not known
+            height: Height of the thumbnail in pixels
+            on_ready: Callable taking the thumbnail URL. If given, a missing
+                thumbnail is rasterized later on the main thread and the
+                file URL is returned meanwhile
+        """
+        source_url = systemPathToFileUrl(source_path)
+        if content_hash is None:
+            try:
+                stat = os.stat(source_path)
+            except OSError:
+                return source_url
+            content_hash = f"{source_path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+        render_args = [content_hash, height]
+
+        def render():
+            return rasterize_graphic(self._ctx, source_url, height)
+
+        if on_ready is not None:
+            url = self.get_url(render_args, lambda: None)
+            if url is not None:
+                return url
+            if self._queue(render_args, render, on_ready):
+                return source_url
+
+        url = self.get_url(render_args, render)
+        return url or source_url
+
+    def _queue(self, render_args, render, on_ready):
+        """Queue a thumbnail for rasterizing, False if there is no main loop"""
+        name = self.get_file_name(render_args)
+        request = self._pending.get(name)
+        if request is not None:
+            request[2].append(on_ready)
+            return True
+
+        if not self._post():
+            return False
+        self._pending[name] = (render_args, render, [on_ready])
+        return True
+
+    def _post(self):
+        """Schedule a batch on the main thread, False if that is not possible"""
+        if self._posted:
+            return True
+        if self._ctx is None:
+            return False
+        try:
+            if self._async_callback is None:
+                self._async_callback = (
+                    self._ctx.getServiceManager().createInstanceWithContext(
+                        "com.sun.star.awt.AsyncCallback", self._ctx
+                    )
+                )
+            self._async_callback.addCallback(self._callback, None)
+        except Exception as e:
+            print(f"AsyncCallback not available, rasterizing directly: {e}")
+            return False
+        self._posted = True
+        return True
+
+    def rasterize_pending(self):
+        """Rasterize a batch of the queued thumbnails, called on the main thread
+
+        The next batch is scheduled while thumbnails are left, so the user
+        interface stays responsive in between.
+        """
+        self._posted = False
+        for _i in range(THUMBNAIL_BATCH_SIZE):
+            if not self._pending:
+                return
+            _name, (render_args, render, callbacks) = self._pending.popitem(
+                last=False
+            )
+            url = self.get_url(render_args, render)
+            if url is None:
+                continue
+            for on_ready in callbacks:
+                try:
+                    on_ready(url)
+                except Exception as e:
+                    print(f"Error showing thumbnail: {e}")
+
+        if self._pending and not self._post():
+            # Drop the rest, their trees keep showing the SVG files
+            self._pending.clear()
+
+
+class _RasterizeCallback(unohelper.Base, XCallback):
+    def __init__(self, thumbnail_store):
+        self._store = thumbnail_store
+
+    def notify(self, data):
+        self._store.rasterize_pending()
+
+
+def rasterize_graphic(ctx, url, height):
+    """Get PNG data of the graphic at url scaled to height pixels, None on error"""
+    return _rasterize(ctx, (PropertyValue("URL", 0, url, 0),), height, url)
+
+
+def rasterize_svg(ctx, svg_data, height):
+    """Get PNG data of SVG bytes scaled to height pixels, None on error"""
+    try:
+        stream = ctx.ServiceManager.createInstanceWithArgumentsAndContext(
+            "com.sun.star.io.SequenceInputStream", (uno.ByteSequence(svg_data),), ctx
+        )
+    except Exception as e:
+        print(f"Error reading SVG data: {e}")
+        return None
+    return _rasterize(
+        ctx, (PropertyValue("InputStream", 0, stream, 0),), height, "SVG data"
+    )
+
+
+def _rasterize(ctx, media_properties, height, description):
+    try:
+        smgr = ctx.ServiceManager
+        graphic_provider = smgr.createInstanceWithContext(
+            "com.sun.star.graphic.GraphicProvider", ctx
+        )
+        graphic = graphic_provider.queryGraphic(media_properties)
+        if graphic is None:
+            return None
+
+        size = graphic.SizePixel
+        if size.Width <= 0 or size.Height <= 0:
+            size = graphic.Size100thMM
+        if size.Width <= 0 or size.Height <= 0:
+            return None
+        width = max(1, round(size.Width * height / size.Height))
+
+        filter_data = (
+            PropertyValue("PixelWidth", 0, width, 0),
+            PropertyValue("PixelHeight", 0, height, 0),
+        )
+        # The filter expects a typed sequence, which not every PyUNO version
+        # passes through a struct member. A PNG of another size shows that
+        # the filter data was ignored, the unscaled PNG is the last resort.
+        data = None
+        for value in (
+            uno.Any("[]com.sun.star.beans.PropertyValue", filter_data),
+            filter_data,
+        ):
+            try:
+                data = _store_png(ctx, graphic_provider, graphic, value)
+            except Exception as e:
+                print(f"Error storing PNG of {description}, retrying: {e}")
+                continue
+            if _get_png_size(data) == (width, height):
+                break
+        return data
+    except Exception as e:
+        print(f"Error rasterizing {description}: {e}")
+        return None
+
+
+def _store_png(ctx, graphic_provider, graphic, filter_data):
+    pipe = ctx.ServiceManager.createInstanceWithContext("com.sun.star.io.Pipe", ctx)
+    graphic_provider.storeGraphic(
+        graphic,
+        (
+            PropertyValue("OutputStream", 0, pipe, 0),
+            PropertyValue("MimeType", 0, "image/png", 0),
+            PropertyValue("FilterData", 0, filter_data, 0),
+        ),
+    )
+    pipe.closeOutput()
+
+    _count, data = pipe.readBytes(None, pipe.available())
+    return data.value
+
+
+def _get_png_size(data):
+    """Get (width, height) from the header of PNG data, None if it is no PNG"""
+    if not data or len(data) < 24 or not data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return None
+    return struct.unpack(">II", data[16:24])
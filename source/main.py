@@ -16,12 +16,19 @@ base_dir = os.path.dirname(__file__)
 if base_dir not in sys.path:
     sys.path.insert(0, base_dir)
 
-from symbol_dialog import open_symbol_dialog
-from smart.controller import Controller
-from smart.diagram.data_of_diagram import DataOfDiagram
-from sidebar import SidebarFactory
-from utils import is_orbat_feature_enabled
+# Only the listener and registry code is imported here, as this module is
+# loaded for every new view. Dialogs, diagrams, the symbol catalog and the
+# translations are imported on first use (see tools/check_startup_imports.py).
+from utils import (
+    get_orbat_diagram_id,
+    get_orbat_marker,
+    is_orbat_feature_enabled,
+    register_orbat_diagram,
+    set_orbat_marker,
+    unregister_orbat_diagram,
+)
 
+from com.sun.star.document import XDocumentEventListener
 from com.sun.star.task import XJobExecutor, XJob
 from com.sun.star.view import XSelectionChangeListener
 from com.sun.star.util import XCloseListener
@@ -30,7 +37,7 @@ from com.sun.star.ui.ContextMenuInterceptorAction import EXECUTE_MODIFIED
 from com.sun.star.ui.ContextMenuInterceptorAction import IGNORED
 from com.sun.star.frame import XDispatchProvider, XDispatch
 from com.sun.star.lang import XInitialization
-from translator import translate
+from com.sun.star.ui import XUIElementFactory
 
 
 class DocumentCloseListener(unohelper.Base, XCloseListener):
@@ -68,6 +75,53 @@ class DocumentCloseListener(unohelper.Base, XCloseListener):
         pass
 
 
+class DiagramMarkerListener(unohelper.Base, XDocumentEventListener):
+    """Keeps the ORBAT marker of a document in sync with its diagram groups
+
+    Diagram groups inserted in any way, e.g. pasted from another document,
+    are added to the marker and removed ones are dropped, so the marker can
+    be trusted when the document is loaded. A document without a marker is
+    scanned once when it is saved and gets one, an empty one if it has no
+    diagrams. It is not written on load, which would modify the document.
+    """
+
+    SHAPE_EVENTS = ("ShapeInserted", "ShapeRemoved")
+    SAVE_EVENTS = ("OnSave", "OnSaveAs")
+
+    def __init__(self, model):
+        self.model = model
+
+    def documentEventOccured(self, event):
+        try:
+            if event.EventName in self.SHAPE_EVENTS:
+                self._update_marker(event)
+            elif event.EventName in self.SAVE_EVENTS:
+                if get_orbat_marker(self.model) is None:
+                    set_orbat_marker(
+                        self.model, ControllerManager().collect_diagram_ids(self.model)
+                    )
+        except Exception as e:
+            print(f"Error updating ORBAT marker: {e}")
+
+    def _update_marker(self, event):
+        shape = event.Source
+        shape_name = shape.getName() if hasattr(shape, "getName") else ""
+        if not (
+            shape_name.startswith("OrbatDiagram")
+            and shape_name.endswith("-GroupShape")
+        ):
+            return
+
+        diagram_id = get_orbat_diagram_id(shape_name)
+        if event.EventName == "ShapeRemoved":
+            unregister_orbat_diagram(self.model, diagram_id)
+        else:
+            register_orbat_diagram(self.model, diagram_id)
+
+    def disposing(self, event):
+        pass
+
+
 class ListenerRegistry:
     _instance = None
 
@@ -75,6 +129,8 @@ class ListenerRegistry:
         self._map = {}
         self._registered = set()
         self._interceptors = {}
+        # model -> DiagramMarkerListener
+        self._marker_listeners = {}
         self.selected_shape = None
 
     @classmethod
@@ -93,6 +149,16 @@ class ListenerRegistry:
     def register_interceptor(self, xcontroller, interceptor):
         self._interceptors[xcontroller] = interceptor
 
+    def register_marker_listener(self, model):
+        """Maintain the ORBAT marker of model, once per document"""
+        if model in self._marker_listeners:
+            return
+        if not hasattr(model, "addDocumentEventListener"):
+            return
+        listener = DiagramMarkerListener(model)
+        model.addDocumentEventListener(listener)
+        self._marker_listeners[model] = listener
+
     def unregister(self, model):
         if model in self._map:
             xcontroller, listener = self._map[model]
@@ -104,6 +170,13 @@ class ListenerRegistry:
 
             del self._map[model]
 
+        listener = self._marker_listeners.pop(model, None)
+        if listener is not None:
+            try:
+                model.removeDocumentEventListener(listener)
+            except Exception as e:
+                print("Failed removing marker listener:", e)
+
     def update_selected_shape(self, selection):
         self.selected_shape = selection
 
@@ -127,12 +200,14 @@ class ControllerManager:
             cls._instance.orbat_enabled = is_orbat_feature_enabled(ctx)
         return cls._instance
 
-    def get_or_create_controller(self, ctx, frame):
+    def get_or_create_controller(self, ctx, frame, has_diagrams=False):
         """Get existing controller or create new one for the frame"""
         if frame not in self._controllers:
             # Check if document has existing smart diagrams
             model = frame.getController().getModel()
-            if self.document_has_smart_diagrams(model):
+            if has_diagrams or self.document_has_smart_diagrams(model):
+                from smart.controller import Controller
+
                 controller = Controller(None, ctx, frame)
                 self._controllers[frame] = controller
                 return controller
@@ -157,30 +232,47 @@ class ControllerManager:
         if not self.orbat_enabled:
             return False
 
+        # DiagramMarkerListener keeps the marker in sync with the diagram
+        # groups, an empty one means the document has none. Only documents
+        # saved without the extension are scanned.
+        marker = get_orbat_marker(model)
+        if marker is not None:
+            return bool(marker)
+
         try:
-            # Check different document types for shapes
-            if model.supportsService("com.sun.star.text.TextDocument"):
-                draw_page = model.getDrawPage()
-                return self.check_shapes_for_diagrams(draw_page)
-            elif model.supportsService("com.sun.star.sheet.SpreadsheetDocument"):
-                sheets = model.getSheets()
-                for i in range(sheets.getCount()):
-                    sheet = sheets.getByIndex(i)
-                    draw_page = sheet.getDrawPage()
-                    if self.check_shapes_for_diagrams(draw_page):
-                        return True
-            elif model.supportsService(
-                "com.sun.star.presentation.PresentationDocument"
-            ) or model.supportsService("com.sun.star.drawing.DrawingDocument"):
-                draw_pages = model.getDrawPages()
-                for i in range(draw_pages.getCount()):
-                    draw_page = draw_pages.getByIndex(i)
-                    if self.check_shapes_for_diagrams(draw_page):
-                        return True
+            for draw_page in self.iter_draw_pages(model):
+                if self.check_shapes_for_diagrams(draw_page):
+                    return True
         except Exception as e:
             print(f"Error checking for smart diagrams: {e}")
         return False
 
+    def collect_diagram_ids(self, model):
+        """Get the ids of the diagram groups of all pages of a document"""
+        diagram_ids = set()
+        for draw_page in self.iter_draw_pages(model):
+            for i in range(draw_page.getCount()):
+                shape = draw_page.getByIndex(i)
+                shape_name = shape.getName() if hasattr(shape, "getName") else ""
+                if shape_name.startswith("OrbatDiagram"):
+                    diagram_ids.add(str(get_orbat_diagram_id(shape_name)))
+        return diagram_ids
+
+    def iter_draw_pages(self, model):
+        """Iterate over the draw pages of a text, spreadsheet or drawing document"""
+        if model.supportsService("com.sun.star.text.TextDocument"):
+            yield model.getDrawPage()
+        elif model.supportsService("com.sun.star.sheet.SpreadsheetDocument"):
+            sheets = model.getSheets()
+            for i in range(sheets.getCount()):
+                yield sheets.getByIndex(i).getDrawPage()
+        elif model.supportsService(
+            "com.sun.star.presentation.PresentationDocument"
+        ) or model.supportsService("com.sun.star.drawing.DrawingDocument"):
+            draw_pages = model.getDrawPages()
+            for i in range(draw_pages.getCount()):
+                yield draw_pages.getByIndex(i)
+
     def check_shapes_for_diagrams(self, draw_page):
         """Check if a draw page contains smart diagram shapes"""
         try:
@@ -278,6 +370,8 @@ class ContextMenuInterceptor(unohelper.Base, XContextMenuInterceptor):
         try:
             menu_item = menu_container.createInstance("com.sun.star.ui.ActionTrigger")
 
+            from translator import translate
+
             menu_text = translate(self.ctx, "ContextMenu.EditOrbat")
             menu_item.setPropertyValue("Text", menu_text)
             menu_item.setPropertyValue(
@@ -298,6 +392,8 @@ class ContextMenuInterceptor(unohelper.Base, XContextMenuInterceptor):
         try:
             menu_item = menu_container.createInstance("com.sun.star.ui.ActionTrigger")
 
+            from translator import translate
+
             menu_text = translate(self.ctx, "ContextMenu.EditMilitarySymbol")
             menu_item.setPropertyValue("Text", menu_text)
             menu_item.setPropertyValue(
@@ -325,6 +421,11 @@ class StartupJob(unohelper.Base, XJob, XSelectionChangeListener):
         self.initialize_controllers()
 
     def selectionChanged(self, event):
+        """Track the selected shape for the context menu
+
+        Handled synchronously and not coalesced: the context menu
+        interceptor reads the shape as soon as the menu opens.
+        """
         try:
             ListenerRegistry.instance().clear_selected_shape()
             selection = event.Source.getSelection()
@@ -389,6 +490,8 @@ class StartupJob(unohelper.Base, XJob, XSelectionChangeListener):
                             ListenerRegistry.instance().register_interceptor(
                                 xcontroller, interceptor
                             )
+                            if controller_manager.orbat_enabled:
+                                registry.register_marker_listener(model)
 
                     try:
                         controller_manager.get_or_create_controller(self.ctx, frame)
@@ -423,6 +526,8 @@ class MainJob(unohelper.Base, XJobExecutor):
         self.model = desktop.getCurrentComponent()
 
         if args == "symbolDialog":
+            from symbol_dialog import open_symbol_dialog
+
             selected_shape = ListenerRegistry.instance().get_selected_shape()
             open_symbol_dialog(self.ctx, self.model, None, None, selected_shape, None)
         if self.orbat_enabled and args == "orgChart":
@@ -435,13 +540,6 @@ class MainJob(unohelper.Base, XJobExecutor):
         frame = self.desktop.getCurrentFrame()
         controller_manager = ControllerManager(self.ctx)
 
-        if frame in controller_manager._controllers:
-            controller = controller_manager._controllers[frame]
-        else:
-            controller = controller_manager.get_or_create_controller(self.ctx, frame)
-            if controller is None:
-                return
-
         xcontroller = frame.getController()
         selection = xcontroller.getSelection()
         if selection is None:
@@ -461,15 +559,20 @@ class MainJob(unohelper.Base, XJobExecutor):
         if not shape_name.startswith("OrbatDiagram"):
             return
 
+        # The selected group is an ORBAT, no need to look for diagrams
+        controller = controller_manager.get_or_create_controller(
+            self.ctx, frame, has_diagrams=True
+        )
+        if controller is None:
+            return
+
         diagram_name = shape_name.split("-", 1)[0]
         diagram_id = int("".join(c for c in diagram_name if c.isdigit()) or "0")
 
         controller.set_group_type(controller.ORGANIGROUP)
         controller.set_diagram_type(controller.ORGANIGRAM)
-        controller.instantiate_diagram()
         controller._last_diagram_name = diagram_name
-        controller.get_diagram().init_diagram(diagram_id)
-        controller.get_diagram().init_properties()
+        controller.activate_diagram(diagram_id)
 
         controller._gui.set_visible_control_dialog(True)
 
@@ -482,6 +585,8 @@ class MainJob(unohelper.Base, XJobExecutor):
         if frame in controller_manager._controllers:
             controller = controller_manager._controllers[frame]
         else:
+            from smart.controller import Controller
+
             controller = Controller(None, self.ctx, frame)
             controller_manager._controllers[frame] = controller
 
@@ -491,6 +596,8 @@ class MainJob(unohelper.Base, XJobExecutor):
             if not registry.has(xcontroller):
                 model.addCloseListener(DocumentCloseListener(model, frame))
 
+        from smart.diagram.data_of_diagram import DataOfDiagram
+
         # Create hierarchical data
         data = DataOfDiagram()
         data.add(0, "")  # Level 0 (root)
@@ -523,6 +630,21 @@ class MainJob(unohelper.Base, XJobExecutor):
             print(f"Error initializing controllers for open documents: {e}")
 
 
+class SidebarFactory(unohelper.Base, XUIElementFactory):
+    """Sidebar panel factory, loads the sidebar module on first use"""
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self._factory = None
+
+    def createUIElement(self, url, properties):
+        if self._factory is None:
+            import sidebar
+
+            self._factory = sidebar.SidebarFactory(self.ctx)
+        return self._factory.createUIElement(url, properties)
+
+
 class Dispatcher(unohelper.Base, XDispatch):
     """Dispatch handler for com.collabora.milsymbol protocol URLs.
 
@@ -0,0 +1,151 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Preview icons of the symbol dialog
+
+The symbol dialog shows about 4,000 small PNG previews from img/preview.
+build.sh packs them into one uncompressed archive, img/preview.zip, so
+installing the extension unpacks a single file instead of thousands. Tree
+controls only show images from URLs, so the store extracts the icons of a
+directory, the ones one tree shows, in one pass when the first of them is
+asked for. They go to a directory of the user profile named after the
+size and time of the archive and are reused afterwards. A new
+archive, from an update of the extension, gets a new directory and the old
+ones are deleted.
+
+Without an archive, e.g. when running from the source tree, the loose
+files of the extension are used.
+"""
+
+import os
+import shutil
+import zipfile
+
+from unohelper import fileUrlToSystemPath, systemPathToFileUrl
+
+from utils import get_package_location
+
+PACK_FILE = os.path.join("img", "preview.zip")
+BASE_URL = "vnd.sun.star.extension://com.collabora.milsymbol/img/preview"
+
+
+class PreviewStore:
+    """URLs of the preview icons, extracted from the archive on demand"""
+
+    _instance = None
+
+    def __init__(self, pack_path, cache_directory):
+        self._pack_path = pack_path
+        self._cache_directory = cache_directory
+        self._pack = None
+        self._directory = None
+        # relative path -> URL of the icons handed out in this session
+        self._urls = {}
+        # archive directory -> member paths, from the central directory
+        self._members = None
+        # archive directories handled in this session
+        self._extracted_directories = set()
+        # relative paths present in self._directory
+        self._extracted = set()
+
+    @classmethod
+    def get_instance(cls, ctx):
+        """Get the preview store of the installed extension"""
+        if cls._instance is None:
+            package_path = fileUrlToSystemPath(get_package_location(ctx))
+            ps = ctx.getByName("/singletons/com.sun.star.util.thePathSettings")
+            user_profile_path = os.path.dirname(ps.UserConfig)
+            cache_directory = os.path.join(
+                fileUrlToSystemPath(user_profile_path), "milsymbol_previews"
+            )
+            cls._instance = PreviewStore(
+                os.path.join(package_path, PACK_FILE), cache_directory
+            )
+        return cls._instance
+
+    def get_url(self, relative_path):
+        """Get the URL of a preview icon
+
+        Args:
+            relative_path: Path below img/preview with "/" separators, e.g.
+                "symbol_set/10.png"
+        """
+        url = self._urls.get(relative_path)
+        if url is not None:
+            return url
+
+        url = f"{BASE_URL}/{relative_path}"
+        try:
+            if self._open():
+                url = self._extract(relative_path) or url
+        except Exception as e:
+            print(f"Error extracting preview {relative_path}: {e}")
+        self._urls[relative_path] = url
+        return url
+
+    def _open(self):
+        """Open the archive once, False if there is none"""
+        if self._pack is not None:
+            return True
+        if not os.path.exists(self._pack_path):
+            return False
+
+        stat = os.stat(self._pack_path)
+        signature = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        self._directory = os.path.join(self._cache_directory, signature)
+        self._pack = zipfile.ZipFile(self._pack_path)
+        self._remove_stale_directories(signature)
+        self._members = {}
+        for name in self._pack.namelist():
+            if not name.endswith("/"):
+                self._members.setdefault(name.rpartition("/")[0], []).append(name)
+        return True
+
+    def _remove_stale_directories(self, signature):
+        """Delete the icons extracted from earlier archives"""
+        if not os.path.isdir(self._cache_directory):
+            return
+        for name in os.listdir(self._cache_directory):
+            if name == signature:
+                continue
+            shutil.rmtree(os.path.join(self._cache_directory, name), True)
+
+    def _extract(self, relative_path):
+        """Get the URL of an icon in the cache, None if the archive lacks it"""
+        if self._directory is None:
+            return None
+        directory = relative_path.rpartition("/")[0]
+        if directory not in self._extracted_directories:
+            # Not retried after errors, the icons fall back to the extension
+            self._extracted_directories.add(directory)
+            self._extract_directory(directory)
+
+        if relative_path not in self._extracted:
+            return None
+        return systemPathToFileUrl(
+            os.path.join(self._directory, *relative_path.split("/"))
+        )
+
+    def _extract_directory(self, directory):
+        """Write the icons of an archive directory missing in the cache"""
+        pack, members = self._pack, self._members
+        if pack is None or members is None or self._directory is None:
+            return
+        target = os.path.join(self._directory, *directory.split("/"))
+        os.makedirs(target, exist_ok=True)
+        existing = set(os.listdir(target))
+        for name in members.get(directory, ()):
+            file_name = name.rpartition("/")[2]
+            if file_name not in existing:
+                path = os.path.join(target, file_name)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(pack.read(name))
+                os.replace(tmp_path, path)
+            self._extracted.add(name)
@@ -0,0 +1,185 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Coalescing of document selection change events
+
+Rubber-band selections and keyboard navigation fire bursts of
+selectionChanged events. Listeners submit their events here instead of
+handling them directly; only the last event of a burst is handled, on the
+main thread, and only if the selection actually changed.
+
+Selections made by the extension itself are recorded with record(), so a
+burst ending on the selection the extension just made is skipped, while
+going back to a shape selected before is handled.
+"""
+
+import threading
+
+import unohelper
+
+from com.sun.star.awt import XCallback
+
+
+def get_selection_signature(selection):
+    """Get a comparable identity of a document selection
+
+    Shapes are identified by their name; shapes without a name by the shape
+    object itself.
+    """
+    if selection is None:
+        return ()
+    try:
+        if selection.supportsService("com.sun.star.drawing.Shapes"):
+            shapes = [selection.getByIndex(i) for i in range(selection.getCount())]
+        else:
+            shapes = [selection]
+        return tuple(
+            (shape.getName() if hasattr(shape, "getName") else "") or shape
+            for shape in shapes
+        )
+    except Exception:
+        return (selection,)
+
+
+class SelectionCoalescer:
+    """Collapses bursts of selection events into the final selection"""
+
+    _instance = None
+
+    # Seconds to wait for further events before handling a burst
+    DEFAULT_DELAY = 0.08
+
+    def __init__(self, ctx, delay=DEFAULT_DELAY):
+        self._ctx = ctx
+        self._delay = delay
+        self._lock = threading.Lock()
+        # listener -> (event, handler) of the latest unhandled event
+        self._pending = {}
+        # listener -> selection signature of the last handled event
+        self._last_signatures = {}
+        self._timer = None
+        self._async_callback = None
+        self._callback = _MainThreadCallback(self)
+
+        self._received = 0
+        self._processed = 0
+        self._dropped = 0
+        self._skipped = 0
+
+        try:
+            self._async_callback = ctx.getServiceManager().createInstanceWithContext(
+                "com.sun.star.awt.AsyncCallback", ctx
+            )
+        except Exception as e:
+            print(f"AsyncCallback not available, handling selections directly: {e}")
+
+    @classmethod
+    def instance(cls, ctx):
+        if cls._instance is None:
+            cls._instance = SelectionCoalescer(ctx)
+        return cls._instance
+
+    def submit(self, listener, event, handler):
+        """Queue event for listener, replacing an older unhandled one"""
+        with self._lock:
+            self._received += 1
+            if listener in self._pending:
+                self._dropped += 1
+            self._pending[listener] = (event, handler)
+
+            if self._async_callback is None or self._delay <= 0:
+                direct = True
+            else:
+                direct = False
+                if self._timer is None:
+                    self._timer = threading.Timer(self._delay, self._post_flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+        if direct:
+            self.flush()
+
+    @classmethod
+    def discard(cls, listener):
+        """Cancel listener on the shared instance, if there is one"""
+        if cls._instance is not None:
+            cls._instance.cancel(listener)
+
+    def cancel(self, listener):
+        """Forget pending events and the last selection of listener"""
+        with self._lock:
+            self._pending.pop(listener, None)
+            self._last_signatures.pop(listener, None)
+
+    def record(self, listener, selection):
+        """Record a selection made by the extension as handled by listener
+
+        listener already reflects it, so events ending on it are skipped.
+        """
+        signature = get_selection_signature(selection)
+        with self._lock:
+            self._last_signatures[listener] = signature
+
+    def flush(self):
+        """Handle the pending events, called on the main thread"""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._timer = None
+
+        for listener, (event, handler) in pending.items():
+            try:
+                signature = get_selection_signature(event.Source.getSelection())
+            except Exception:
+                signature = None
+
+            with self._lock:
+                if (
+                    signature is not None
+                    and self._last_signatures.get(listener) == signature
+                ):
+                    self._skipped += 1
+                    continue
+                if signature is not None:
+                    self._last_signatures[listener] = signature
+                self._processed += 1
+
+            try:
+                handler(event)
+            except Exception as e:
+                print(f"Error handling selection change: {e}")
+
+    def get_stats(self):
+        """Get counters of received, processed, coalesced and skipped events"""
+        with self._lock:
+            return {
+                "received": self._received,
+                "processed": self._processed,
+                "dropped": self._dropped,
+                "skipped": self._skipped,
+            }
+
+    def _post_flush(self):
+        """Timer callback, hands the flush over to the main thread"""
+        if self._async_callback is None:
+            return
+        try:
+            self._async_callback.addCallback(self._callback, None)
+        except Exception as e:
+            print(f"Error posting selection flush: {e}")
+            with self._lock:
+                self._timer = None
+
+
+class _MainThreadCallback(unohelper.Base, XCallback):
+    def __init__(self, coalescer):
+        self._coalescer = coalescer
+
+    def notify(self, data):
+        self._coalescer.flush()
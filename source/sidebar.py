@@ -8,8 +8,6 @@
 
 import os
 import uno
-import json
-import base64
 import unohelper
 
 from sidebar_tree import (
@@ -18,8 +16,17 @@ from sidebar_tree import (
     TreeMouseListener,
     TreeSelectionChangeListener,
 )
+from favorites_store import FavoritesStore
+from favorites_transfer import (
+    BackgroundTask,
+    export_favorites,
+    import_favorites,
+)
+from favorites_watcher import FavoritesWatcher
+from icon_store import THUMBNAIL_HEIGHT, ThumbnailStore
 from symbol_dialog import open_symbol_dialog
-from utils import get_package_location, parse_svg_dimensions, get_default_symbol_height_cm
+from sidebar_drag import SymbolTransferable, load_drag_symbols
+from sidebar_filter import FavoritesTreeFilter
 from sidebar_rename_dialog import RenameDialog
 
 from unohelper import fileUrlToSystemPath, systemPathToFileUrl
@@ -38,7 +45,6 @@ from com.sun.star.awt import XWindowListener, XActionListener
 from com.sun.star.awt import XFocusListener, XKeyListener
 from com.sun.star.view.SelectionType import SINGLE
 from com.sun.star.datatransfer.dnd import XDragGestureListener, XDragSourceListener
-from com.sun.star.datatransfer import DataFlavor, XTransferable
 from com.sun.star.datatransfer.dnd.DNDConstants import ACTION_COPY
 
 
@@ -85,17 +91,23 @@ class SidebarPanel(unohelper.Base, XSidebarPanel, XUIElement, XToolPanel):
         self.mutable_tree_data_model = None
         self.selected_node = None
         self.selected_node_name = None
-        self.removed_nodes = []
 
         self.sidebar_tree = SidebarTree(ctx, self)
 
         self.favorites_dir_path = self.get_favorites_dir_path(ctx)
+        self.favorites_store = FavoritesStore.get_instance(self.favorites_dir_path)
+        self.tree_filter = FavoritesTreeFilter(self.favorites_store, self)
+        self.favorites_store.add_listener(self.on_favorites_changed)
+        self.favorites_watcher = FavoritesWatcher.get_instance(
+            ctx, self.favorites_store
+        )
+        self.favorites_watcher.acquire()
 
         self.desktop = self.ctx.getServiceManager().createInstanceWithContext(
             "com.sun.star.frame.Desktop", self.ctx
         )
 
-        self._resizeListener = WindowResizeListener(self.onResize)
+        self._resizeListener = WindowResizeListener(self.onResize, self.onDispose)
         self.xParentWindow.addWindowListener(self._resizeListener)
 
     # XUIElement
@@ -315,8 +327,6 @@ class SidebarPanel(unohelper.Base, XSidebarPanel, XUIElement, XToolPanel):
 
     def insert_symbol_node(self, category_name, svg_data, svg_args, is_editing):
         self.sidebar_tree.create_node(
-            self.root_node,
-            self.mutable_tree_data_model,
             category_name,
             svg_data,
             svg_args,
@@ -324,8 +334,6 @@ class SidebarPanel(unohelper.Base, XSidebarPanel, XUIElement, XToolPanel):
             self.selected_node,
         )
 
-        self.update_export_button_state()
-
     def get_favorites_dir_path(self, ctx):
         ps = ctx.getByName("/singletons/com.sun.star.util.thePathSettings")
         user_config = ps.UserConfig
@@ -338,71 +346,19 @@ class SidebarPanel(unohelper.Base, XSidebarPanel, XUIElement, XToolPanel):
 
         return favorites_dir_path
 
-    def import_json_data(self, file_name, category_path):
-        order_indexes = []
-        symbol_params = []
-        symbol_name = os.path.splitext(file_name)[0]
-        json_path = os.path.join(category_path, symbol_name + ".json")
-        if os.path.exists(json_path):
-            try:
-                with open(json_path, "r", encoding="utf-8") as f:
-                    json_data = json.load(f)
-
-                if json_data:
-                    sidc_value = json_data.get("sidc", "")
-                    symbol_params.append(str(sidc_value))
-
-                    for key, value in json_data.items():
-                        if key in ("sidc", "order_index"):
-                            if key == "order_index":
-                                order_indexes.append((value, symbol_name + ".svg"))
-                            continue
-
-                        nv = uno.createUnoStruct("com.sun.star.beans.NamedValue")
-                        nv.Name = key
-                        nv.Value = value
-                        symbol_params.append(nv)
-
-            except Exception as e:
-                print("JSON read error:", e)
-
-        return order_indexes, symbol_params
-
-    def get_ordered_symbols(self, category_path):
-        ordered_symbols = []
-
-        try:
-            if not os.path.isdir(category_path):
-                print(f"Category path is not a directory: {category_path}")
-                return ordered_symbols
-
-            file_list = sorted(os.listdir(category_path))
-        except Exception as e:
-            print(f"Error listing category path {category_path}: {e}")
-            return ordered_symbols
-
-        for file_name in file_list:
-            if file_name.lower().endswith(".json"):
-                try:
-                    order_indexes, symbol_params = self.import_json_data(
-                        file_name, category_path
-                    )
-                    if order_indexes:  # Check if list is not empty
-                        order_index_value, svg_name = order_indexes[0]
-                    else:
-                        # Provide default values if no order_index found in JSON
-                        order_index_value = 0  # Default order
-                        svg_name = (
-                            os.path.splitext(file_name)[0] + ".svg"
-                        )  # Construct SVG name from JSON name
-                    ordered_symbols.append((order_index_value, svg_name, symbol_params))
-                except Exception as e:
-                    print(f"Error processing JSON file {file_name}: {e}")
-                    continue
+    def get_symbol_params(self, params):
+        """Convert stored favorite parameters to the DataValue of a tree node"""
+        symbol_params = [str(params.get("sidc", ""))]
+        for key, value in params.items():
+            if key in ("sidc", "order_index"):
+                continue
 
-        ordered_symbols.sort(key=lambda x: x[0])
+            nv = uno.createUnoStruct("com.sun.star.beans.NamedValue")
+            nv.Name = key
+            nv.Value = value
+            symbol_params.append(nv)
 
-        return ordered_symbols
+        return symbol_params
 
     def init_favorites_sidebar(self):
         smgr = self.ctx.ServiceManager
@@ -418,57 +374,86 @@ class SidebarPanel(unohelper.Base, XSidebarPanel, XUIElement, XToolPanel):
         tree_model.setPropertyValue("ShowsHandles", True)
         tree_model.setPropertyValue("ShowsRootHandles", True)
         tree_model.setPropertyValue("Editable", False)
+        tree_model.setPropertyValue("RowHeight", THUMBNAIL_HEIGHT)
 
         self.root_node = self.mutable_tree_data_model.createNode("Favorites", True)
         self.mutable_tree_data_model.setRoot(self.root_node)
 
-        for category_name in sorted(os.listdir(self.favorites_dir_path)):
-            category_node = self.mutable_tree_data_model.createNode(category_name, True)
+        store = self.favorites_store
+        store.load()
+        categories = []
+        for category_name in store.get_category_names():
+            category_node = self.create_category_node(category_name)
             self.root_node.appendChild(category_node)
+            symbols = []
+            categories.append((category_name, category_node, symbols))
 
-            category_path = os.path.join(self.favorites_dir_path, category_name)
-            ordered_symbols = self.get_ordered_symbols(category_path)
-            for _, file_name, symbol_params in ordered_symbols:
-                file_path = os.path.join(category_path, file_name)
-                file_url = systemPathToFileUrl(file_path)
-
-                symbol_node = self.mutable_tree_data_model.createNode(
-                    os.path.splitext(file_name)[0], False
-                )
-
-                symbol_node.DataValue = symbol_params
-                symbol_node.setNodeGraphicURL(file_url)
+            for entry in store.get_symbols(category_name):
+                symbol_node = self.create_symbol_node(category_name, entry)
                 category_node.appendChild(symbol_node)
+                symbols.append((entry["name"], symbol_node))
 
         tree_model.setPropertyValue("DataModel", self.mutable_tree_data_model)
+        self.tree_filter.set_tree(self.root_node, categories)
 
         tree_ctrl.expandNode(self.root_node)
         for i in range(self.root_node.getChildCount()):
             category_node = self.root_node.getChildAt(i)
             tree_ctrl.expandNode(category_node)
 
-    def rename_symbol(self):
-        RenameDialog(self.ctx, self.selected_node, self.favorites_dir_path).run()
+    def create_category_node(self, category_name):
+        return self.mutable_tree_data_model.createNode(category_name, True)
+
+    def create_symbol_node(self, category_name, entry):
+        symbol_node = self.mutable_tree_data_model.createNode(entry["name"], False)
+        self.update_symbol_node(symbol_node, category_name, entry)
+        return symbol_node
+
+    def update_symbol_node(self, symbol_node, category_name, entry):
+        file_path = os.path.join(self.favorites_store.directory, entry["svg"])
+        symbol_node.setDisplayValue(entry["name"])
+        symbol_node.DataValue = self.get_symbol_params(entry["params"])
+        # A raster thumbnail of the row height, the tree does not have to
+        # decode and scale the SVG again when it loads the node. Missing
+        # ones are rasterized later, the node shows the SVG meanwhile.
+        svg_url = systemPathToFileUrl(file_path)
+        symbol_node.setNodeGraphicURL(
+            ThumbnailStore.get_instance(self.ctx).get_thumbnail_url(
+                file_path,
+                entry.get("hash"),
+                on_ready=lambda url: self.set_thumbnail(symbol_node, svg_url, url),
+            )
+        )
 
-    def update_export_button_state(self):
-        has_symbol = bool(os.listdir(self.favorites_dir_path))
-        self.toolpanel.getControl("btExport").getModel().State = 0 if has_symbol else 1
+    def set_thumbnail(self, symbol_node, svg_url, thumbnail_url):
+        # The node may have been updated since the thumbnail was requested
+        if symbol_node.getNodeGraphicURL() == svg_url:
+            symbol_node.setNodeGraphicURL(thumbnail_url)
 
-    def get_symbol_path(self, symbol_name):
-        category_name = self.selected_node.getParent().getDisplayValue()
-        category_path = os.path.join(self.favorites_dir_path, category_name)
-        path = os.path.join(category_path, symbol_name)
-        return path
+    def on_favorites_changed(self, changes):
+        if self.toolpanel is None:
+            return
 
-    def node_name_exists(self, parent_node, name: str, exclude_node=None) -> bool:
-        for i in range(parent_node.getChildCount()):
-            child = parent_node.getChildAt(i)
-            if child == exclude_node:
-                continue
-            if child.getDisplayValue() == name:
-                return True
+        for category_node in self.tree_filter.apply_changes(changes):
+            self.tree_control.expandNode(category_node)
+        if self.selected_node is not None and self.selected_node.getParent() is None:
+            # removed, possibly by another process
+            self.selected_node = None
+        self.update_export_button_state()
+
+    def get_frame(self):
+        return self.desktop.getCurrentFrame()
+
+    def onDispose(self, event):
+        self.favorites_store.remove_listener(self.on_favorites_changed)
+        self.favorites_watcher.release()
 
-        return False
+    def rename_symbol(self):
+        RenameDialog(self.ctx, self.selected_node, self.favorites_store).run()
+
+    def update_export_button_state(self):
+        has_symbol = self.favorites_store.has_symbols()
+        self.toolpanel.getControl("btExport").getModel().State = 0 if has_symbol else 1
 
     def rename_symbol_files(self):
         old_name = self.selected_node_name
@@ -480,28 +465,19 @@ class SidebarPanel(unohelper.Base, XSidebarPanel, XUIElement, XToolPanel):
         if old_name == new_name:
             return
 
-        exists = self.node_name_exists(node.getParent(), new_name, node)
-        if exists:
+        category_name = node.getParent().getDisplayValue()
+        existing_names = self.favorites_store.get_symbol_names(category_name)
+        if new_name in existing_names:
             n = 1
             base_name = new_name
             new_name = f"{base_name} ({n})"
 
-            while self.node_name_exists(node.getParent(), new_name, node):
+            while new_name in existing_names:
                 n += 1
                 new_name = f"{base_name} ({n})"
 
-            node.setDisplayValue(new_name)
-
-        old_svg = self.get_symbol_path(old_name) + ".svg"
-        old_json = self.get_symbol_path(old_name) + ".json"
-
-        new_svg = self.get_symbol_path(new_name) + ".svg"
-        new_json = self.get_symbol_path(new_name) + ".json"
-
-        os.rename(old_svg, new_svg)
-        os.rename(old_json, new_json)
-
-        node.setNodeGraphicURL(systemPathToFileUrl(new_svg))
+        # the tree node is updated by on_favorites_changed()
+        self.favorites_store.rename_symbol(category_name, old_name, new_name)
         self.selected_node_name = None
 
     def onResize(self, event):
@@ -568,8 +544,9 @@ class SidebarPanel(unohelper.Base, XSidebarPanel, XUIElement, XToolPanel):
 
 
 class WindowResizeListener(unohelper.Base, XWindowListener):
-    def __init__(self, callback):
+    def __init__(self, callback, dispose_callback=None):
         self.callback = callback
+        self.dispose_callback = dispose_callback
 
     def windowResized(self, event):
         self.callback(event)
@@ -584,7 +561,8 @@ class WindowResizeListener(unohelper.Base, XWindowListener):
         pass
 
     def disposing(self, event):
-        pass
+        if self.dispose_callback:
+            self.dispose_callback(event)
 
 
 class NewButtonListener(unohelper.Base, XActionListener):
@@ -618,7 +596,6 @@ class TextboxKeyListener(unohelper.Base, XKeyListener):
     def __init__(self, sidebar, textbox):
         self.textbox = textbox
         self.sidebar = sidebar
-        self.tree_restored = True
 
     def keyPressed(self, event):
         pass
@@ -628,44 +605,13 @@ class TextboxKeyListener(unohelper.Base, XKeyListener):
         self.filter_sidebar_tree(text)
 
     def filter_sidebar_tree(self, text: str):
-        if not text:
-            if self.tree_restored:
-                self.sidebar.init_favorites_sidebar()
-                self.sidebar.removed_nodes.clear()
-                self.tree_restored = False
-            return
-
-        self.tree_restored = True
-        search_text = text.lower()
-        root_node = self.sidebar.root_node
-
-        for i in reversed(range(root_node.getChildCount())):
-            parent_node = root_node.getChildAt(i)
-
-            for j in reversed(range(parent_node.getChildCount())):
-                child_node = parent_node.getChildAt(j)
-                node_name = child_node.getDisplayValue().lower()
-                found = node_name.startswith(search_text) or any(
-                    word.startswith(search_text) for word in node_name.split()
-                )
-
-                if not found:
-                    self.sidebar.removed_nodes.append(child_node)
-                    parent_node.removeChildByIndex(j)
-                    if parent_node.getChildCount() == 0:
-                        root_node.removeChildByIndex(i)
-
-        for node in self.sidebar.removed_nodes:
-            node_name = node.getDisplayValue().lower()
-            matches_search = node_name.startswith(search_text) or any(
-                word.startswith(search_text) for word in node_name.split()
-            )
+        tree_filter = self.sidebar.tree_filter
+        if not tree_filter.is_current():
+            # the favorites changed since the tree was built
+            self.sidebar.init_favorites_sidebar()
 
-            if matches_search:
-                self.sidebar.init_favorites_sidebar()
-                self.sidebar.removed_nodes.clear()
-                self.filter_sidebar_tree(search_text)
-                break
+        for category_node in tree_filter.filter(text):
+            self.sidebar.tree_control.expandNode(category_node)
 
 
 class ImportButtonListener(unohelper.Base, XActionListener):
@@ -679,7 +625,7 @@ class ImportButtonListener(unohelper.Base, XActionListener):
                 "com.sun.star.ui.dialogs.FilePicker", self.ctx
             )
             file_picker.initialize((FILEOPEN_SIMPLE,))
-            file_picker.appendFilter("JSON File", "*.json")
+            file_picker.appendFilter("Favorites Bundle or JSON File", "*.zip;*.json")
 
             if file_picker.execute() != 1:
                 file_picker.dispose()
@@ -693,29 +639,17 @@ class ImportButtonListener(unohelper.Base, XActionListener):
 
             file_picker.dispose()
 
-            with open(path, "r", encoding="utf-8") as f:
-                all_data = json.load(f)
-
-            favorites_dir = self.sidebar.favorites_dir_path
-            os.makedirs(favorites_dir, exist_ok=True)
-
-            for category_name, symbols in all_data.items():
-                category_path = os.path.join(favorites_dir, category_name)
-                os.makedirs(category_path, exist_ok=True)
-
-                for symbol_name, symbol_content in symbols.items():
-                    json_path = os.path.join(category_path, f"{symbol_name}.json")
-                    with open(json_path, "w", encoding="utf-8") as f:
-                        json.dump(
-                            symbol_content["data"], f, indent=4, ensure_ascii=False
-                        )
-
-                    svg_path = os.path.join(category_path, f"{symbol_name}.svg")
-                    with open(svg_path, "w", encoding="utf-8") as f:
-                        f.write(symbol_content["svg"])
-
-            self.sidebar.init_favorites_sidebar()
-            self.sidebar.update_export_button_state()
+            # the imported symbols are added to the tree by on_favorites_changed()
+            store = self.sidebar.favorites_store
+            directory = store.directory
+            snapshot = store.get_snapshot()
+            task = BackgroundTask(
+                self.ctx, self.sidebar.get_frame(), "Importing symbols"
+            )
+            task.start(
+                lambda progress: import_favorites(path, directory, snapshot, progress),
+                store.add_imported_symbols,
+            )
 
         except Exception as e:
             print("File opening error:", e)
@@ -739,18 +673,36 @@ class TreeDragDropHandler(unohelper.Base, XDragGestureListener, XDragSourceListe
             node = self.tree_control.getNodeForLocation(
                 event.DragOriginX, event.DragOriginY
             )
-            if node and node.getChildCount() == 0:  # Only leaf nodes are draggable
-                # Create transferable data
-                transferable = SymbolTransferable(
-                    self.ctx, node, self.sidebar_panel.favorites_dir_path
-                )
+            if not node:
+                return
+
+            # Read the dragged symbols once, every flavor is served from them
+            symbols = load_drag_symbols(
+                self.sidebar_panel.favorites_store, self.get_drag_keys(node)
+            )
+            if not symbols:
+                return
+            transferable = SymbolTransferable(self.ctx, symbols)
 
-                # Start the drag operation
-                drag_source = event.DragSource
-                drag_source.startDrag(event, ACTION_COPY, 0, 0, transferable, self)
+            # Start the drag operation
+            drag_source = event.DragSource
+            drag_source.startDrag(event, ACTION_COPY, 0, 0, transferable, self)
         except Exception as e:
             print(f"Error in dragGestureRecognized: {e}")
 
+    def get_drag_keys(self, node):
+        """Get [(category, name)] of a symbol node or of the shown category symbols"""
+        parent_node = node.getParent()
+        if parent_node is None:
+            return []
+        if node.getChildCount() == 0:
+            return [(parent_node.getDisplayValue(), node.getDisplayValue())]
+        category_name = node.getDisplayValue()
+        return [
+            (category_name, node.getChildAt(i).getDisplayValue())
+            for i in range(node.getChildCount())
+        ]
+
     # XDragSourceListener methods
     def dragEnter(self, event):
         """Drag entered a drop target"""
@@ -801,116 +753,6 @@ class TreeDragDropHandler(unohelper.Base, XDragGestureListener, XDragSourceListe
         pass
 
 
-class SymbolTransferable(unohelper.Base, XTransferable):
-    """Transferable data for symbol drag and drop"""
-
-    def __init__(self, ctx, node, favorites_dir_path):
-        self.ctx = ctx
-        self.node = node
-        self.favorites_dir_path = favorites_dir_path
-
-        # Setup data flavors
-        self.data_flavor = DataFlavor()
-        self.data_flavor.MimeType = (
-            'application/x-openoffice-drawing;windows_formatname="Drawing Format"'
-        )
-
-    def getTransferData(self, flavor):
-        """Get the transferable data"""
-        if flavor.MimeType == self.data_flavor.MimeType:
-            # LibreOffice expects a byte sequence containing a document with the graphic
-            # Read the template document from the data folder
-            package_path = fileUrlToSystemPath(get_package_location(self.ctx))
-            template_path = os.path.join(
-                package_path, "source", "data", "dragdropgraphic.fodg"
-            )
-            with open(template_path, "r", encoding="utf-8") as f:
-                data_string = f.read()
-
-            # Get SVG content from the dragged node
-            svg_string = self._get_svg_content_from_node()
-            # Base64 encode the SVG content
-            svg_base64 = base64.b64encode(svg_string.encode("utf-8")).decode("utf-8")
-            svg_size = parse_svg_dimensions(svg_string)
-            # Normalize height based on configuration while maintaining aspect ratio
-            target_height = get_default_symbol_height_cm(self.ctx)
-            if svg_size.Height > 0:
-                aspect_scale = target_height / svg_size.Height
-                svg_size.Width = int(svg_size.Width * aspect_scale)
-                svg_size.Height = target_height
-            width_cm = svg_size.Width / 1000.0  # 1/100mm to cm
-            height_cm = svg_size.Height / 1000.0  # 1/100mm to cm
-            data_string = data_string.replace("SVG_BASE_64_ENCODED", svg_base64)
-            data_string = data_string.replace("SVG_WIDTH_CM", str(width_cm) + "cm")
-            data_string = data_string.replace("SVG_HEIGHT_CM", str(height_cm) + "cm")
-            data_string = data_string.replace(
-                "SYMBOL_NAME", self.node.getDisplayValue()
-            )
-
-            style_start = data_string.find('<style:style style:name="gr1"')
-            style_end = data_string.find("</style:style>", style_start)
-
-            props_start = data_string.find(
-                "<style:graphic-properties", style_start, style_end
-            )
-            props_end = data_string.find("/>", props_start)
-            props_tag = data_string[props_start:props_end]
-
-            milsym_values = {}
-            for item in self.node.DataValue[1:]:
-                milsym_values[item.Name] = str(item.Value)
-
-            attrs = []
-            attrs.append(f'MilSymCode="{self.node.DataValue[0]}"')
-            for name, value in milsym_values.items():
-                attrs.append(f'MilSym{name[0].upper() + name[1:]}="{value}"')
-
-            new_props_tag = props_tag + " " + " ".join(attrs) + "/>"
-
-            data_string = (
-                data_string[:props_start] + new_props_tag + data_string[props_end + 2 :]
-            )
-
-            data_bytes = data_string.encode("utf-8")
-            return uno.ByteSequence(data_bytes)
-        else:
-            raise uno.RuntimeException("Unsupported data flavor", self)
-
-    def getTransferDataFlavors(self):
-        """Get available data flavors"""
-        return (self.data_flavor,)
-
-    def isDataFlavorSupported(self, flavor):
-        """Check if data flavor is supported"""
-        return flavor.MimeType == self.data_flavor.MimeType
-
-    def _get_svg_content_from_node(self):
-        """Get SVG content from the dragged node"""
-        try:
-            # Get the symbol name from the node
-            symbol_name = self.node.getDisplayValue()
-
-            # Get the category name from the parent node
-            parent_node = self.node.getParent()
-            category_name = parent_node.getDisplayValue()
-
-            # Construct the path to the SVG file
-            category_path = os.path.join(self.favorites_dir_path, category_name)
-            svg_file_path = os.path.join(category_path, f"{symbol_name}.svg")
-
-            # Read and return the SVG content
-            if os.path.exists(svg_file_path):
-                with open(svg_file_path, "r", encoding="utf-8") as f:
-                    return f.read()
-            else:
-                print(f"SVG file not found: {svg_file_path}")
-                return ""
-
-        except Exception as e:
-            print(f"Error reading SVG content: {e}")
-            return ""
-
-
 class ExportButtonListener(unohelper.Base, XActionListener):
     def __init__(self, ctx, sidebar):
         self.ctx = ctx
@@ -926,8 +768,9 @@ class ExportButtonListener(unohelper.Base, XActionListener):
                 "com.sun.star.ui.dialogs.FilePicker", self.ctx
             )
             file_picker.initialize((FILESAVE_AUTOEXTENSION,))
-            file_picker.setDefaultName("sidebar_data.json")
-            file_picker.appendFilter("JOSN File", "*.json")
+            file_picker.setDefaultName("sidebar_data")
+            file_picker.appendFilter("Favorites Bundle", "*.zip")
+            file_picker.appendFilter("JSON File", "*.json")
 
             if file_picker.execute() != 1:
                 file_picker.dispose()
@@ -941,33 +784,15 @@ class ExportButtonListener(unohelper.Base, XActionListener):
 
             file_picker.dispose()
 
-            all_data = {}
-            favorites_dir = self.sidebar.favorites_dir_path
-            for category_name in sorted(os.listdir(favorites_dir)):
-                category_path = os.path.join(favorites_dir, category_name)
-                if not os.path.isdir(category_path):
-                    continue
-
-                all_data[category_name] = {}
-                for file_name in sorted(os.listdir(category_path)):
-                    if file_name.endswith(".json"):
-                        file_base = os.path.splitext(file_name)[0]
-
-                        json_path = os.path.join(category_path, f"{file_base}.json")
-                        with open(json_path, "r", encoding="utf-8") as f:
-                            data = json.load(f)
-
-                        svg_path = os.path.join(category_path, f"{file_base}.svg")
-                        with open(svg_path, "r", encoding="utf-8") as f:
-                            svg_content = f.read()
-
-                        all_data[category_name][file_base] = {
-                            "data": data,
-                            "svg": svg_content,
-                        }
-
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(all_data, f, indent=4, ensure_ascii=False)
+            store = self.sidebar.favorites_store
+            directory = store.directory
+            snapshot = store.get_snapshot()
+            task = BackgroundTask(
+                self.ctx, self.sidebar.get_frame(), "Exporting symbols"
+            )
+            task.start(
+                lambda progress: export_favorites(path, directory, snapshot, progress)
+            )
 
         except Exception as e:
             print("Save file error:", e)
@@ -0,0 +1,234 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Drag payloads of the favorites sidebar
+
+A drag gesture resolves its symbols once, from the favorites store, and the
+transferable serves every data flavor LibreOffice asks for during the drop
+from buffers built on the first request:
+
+- the drawing format, a Draw document with one frame per symbol, carrying
+  the MilSym attributes that make the shapes editable symbols again
+- image/svg+xml, the SVG of a single symbol as it is stored
+- image/png, a bitmap of a single symbol for targets that only take images
+
+Only the drawing format keeps the symbols editable, so it is offered first.
+
+Dragging a category inserts all of its shown symbols in one drop, laid out
+in rows.
+"""
+
+import base64
+import os
+from xml.sax.saxutils import escape, quoteattr
+
+import uno
+import unohelper
+
+from unohelper import fileUrlToSystemPath
+
+from com.sun.star.datatransfer import DataFlavor, XTransferable
+
+from icon_store import rasterize_svg
+from utils import (
+    get_default_symbol_height_cm,
+    get_package_location,
+    parse_svg_dimensions,
+)
+
+DRAWING_MIME_TYPE = (
+    'application/x-openoffice-drawing;windows_formatname="Drawing Format"'
+)
+SVG_MIME_TYPE = 'image/svg+xml;windows_formatname="image/svg+xml"'
+PNG_MIME_TYPE = 'image/png;windows_formatname="PNG"'
+
+# Height of the bitmap flavor in pixels
+BITMAP_HEIGHT = 256
+
+# Layout of the frames when several symbols are dropped at once
+SYMBOLS_PER_ROW = 5
+SPACING = 500  # 1/100mm
+
+_template = None
+
+
+def get_drawing_template(ctx):
+    """Get the Draw document template, read once per process"""
+    global _template
+    if _template is None:
+        package_path = fileUrlToSystemPath(get_package_location(ctx))
+        template_path = os.path.join(
+            package_path, "source", "data", "dragdropgraphic.fodg"
+        )
+        with open(template_path, "r", encoding="utf-8") as f:
+            _template = f.read()
+    return _template
+
+
+def load_drag_symbols(favorites_store, keys):
+    """Get [(name, params, SVG text)] of [(category, name)] for a drag
+
+    Symbols whose entry or preview is missing are left out.
+    """
+    symbols = []
+    for category_name, symbol_name in keys:
+        entry = favorites_store.get_symbol(category_name, symbol_name)
+        if entry is None:
+            continue
+        svg_path = favorites_store.get_svg_path(category_name, symbol_name)
+        try:
+            with open(svg_path, "r", encoding="utf-8") as f:
+                svg_string = f.read()
+        except OSError as e:
+            print(f"Error reading SVG content: {e}")
+            continue
+        symbols.append((symbol_name, entry["params"], svg_string))
+    return symbols
+
+
+def build_drawing_document(template, symbols, target_height):
+    """Get the Draw document with a frame for each of [(name, params, SVG)]
+
+    Args:
+        template: Content of dragdropgraphic.fodg
+        symbols: Symbols to insert, in order
+        target_height: Height of the symbols in 1/100mm
+    """
+    style_start = template.find('<style:style style:name="gr1"')
+    style_end = template.find("</style:style>", style_start) + len("</style:style>")
+    frame_start = template.find("<draw:frame")
+    frame_end = template.find("</draw:frame>", frame_start) + len("</draw:frame>")
+    style_template = template[style_start:style_end]
+    frame_template = template[frame_start:frame_end]
+
+    styles = []
+    frames = []
+    x = y = row_height = 0
+    for i, (symbol_name, params, svg_string) in enumerate(symbols):
+        if i and i % SYMBOLS_PER_ROW == 0:
+            x = 0
+            y += row_height + SPACING
+            row_height = 0
+
+        # Normalize the height while maintaining the aspect ratio
+        svg_size = parse_svg_dimensions(svg_string)
+        if svg_size.Height > 0:
+            aspect_scale = target_height / svg_size.Height
+            svg_size.Width = int(svg_size.Width * aspect_scale)
+            svg_size.Height = target_height
+
+        style_name = "gr1" if i == 0 else f"gr1_{i}"
+        styles.append(_make_style(style_template, style_name, params))
+
+        svg_base64 = base64.b64encode(svg_string.encode("utf-8")).decode("utf-8")
+        frame = frame_template.replace(
+            'draw:style-name="gr1"', f'draw:style-name="{style_name}"'
+        )
+        frame = frame.replace('svg:x="0cm"', f'svg:x="{x / 1000.0}cm"')
+        frame = frame.replace('svg:y="0cm"', f'svg:y="{y / 1000.0}cm"')
+        frame = frame.replace("SVG_BASE_64_ENCODED", svg_base64)
+        frame = frame.replace("SVG_WIDTH_CM", f"{svg_size.Width / 1000.0}cm")
+        frame = frame.replace("SVG_HEIGHT_CM", f"{svg_size.Height / 1000.0}cm")
+        frame = frame.replace("SYMBOL_NAME", escape(symbol_name, {'"': "&quot;"}))
+        frames.append(frame)
+
+        x += svg_size.Width + SPACING
+        row_height = max(row_height, svg_size.Height)
+
+    return (
+        template[:style_start]
+        + "\n".join(styles)
+        + template[style_end:frame_start]
+        + "\n".join(frames)
+        + template[frame_end:]
+    )
+
+
+def _make_style(style_template, style_name, params):
+    """Get a copy of the gr1 graphic style with the MilSym attributes"""
+    style = style_template.replace('style:name="gr1"', f'style:name="{style_name}"')
+    props_start = style.find("<style:graphic-properties")
+    props_end = style.find("/>", props_start)
+
+    attrs = [f"MilSymCode={quoteattr(str(params.get('sidc', '')))}"]
+    for name, value in params.items():
+        if name not in ("sidc", "order_index"):
+            element = "MilSym" + name[0].upper() + name[1:]
+            attrs.append(f"{element}={quoteattr(str(value))}")
+
+    return style[:props_end] + " " + " ".join(attrs) + style[props_end:]
+
+
+class SymbolTransferable(unohelper.Base, XTransferable):
+    """Transferable data for symbol drag and drop"""
+
+    def __init__(self, ctx, symbols):
+        """
+        Args:
+            ctx: Component context
+            symbols: [(name, params, SVG text)] from load_drag_symbols()
+        """
+        self.ctx = ctx
+        self.symbols = symbols
+        # flavor MIME type -> uno.ByteSequence, built on the first request
+        self._data = {}
+
+        self.data_flavors = [_make_flavor(DRAWING_MIME_TYPE, "Drawing Format")]
+        if len(symbols) == 1:
+            self.data_flavors.append(_make_flavor(SVG_MIME_TYPE, "SVG"))
+            self.data_flavors.append(_make_flavor(PNG_MIME_TYPE, "PNG"))
+
+    def getTransferData(self, flavor):
+        """Get the transferable data"""
+        if not self.isDataFlavorSupported(flavor):
+            raise uno.RuntimeException("Unsupported data flavor", self)
+
+        data = self._data.get(flavor.MimeType)
+        if data is None:
+            content = self._build_data(flavor.MimeType)
+            if content is None:
+                raise uno.RuntimeException("Data flavor not available", self)
+            data = uno.ByteSequence(content)
+            self._data[flavor.MimeType] = data
+        return data
+
+    def getTransferDataFlavors(self):
+        """Get available data flavors"""
+        return tuple(self.data_flavors)
+
+    def isDataFlavorSupported(self, flavor):
+        """Check if data flavor is supported"""
+        return any(
+            flavor.MimeType == data_flavor.MimeType
+            for data_flavor in self.data_flavors
+        )
+
+    def _build_data(self, mime_type):
+        if mime_type == SVG_MIME_TYPE:
+            return self.symbols[0][2].encode("utf-8")
+        if mime_type == PNG_MIME_TYPE:
+            return rasterize_svg(
+                self.ctx, self.symbols[0][2].encode("utf-8"), BITMAP_HEIGHT
+            )
+
+        # LibreOffice expects a document with the graphics
+        document = build_drawing_document(
+            get_drawing_template(self.ctx),
+            self.symbols,
+            get_default_symbol_height_cm(self.ctx),
+        )
+        return document.encode("utf-8")
+
+
+def _make_flavor(mime_type, name):
+    flavor = DataFlavor()
+    flavor.MimeType = mime_type
+    flavor.HumanPresentableName = name
+    flavor.DataType = uno.getTypeByName("[]byte")
+    return flavor
@@ -0,0 +1,292 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Incremental filtering of the favorites sidebar tree
+
+The filter keeps every node of the favorites tree, also the hidden ones,
+in the order of the favorites store. Filtering computes the visible set of
+symbols and only detaches or reattaches the nodes whose visibility changed,
+so typing in the filter box never rebuilds the tree or reads the disk.
+
+Narrowing a query (adding words or characters) filters the previous matches
+in memory, other queries are answered by the store's search index once and
+cached until the favorites change.
+
+Changes of the favorites store are applied the same way: apply_changes()
+creates, updates or drops the nodes of the changed symbols only.
+"""
+
+import bisect
+
+from favorites_index import get_search_text, matching_words, split_words
+
+
+class FavoritesTreeFilter:
+    """Visible subset of the favorites tree for a filter text"""
+
+    # Number of cached query results, enough for typing and deleting a word
+    CACHE_SIZE = 32
+
+    def __init__(self, favorites_store, node_factory):
+        """
+        Args:
+            favorites_store: FavoritesStore shown by the tree
+            node_factory: Object with create_category_node(category),
+                create_symbol_node(category, entry) and
+                update_symbol_node(node, category, entry)
+        """
+        self.favorites_store = favorites_store
+        self.node_factory = node_factory
+        self._root_node = None
+        # sorted category names, category name -> node
+        self._category_names = []
+        self._category_nodes = {}
+        # category name -> [[symbol name, symbol node]] in store order
+        self._symbols = {}
+        self._revision = None
+        # keys (category name, symbol name) and category names that are attached
+        self._shown_symbols = set()
+        self._shown_categories = set()
+        # query words tuple -> matching keys, None for all
+        self._cache = {}
+        self._last_query = ()
+        self._last_matches = None
+
+    def set_tree(self, root_node, categories):
+        """Take over a freshly built, unfiltered tree
+
+        Args:
+            root_node: Root node of the tree
+            categories: [(category name, category node, [(name, node)])] in
+                tree order
+        """
+        self._root_node = root_node
+        self._category_names = [category for category, _node, _s in categories]
+        self._category_nodes = {category: node for category, node, _s in categories}
+        self._symbols = {
+            category: [[name, node] for name, node in symbols]
+            for category, _node, symbols in categories
+        }
+        self._revision = self.favorites_store.revision
+        self._shown_categories = set(self._category_names)
+        self._shown_symbols = {
+            (category, name)
+            for category, symbols in self._symbols.items()
+            for name, _node in symbols
+        }
+        self._cache.clear()
+        self._last_query = ()
+        self._last_matches = None
+
+    def is_current(self):
+        """Check if the tree still shows the favorites of the store"""
+        return (
+            self._root_node is not None
+            and self._revision == self.favorites_store.revision
+        )
+
+    def is_shown(self, category_name, symbol_name):
+        return (category_name, symbol_name) in self._shown_symbols
+
+    def get_node(self, category_name, symbol_name):
+        """Get the node of a symbol, also when it is hidden by the filter"""
+        for name, node in self._symbols.get(category_name, []):
+            if name == symbol_name:
+                return node
+        return None
+
+    def filter(self, text):
+        """Show the symbols matching text, all symbols if it is empty
+
+        Returns:
+            List of the category nodes that were reattached, to be expanded
+        """
+        query = tuple(split_words(text))
+        matches = self._get_matches(query)
+        self._last_query = query
+        self._last_matches = matches
+        return self._apply(matches)
+
+    def apply_changes(self, changes):
+        """Apply the changes of a FavoritesStore listener call to the tree
+
+        Returns:
+            List of the category nodes that were attached, to be expanded
+        """
+        if self._revision != self.favorites_store.revision - 1:
+            # not built or missed changes, rebuilt on the next filtering
+            return []
+
+        self._cache.clear()
+        for change in changes:
+            kind, category_name = change[0], change[1]
+            if kind == "insert":
+                self._insert_symbol(category_name, change[2], change[3])
+            elif kind == "update":
+                entry = change[2]
+                node = self.get_node(category_name, entry["name"])
+                self.node_factory.update_symbol_node(node, category_name, entry)
+                self._update_match(category_name, entry)
+            elif kind == "rename":
+                self._rename_symbol(category_name, change[2], change[3])
+            elif kind == "remove":
+                self._remove_symbol(category_name, change[2])
+
+        self._revision = self.favorites_store.revision
+        return self._apply(self._last_matches)
+
+    def _insert_symbol(self, category_name, index, entry):
+        """Add the detached node of a new symbol, _apply() attaches it"""
+        if category_name not in self._category_nodes:
+            bisect.insort(self._category_names, category_name)
+            self._category_nodes[category_name] = (
+                self.node_factory.create_category_node(category_name)
+            )
+            self._symbols[category_name] = []
+
+        node = self.node_factory.create_symbol_node(category_name, entry)
+        self._symbols[category_name].insert(index, [entry["name"], node])
+        self._update_match(category_name, entry)
+
+    def _rename_symbol(self, category_name, old_name, entry):
+        old_key = (category_name, old_name)
+        new_key = (category_name, entry["name"])
+        for symbol in self._symbols[category_name]:
+            if symbol[0] == old_name:
+                symbol[0] = entry["name"]
+                self.node_factory.update_symbol_node(symbol[1], category_name, entry)
+                break
+
+        if old_key in self._shown_symbols:
+            self._shown_symbols.discard(old_key)
+            self._shown_symbols.add(new_key)
+        if self._last_matches is not None and old_key in self._last_matches:
+            self._last_matches.discard(old_key)
+            self._last_matches.add(new_key)
+        self._update_match(category_name, entry)
+
+    def _remove_symbol(self, category_name, symbol_name):
+        """Detach the node of a removed symbol and forget it"""
+        key = (category_name, symbol_name)
+        symbols = self._symbols[category_name]
+        category_node = self._category_nodes[category_name]
+        symbol_index = 0
+        for i, (name, _node) in enumerate(symbols):
+            if name == symbol_name:
+                if key in self._shown_symbols:
+                    category_node.removeChildByIndex(symbol_index)
+                    self._shown_symbols.discard(key)
+                del symbols[i]
+                break
+            if (category_name, name) in self._shown_symbols:
+                symbol_index += 1
+
+        if self._last_matches is not None:
+            self._last_matches.discard(key)
+
+        if not symbols:
+            if self._root_node is not None and category_name in self._shown_categories:
+                self._root_node.removeChildByIndex(
+                    self._get_category_index(category_name)
+                )
+                self._shown_categories.discard(category_name)
+            self._category_names.remove(category_name)
+            del self._category_nodes[category_name]
+            del self._symbols[category_name]
+
+    def _get_category_index(self, category_name):
+        """Get the position of a shown category among the shown categories"""
+        index = 0
+        for name in self._category_names:
+            if name == category_name:
+                break
+            if name in self._shown_categories:
+                index += 1
+        return index
+
+    def _update_match(self, category_name, entry):
+        """Keep the current matches up to date with a new or changed symbol"""
+        if self._last_matches is None:
+            return
+        key = (category_name, entry["name"])
+        if matching_words(self._last_query, get_search_text(category_name, entry)):
+            self._last_matches.add(key)
+        else:
+            self._last_matches.discard(key)
+
+    def _get_matches(self, query):
+        if not query:
+            return None
+        if query in self._cache:
+            return self._cache[query]
+
+        if self._is_narrowing(query) and self._last_matches is not None:
+            matches = {
+                key for key in self._last_matches if self._matches_key(query, key)
+            }
+        else:
+            matches = self.favorites_store.search(" ".join(query))
+
+        if len(self._cache) >= self.CACHE_SIZE:
+            del self._cache[next(iter(self._cache))]
+        self._cache[query] = matches
+        return matches
+
+    def _is_narrowing(self, query):
+        """Check if every match of query also matches the last query"""
+        last_query = self._last_query
+        if not last_query or len(query) < len(last_query):
+            return False
+        return all(
+            word.startswith(last_word) for word, last_word in zip(query, last_query)
+        )
+
+    def _matches_key(self, query, key):
+        category_name, symbol_name = key
+        entry = self.favorites_store.get_symbol(category_name, symbol_name)
+        if entry is None:
+            return False
+        return matching_words(query, get_search_text(category_name, entry))
+
+    def _apply(self, matches):
+        """Detach and reattach the nodes whose visibility changed"""
+        root_node = self._root_node
+        shown_categories = []
+        if root_node is None:
+            return shown_categories
+        category_index = 0
+        for category_name in self._category_names:
+            category_node = self._category_nodes[category_name]
+            symbol_index = 0
+            for symbol_name, symbol_node in self._symbols[category_name]:
+                key = (category_name, symbol_name)
+                visible = matches is None or key in matches
+                shown = key in self._shown_symbols
+                if visible and not shown:
+                    category_node.insertChildByIndex(symbol_index, symbol_node)
+                    self._shown_symbols.add(key)
+                elif shown and not visible:
+                    category_node.removeChildByIndex(symbol_index)
+                    self._shown_symbols.discard(key)
+                if visible:
+                    symbol_index += 1
+
+            visible = symbol_index > 0
+            shown = category_name in self._shown_categories
+            if visible and not shown:
+                root_node.insertChildByIndex(category_index, category_node)
+                self._shown_categories.add(category_name)
+                shown_categories.append(category_node)
+            elif shown and not visible:
+                root_node.removeChildByIndex(category_index)
+                self._shown_categories.discard(category_name)
+            if visible:
+                category_index += 1
+
+        return shown_categories
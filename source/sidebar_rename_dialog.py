@@ -4,19 +4,19 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import os
 import unohelper
 
-from unohelper import systemPathToFileUrl
 from com.sun.star.awt import XDialogEventHandler
 from com.sun.star.awt.Key import RETURN
 
+from favorites_store import is_file_name
+
 
 class RenameDialog:
-    def __init__(self, ctx, node, dir_path):
+    def __init__(self, ctx, node, favorites_store):
         self.ctx = ctx
         self.node = node
-        self.favorites_dir_path = dir_path
+        self.favorites_store = favorites_store
 
     def run(self):
         try:
@@ -28,7 +28,7 @@ class RenameDialog:
                 "vnd.sun.star.extension://com.collabora.milsymbol/dialog/RenameDlg.xdl"
             )
 
-            handler = RenameDlgHandler(self.ctx, self.node, self.favorites_dir_path)
+            handler = RenameDlgHandler(self.ctx, self.node, self.favorites_store)
             rename_dialog = dialog_provider.createDialogWithHandler(dialog_url, handler)
 
             name_textbox = rename_dialog.getControl("tbName")
@@ -40,20 +40,19 @@ class RenameDialog:
 
 
 class RenameDlgHandler(unohelper.Base, XDialogEventHandler):
-    def __init__(self, ctx, node, dir_path):
+    def __init__(self, ctx, node, favorites_store):
         self.ctx = ctx
         self.node = node
-        self.favorites_dir_path = dir_path
+        self.favorites_store = favorites_store
         self.symbol_name = node.getDisplayValue()
 
     def callHandlerMethod(self, dialog, eventObject, methodName):
         if methodName == "tbName":
             self.symbol_name = dialog.getControl(methodName).Text
 
-            svg_path = self.get_path(self.symbol_name) + ".svg"
-            invalid_button = self.symbol_name == "" or (
+            invalid_button = not is_file_name(self.symbol_name) or (
                 self.symbol_name != self.node.getDisplayValue()
-                and os.path.exists(svg_path)
+                and self.symbol_exists(self.symbol_name)
             )
 
             dialog.getControl("btOk").getModel().State = 1 if invalid_button else 0
@@ -79,11 +78,11 @@ class RenameDlgHandler(unohelper.Base, XDialogEventHandler):
     def disposing(self, event):
         pass
 
-    def get_path(self, symbol_name):
-        category_name = self.node.getParent().getDisplayValue()
-        category_path = os.path.join(self.favorites_dir_path, category_name)
-        path = os.path.join(category_path, symbol_name)
-        return path
+    def get_category_name(self):
+        return self.node.getParent().getDisplayValue()
+
+    def symbol_exists(self, symbol_name):
+        return self.favorites_store.has_symbol(self.get_category_name(), symbol_name)
 
     def set_symbol_name(self, dialog, new_symbol_name):
         old_symbol_name = self.node.getDisplayValue()
@@ -92,20 +91,12 @@ class RenameDlgHandler(unohelper.Base, XDialogEventHandler):
             dialog.endExecute()
             return
 
-        new_svg = self.get_path(new_symbol_name) + ".svg"
-        new_json = self.get_path(new_symbol_name) + ".json"
-
-        if os.path.exists(new_svg):
-            dialog.endExecute()
+        # the sidebar panels update the node when the store reports the change
+        try:
+            self.favorites_store.rename_symbol(
+                self.get_category_name(), old_symbol_name, new_symbol_name
+            )
+        except (OSError, ValueError) as e:
+            print(f"Error renaming favorite: {e}")
             return
-
-        old_svg = self.get_path(old_symbol_name) + ".svg"
-        old_json = self.get_path(old_symbol_name) + ".json"
-
-        os.rename(old_svg, new_svg)
-        os.rename(old_json, new_json)
-
-        new_svg_url = systemPathToFileUrl(new_svg)
-        self.node.setNodeGraphicURL(new_svg_url)
-        self.node.setDisplayValue(new_symbol_name)
         dialog.endExecute()
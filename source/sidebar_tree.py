@@ -4,14 +4,11 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import os
 import uno
-import json
 import unohelper
 
 from symbol_dialog import open_symbol_dialog
 
-from unohelper import systemPathToFileUrl
 from com.sun.star.awt import Key, MouseButton, MenuItemStyle
 from com.sun.star.awt import (
     XKeyListener,
@@ -27,22 +24,7 @@ class SidebarTree:
         self.ctx = ctx
         self.sidebar_panel = sidebar_panel
 
-    def create_svg_file_path(self, category_name, svg_name):
-        category_dir_path = os.path.join(
-            self.sidebar_panel.favorites_dir_path, category_name
-        )
-        os.makedirs(category_dir_path, exist_ok=True)
-        symbol_full_path = os.path.join(category_dir_path, f"{svg_name}.svg")
-        return symbol_full_path
-
-    def generate_unique_name(self, parent_node, node_name, base_name="Symbol"):
-        existing_names = set()
-        count = parent_node.getChildCount()
-
-        for i in range(count):
-            child = parent_node.getChildAt(i)
-            existing_names.add(child.getDisplayValue())
-
+    def generate_unique_name(self, existing_names, node_name, base_name="Symbol"):
         if not node_name:
             n = 1
             while True:
@@ -58,10 +40,6 @@ class SidebarTree:
                 return candidate
             m += 1
 
-    def create_svg_file(self, symbol_full_path, svg_data):
-        with open(symbol_full_path, "w", encoding="utf-8") as preview_file:
-            preview_file.write(svg_data)
-
     def serialize_svg_args(self, svg_args):
         result = {}
         for i, arg in enumerate(svg_args):
@@ -72,45 +50,8 @@ class SidebarTree:
 
         return result
 
-    def node_name_exists(self, parent_node, name: str) -> bool:
-        child_count = parent_node.getChildCount()
-
-        for i in range(child_count):
-            child = parent_node.getChildAt(i)
-            if child.getDisplayValue() == name:
-                return True
-
-        return False
-
-    def get_order_index_from_json(self, json_path):
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data.get("order_index")
-
-    def reorder_symbols(self, category_path):
-        json_files = [
-            name for name in os.listdir(category_path) if name.lower().endswith(".json")
-        ]
-
-        items = []
-        for file_name in json_files:
-            full_path = os.path.join(category_path, file_name)
-            with open(full_path, "r", encoding="utf-8") as name:
-                data = json.load(name)
-                items.append((data.get("order_index"), file_name, data))
-
-        items.sort(key=lambda x: x[0])
-
-        for new_order, (_, file_name, data) in enumerate(items, start=1):
-            data["order_index"] = new_order
-            full_path = os.path.join(category_path, file_name)
-            with open(full_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
-
     def create_node(
         self,
-        root_node,
-        tree_data_model,
         category_name,
         svg_data,
         svg_args,
@@ -121,117 +62,47 @@ class SidebarTree:
             if svg_data is None:
                 return
 
-            selected_node_category_name = None
-            favorites_dir_path = self.sidebar_panel.favorites_dir_path
+            # the store reports the change to the sidebar panels, which
+            # update their tree nodes in on_favorites_changed()
+            store = self.sidebar_panel.favorites_store
+            svg_params = self.serialize_svg_args(svg_args)
+            existing_names = store.get_symbol_names(category_name)
 
             if is_editing:
-                # remove the selected node from the tree
-                # and later append the newly edited node back to the tree
-                parent_node = selected_node.getParent()
-                child_idx = parent_node.getIndex(selected_node)
-                parent_node.removeChildByIndex(child_idx)
-
-                selected_node_category_name = parent_node.getDisplayValue()
-
-                if parent_node.getChildCount() == 0:
-                    root_node = parent_node.getParent()
-                    parent_idx = root_node.getIndex(parent_node)
-                    root_node.removeChildByIndex(parent_idx)
-
-                node_name = selected_node.getDisplayValue()
-                path = os.path.join(
-                    favorites_dir_path, selected_node_category_name, node_name
+                selected_node_category_name = (
+                    selected_node.getParent().getDisplayValue()
                 )
-                json_path = f"{path}.json"
-                if os.path.exists(json_path):
-                    order_index = self.get_order_index_from_json(json_path)
-
-                # if the category name of the selected node differs from the target category,
-                # not only remove the node from the tree, but also delete its associated
-                # SVG and JSON files from the user's profile folder
-                if selected_node_category_name != category_name:
-                    count = 0
-                    category_path = os.path.join(favorites_dir_path, category_name)
-                    if os.path.exists(category_path):
-                        count = sum(
-                            1
-                            for name in os.listdir(category_path)
-                            if name.lower().endswith(".json")
-                        )
-                    order_index = count + 1
-
-                    svg_path = f"{path}.svg"
-                    if os.path.exists(svg_path):
-                        os.remove(svg_path)
-                    if os.path.exists(json_path):
-                        os.remove(json_path)
-
-                    # Delete category folder when it's empty
-                    category_dir = os.path.dirname(svg_path)
-                    if (
-                        os.path.exists(category_dir)
-                        and len(os.listdir(category_dir)) == 0
-                    ):
-                        os.rmdir(category_dir)
-
-                    old_category_path = os.path.join(
-                        favorites_dir_path, selected_node_category_name
-                    )
-                    if os.path.exists(old_category_path):
-                        self.reorder_symbols(old_category_path)
-
-            existing_category_node = None
-            for i in range(root_node.getChildCount()):
-                child = root_node.getChildAt(i)
-                if child.getDisplayValue() == category_name:
-                    existing_category_node = child
-                    break
-
-            if existing_category_node is None:
-                existing_category_node = tree_data_model.createNode(category_name, True)
-                root_node.appendChild(existing_category_node)
-
-            if is_editing:
                 node_name = selected_node.getDisplayValue()
-                is_name_exists = self.node_name_exists(
-                    existing_category_node, node_name
-                )
-                if is_name_exists:
-                    node_name = self.generate_unique_name(
-                        existing_category_node, node_name
-                    )
-            else:
-                node_name = self.generate_unique_name(existing_category_node, None)
-                order_index = existing_category_node.getChildCount() + 1
-
-            symbol_full_path = self.create_svg_file_path(category_name, node_name)
-            self.create_svg_file(symbol_full_path, svg_data)
-            svg_url = systemPathToFileUrl(symbol_full_path)
-
-            symbol_child = tree_data_model.createNode(node_name, False)
-            symbol_child.setNodeGraphicURL(svg_url)
-
-            # create JSON file to store symbol parameters
-            svg_params = self.serialize_svg_args(svg_args)
-            svg_params["order_index"] = order_index
 
-            json_file_name = f"{node_name}.json"
-            json_file_path = os.path.join(
-                os.path.dirname(symbol_full_path), json_file_name
-            )
-            with open(json_file_path, "w", encoding="utf-8") as json_file:
-                json.dump(svg_params, json_file, indent=4)
-
-            symbol_child.DataValue = svg_args
-            if is_editing:
-                existing_category_node.insertChildByIndex(order_index - 1, symbol_child)
+                if selected_node_category_name == category_name:
+                    # an edited symbol keeps its name and position
+                    store.add_symbol(category_name, node_name, svg_params, svg_data)
+                else:
+                    # a symbol moved to another category is appended to it
+                    old_name = node_name
+                    if node_name in existing_names:
+                        node_name = self.generate_unique_name(
+                            existing_names, node_name
+                        )
+                    store.move_symbol(
+                        selected_node_category_name,
+                        old_name,
+                        category_name,
+                        node_name,
+                        svg_params,
+                        svg_data,
+                    )
             else:
-                existing_category_node.appendChild(symbol_child)
+                node_name = self.generate_unique_name(existing_names, None)
+                store.add_symbol(category_name, node_name, svg_params, svg_data)
 
-            tree_control = self.sidebar_panel.tree_control
-            tree_control.expandNode(existing_category_node)
-            tree_control.select(symbol_child)
-            tree_control.makeNodeVisible(symbol_child)
+            tree_filter = self.sidebar_panel.tree_filter
+            if tree_filter.is_shown(category_name, node_name):
+                symbol_node = tree_filter.get_node(category_name, node_name)
+                tree_control = self.sidebar_panel.tree_control
+                tree_control.expandNode(symbol_node.getParent())
+                tree_control.select(symbol_node)
+                tree_control.makeNodeVisible(symbol_node)
 
         except Exception as e:
             print("Error creating symbol node:", e)
@@ -271,35 +142,10 @@ class TreeKeyListener(unohelper.Base, XKeyListener):
             if not parent_node:
                 return
 
-            idx = parent_node.getIndex(child_node)
-            parent_node.removeChildByIndex(idx)
-
+            # the node is removed by on_favorites_changed()
             category_name = parent_node.getDisplayValue()
-            favorites_dir_path = self.sidebar_panel.favorites_dir_path
-
             node_name = child_node.getDisplayValue()
-            path = os.path.join(favorites_dir_path, category_name, node_name)
-            svg_path = f"{path}.svg"
-            json_path = f"{path}.json"
-            if os.path.exists(svg_path):
-                os.remove(svg_path)
-            if os.path.exists(json_path):
-                os.remove(json_path)
-
-            child_count = parent_node.getChildCount()
-            if child_count == 0:
-                root_node = parent_node.getParent()
-                if root_node:
-                    parent_idx = root_node.getIndex(parent_node)
-                    root_node.removeChildByIndex(parent_idx)
-
-                category_dir = os.path.dirname(svg_path)
-                if os.path.exists(category_dir) and len(os.listdir(category_dir)) == 0:
-                    os.rmdir(category_dir)
-
-            else:
-                category_path = os.path.join(favorites_dir_path, category_name)
-                self.sidebar_tree.reorder_symbols(category_path)
+            self.sidebar_panel.favorites_store.remove_symbol(category_name, node_name)
 
             self.sidebar_panel.selected_node = None
             self.sidebar_panel.update_export_button_state()
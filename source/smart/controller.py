@@ -13,10 +13,15 @@
 Controller class for LibreOffice extension
 """
 
+from contextlib import contextmanager
+
 import unohelper
 
 from .gui import Gui
+from selection_coalescer import SelectionCoalescer
+from utils import get_orbat_diagram_id
 
+from com.sun.star.document import XDocumentEventListener
 from com.sun.star.view import XSelectionChangeListener
 
 from smart.diagram.organizationcharts.orgchart.orgchart import OrgChart
@@ -63,19 +68,29 @@ class Controller(unohelper.Base, XSelectionChangeListener):
         self._last_diagram_type = -1
         self._last_diagram_id = -1
 
+        # Initialized diagram models of the document, keyed by diagram id
+        self._diagram_cache = {}
+        self._diagram_modify_listener = None
+        # Depth of the changes the extension is making to the current diagram
+        self._changing_diagram = 0
+
         self._gui = Gui(self, self._x_context, self._x_frame)
         self.add_selection_listener()
+        self.add_diagram_modify_listener()
 
     def dispose(self):
         """Dispose controller and all associated resources"""
         try:
             self.remove_selection_listener()
+            self.remove_diagram_modify_listener()
+            SelectionCoalescer.discard(self)
 
             if self._gui is not None:
                 self._gui.close_and_dispose_control_dialog()
                 self._gui = None
 
             self._diagram = None
+            self.clear_diagram_cache()
 
             self._x_controller = None
             self._x_frame = None
@@ -161,9 +176,86 @@ class Controller(unohelper.Base, XSelectionChangeListener):
                         dialog_handler.clear_all_undo_action_references()
 
             self._diagram = None
+            self.clear_diagram_cache()
         except Exception as e:
             print(f"Error in dispose_diagram: {e}")
 
+    def activate_diagram(self, diagram_id):
+        """Make the diagram with diagram_id current, reusing its cached model"""
+        diagram = self._diagram_cache.get(diagram_id)
+        if diagram is not None:
+            self._diagram = diagram
+            return
+
+        self.instantiate_diagram()
+        self.get_diagram().init_diagram(diagram_id)
+        self.get_diagram().init_properties()
+        self.cache_diagram(diagram_id)
+
+    def cache_diagram(self, diagram_id):
+        """Store the current diagram model in the cache if it was fully initialized"""
+        diagram = self.get_diagram()
+        if diagram is None or diagram.get_diagram_tree() is None:
+            return
+        if diagram.get_diagram_tree().get_root_item() is None:
+            return
+        self._diagram_cache[diagram_id] = diagram
+
+    @contextmanager
+    def changing_diagram(self):
+        """Mark the shape changes made by the extension to the current diagram
+
+        The operations update the diagram model along with its shapes, so
+        their shape events keep the cached model.
+        """
+        self._changing_diagram += 1
+        try:
+            yield
+        finally:
+            self._changing_diagram -= 1
+
+    def invalidate_diagram(self, diagram_id):
+        """Drop the cached model of a diagram so it is rebuilt on next selection
+
+        Called for changes made outside of the extension, e.g. moving or
+        deleting shapes by hand, which the model does not follow.
+        """
+        if (
+            self._changing_diagram
+            and self._diagram is not None
+            and self._diagram.get_diagram_id() == diagram_id
+        ):
+            return
+        self._diagram_cache.pop(diagram_id, None)
+
+    def clear_diagram_cache(self):
+        """Drop all cached diagram models"""
+        self._diagram_cache.clear()
+
+    def add_diagram_modify_listener(self):
+        """Listen for shape changes of the document to invalidate cached diagrams"""
+        try:
+            model = self._x_controller.getModel()
+            # addEventListener would be ambiguous, XComponent has one too
+            if model is not None and hasattr(model, "addDocumentEventListener"):
+                self._diagram_modify_listener = DiagramModifyListener(self)
+                model.addDocumentEventListener(self._diagram_modify_listener)
+        except Exception as e:
+            print(f"Error adding diagram modify listener: {e}")
+            self._diagram_modify_listener = None
+
+    def remove_diagram_modify_listener(self):
+        """Remove shape change listener of the document"""
+        if self._diagram_modify_listener is None:
+            return
+        try:
+            model = self._x_controller.getModel()
+            if model is not None:
+                model.removeDocumentEventListener(self._diagram_modify_listener)
+        except Exception as e:
+            print(f"Error removing diagram modify listener: {e}")
+        self._diagram_modify_listener = None
+
     def set_last_diagram_name(self, name):
         """Set last diagram name"""
         self._last_diagram_name = name
@@ -302,6 +394,7 @@ class Controller(unohelper.Base, XSelectionChangeListener):
             # Initialize object tree in organigrams
             if self.get_group_type() == self.ORGANIGROUP:
                 self.get_diagram().init_diagram()
+                self.cache_diagram(self.get_diagram().get_diagram_id())
 
             self._gui.set_visible_control_dialog(True)
         self.add_selection_listener()
@@ -378,6 +471,14 @@ class Controller(unohelper.Base, XSelectionChangeListener):
 
     def selectionChanged(self, event):
         """Handle selection change events - XSelectionChangeListener implementation"""
+        SelectionCoalescer.instance(self._x_context).submit(
+            self, event, self.handle_selection_changed
+        )
+
+    def handle_selection_changed(self, event):
+        """Handle the final selection of a burst of selection change events"""
+        if self._x_selection_supplier is None:
+            return
         selected_shape = self.get_selected_shape()
 
         if selected_shape:
@@ -429,11 +530,8 @@ class Controller(unohelper.Base, XSelectionChangeListener):
                         self.set_group_type(self.ORGANIGROUP)
                         self.set_diagram_type(self.ORGANIGRAM)
 
-                    self.instantiate_diagram()
                     self._last_diagram_name = new_diagram_name
-
-                    self.get_diagram().init_diagram(diagram_id)
-                    self.get_diagram().init_properties()
+                    self.activate_diagram(diagram_id)
 
                     # Auto-open dialog if user hasn't explicitly closed it this session
                     if not Gui._user_closed_dialog:
@@ -470,6 +568,37 @@ class Controller(unohelper.Base, XSelectionChangeListener):
         return False
 
 
+class DiagramModifyListener(unohelper.Base, XDocumentEventListener):
+    """Invalidates cached diagram models when shapes of a diagram change
+
+    Changes made by the extension itself are ignored, see
+    Controller.changing_diagram().
+    """
+
+    SHAPE_EVENTS = ("ShapeModified", "ShapeInserted", "ShapeRemoved")
+
+    def __init__(self, controller):
+        self._controller = controller
+
+    def documentEventOccured(self, event):
+        """Handle document events - XDocumentEventListener implementation"""
+        if event.EventName not in self.SHAPE_EVENTS:
+            return
+        try:
+            shape = event.Source
+            shape_name = shape.getName() if hasattr(shape, "getName") else ""
+            if not self._controller.is_smart_diagram_shape(shape_name):
+                return
+
+            self._controller.invalidate_diagram(get_orbat_diagram_id(shape_name))
+        except Exception as e:
+            print(f"Error handling diagram modification: {e}")
+
+    def disposing(self, event):
+        """Handle disposing event from XDocumentEventListener"""
+        pass
+
+
 # pythonloader loads a static g_ImplementationHelper variable
 g_ImplementationHelper = unohelper.ImplementationHelper()
 g_ImplementationHelper.addImplementation(
@@ -14,15 +14,36 @@ Base Diagram class - stub implementation
 Python port of Diagram.java
 """
 
+import functools
+
 import uno
 
 from ..utils import parse_svg_dimensions
+from utils import register_orbat_diagram
 
 from abc import ABC, abstractmethod
 from com.sun.star.awt import Point, Size
 from com.sun.star.beans import PropertyValue
 
 
+def changes_diagram(method):
+    """Run a method changing the shapes of the diagram as an own change
+
+    See Controller.changing_diagram(), the shape events of the method do not
+    invalidate the cached diagram model.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        controller = self.get_controller()
+        if controller is None:
+            return method(self, *args, **kwargs)
+        with controller.changing_diagram():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class Diagram(ABC):
     """Base diagram class - simplified version of the Java Diagram class"""
 
@@ -149,6 +170,7 @@ class Diagram(ABC):
 
         return x_shape
 
+    @changes_diagram
     def remove_shape(self):
         """Remove shape - to be overridden in subclasses"""
         pass
@@ -187,6 +209,7 @@ class Diagram(ABC):
 
         return last_shape
 
+    @changes_diagram
     def set_new_shape_properties(self, shape, shape_type: str, svg_data):
         """Set shape properties"""
         try:
@@ -217,6 +240,7 @@ class Diagram(ABC):
         except Exception as ex:
             print(f"Error setting shape properties: {ex}")
 
+    @changes_diagram
     def set_shape_properties(self, shape, shape_type: str):
         """Set shape properties"""
         try:
@@ -245,6 +269,7 @@ class Diagram(ABC):
         except Exception as ex:
             print(f"Error setting shape properties: {ex}")
 
+    @changes_diagram
     def remove_shape_from_group(self, x_shape):
         """Remove shape from the group"""
         if self._x_shapes is not None:
@@ -372,6 +397,7 @@ class Diagram(ABC):
         except Exception as ex:
             print(f"Error setting connector shape properties: {ex}")
 
+    @changes_diagram
     def refresh_diagram(self):
         """Refresh the diagram display"""
         self.get_diagram_tree().refresh()
@@ -437,6 +463,7 @@ class Diagram(ABC):
         """Initialize diagram properties - to be overridden in subclasses"""
         pass
 
+    @changes_diagram
     def create_diagram(self, data):
         """Create diagram from data"""
         import random
@@ -469,6 +496,9 @@ class Diagram(ABC):
             # Add to draw page
             self.add_group_shape_to_draw_page()
 
+            # Record the diagram so the document is found without a page scan
+            register_orbat_diagram(self._x_model, self._diagram_id)
+
             # Get XShapes interface for the group
             self._x_shapes = self._x_group_shape
 
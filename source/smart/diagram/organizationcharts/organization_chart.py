@@ -17,7 +17,7 @@ Python port of OrganizationChart.java
 from abc import abstractmethod
 
 # Import base classes
-from ..diagram import Diagram
+from ..diagram import Diagram, changes_diagram
 
 from com.sun.star.awt import Point, Size
 
@@ -459,13 +459,16 @@ class OrganizationChart(Diagram):
         """Get diagram tree - to be implemented by subclasses"""
 
     @abstractmethod
+    @changes_diagram
     def add_shape(self):
         """Add shape - to be implemented by subclasses"""
 
     @abstractmethod
+    @changes_diagram
     def paste_subtree(self):
         """Paste copied subtree - to be implemented by subclasses"""
 
+    @changes_diagram
     def remove_shape(self, x_selected_shape=None):
         """Remove shape from organization chart"""
         if x_selected_shape is None:
@@ -585,6 +588,7 @@ class OrganizationChart(Diagram):
 
                         self._update_tree_layout()
 
+    @changes_diagram
     def create_diagram(self, data=None):
         """Create diagram - base implementation"""
         super().create_diagram(data)
@@ -595,6 +599,7 @@ class OrganizationChart(Diagram):
         item.set_first_child(None)
         item.set_first_sibling(None)
 
+    @changes_diagram
     def move_tree_item(self, source_tree_item, target_tree_item, drop_position):
         """Move a tree item to a new position in the hierarchy"""
         try:
@@ -650,6 +655,7 @@ class OrganizationChart(Diagram):
             print(f"Error checking descendant relationship: {e}")
             return False
 
+    @changes_diagram
     def _remove_item_from_tree(self, item):
         """Remove an item from its current position in the tree"""
         try:
@@ -678,6 +684,7 @@ class OrganizationChart(Diagram):
         except Exception as e:
             print(f"Error removing item from tree: {e}")
 
+    @changes_diagram
     def _insert_as_sibling_after(self, item, target):
         """Insert item as sibling after target"""
         try:
@@ -695,6 +702,7 @@ class OrganizationChart(Diagram):
         except Exception as e:
             print(f"Error inserting as sibling: {e}")
 
+    @changes_diagram
     def _insert_as_child(self, item, target):
         """Insert item as child of target"""
         try:
@@ -726,6 +734,7 @@ class OrganizationChart(Diagram):
 
         self.get_gui().enable_and_set_focus_control_dialog()
 
+    @changes_diagram
     def _update_tree_layout(self):
         """Update the tree layout after structure changes"""
         try:
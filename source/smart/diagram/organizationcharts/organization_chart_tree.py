@@ -14,13 +14,20 @@ Organization Chart Tree base class
 Python port of OrganizationChartTree.java
 """
 
+import json
+
 from abc import ABC, abstractmethod
 from ..diagram import Diagram
 
+from com.sun.star.xml import AttributeData
+
 
 class OrganizationChartTree(ABC):
     """Base class for organization chart trees"""
 
+    # Name of the control shape attribute that stores the tree structure
+    STRUCTURE_ATTRIBUTE = "OrbatStructure"
+
     def __init__(self, org_chart, diagram_tree=None):
         self._org_chart = org_chart
         self._x_shapes = org_chart.get_shapes()
@@ -29,6 +36,9 @@ class OrganizationChartTree(ABC):
         self._root_item = None
         self._selected_item = None
 
+        # Rectangle shapes keyed by shape id, filled by set_lists()
+        self._rectangle_map = {}
+
         if diagram_tree is None:
             # New tree
             self._rectangle_list = []
@@ -69,6 +79,14 @@ class OrganizationChartTree(ABC):
     def refresh(self):
         """Refresh tree - to be implemented by subclasses"""
 
+    @abstractmethod
+    def create_tree_item(self, x_shape, dad):
+        """Create a tree item for shape - to be implemented by subclasses"""
+
+    @abstractmethod
+    def set_positions(self):
+        """Set levels and positions of items - to be implemented by subclasses"""
+
     def get_org_chart(self):
         """Get organization chart reference"""
         return self._org_chart
@@ -119,6 +137,7 @@ class OrganizationChartTree(ABC):
             self._rectangle_list.clear()
         if self._connector_list is not None:
             self._connector_list.clear()
+        self._rectangle_map.clear()
 
     def set_lists(self):
         """Set up lists from existing shapes"""
@@ -135,6 +154,12 @@ class OrganizationChartTree(ABC):
                     self.set_control_shape(curr_shape)
                 elif Diagram.DIAGRAM_SHAPE_TYPE in curr_shape_name:
                     self.add_to_rectangles(curr_shape)
+                    shape_id = (
+                        self.get_org_chart()
+                        .get_controller()
+                        .get_shape_id(curr_shape_name)
+                    )
+                    self._rectangle_map[shape_id] = curr_shape
 
                 if Diagram.CONNECTOR_SHAPE in curr_shape_name:
                     self.add_to_connectors(curr_shape)
@@ -168,6 +193,9 @@ class OrganizationChartTree(ABC):
     def set_tree(self):
         """Set up tree structure"""
         self._x_root_shape = None
+        if self.load_structure():
+            return
+
         error = self.set_root_item()
 
         if self._x_root_shape is None or error > 1:
@@ -185,6 +213,126 @@ class OrganizationChartTree(ABC):
         else:
             self.init_tree_items()
 
+    def save_structure(self):
+        """Store parent ids and sibling order of the items in the control shape"""
+        if self._x_control_shape is None or self._root_item is None:
+            return
+        try:
+            controller = self.get_org_chart().get_controller()
+            items = []
+            # Pre-order walk, so siblings are listed in their tree order
+            stack = [self._root_item]
+            while stack:
+                item = stack.pop()
+                dad = item.get_dad()
+                items.append(
+                    [
+                        controller.get_shape_id(item._rectangle_name),
+                        (
+                            controller.get_shape_id(dad._rectangle_name)
+                            if dad is not None
+                            else 0
+                        ),
+                    ]
+                )
+                children = []
+                child = item.get_first_child()
+                while child is not None:
+                    children.append(child)
+                    child = child.get_first_sibling()
+                stack.extend(reversed(children))
+
+            structure = json.dumps(
+                {"count": len(items), "items": items}, separators=(",", ":")
+            )
+            # Compare with the value in the shape rather than the last one
+            # written, undo may have restored an older structure
+            attribute_hash = self._x_control_shape.UserDefinedAttributes
+            if (
+                attribute_hash.hasByName(self.STRUCTURE_ATTRIBUTE)
+                and attribute_hash.getByName(self.STRUCTURE_ATTRIBUTE).Value
+                == structure
+            ):
+                return
+
+            user_attrs = AttributeData()
+            user_attrs.Type = "CDATA"
+            user_attrs.Value = structure
+            attribute_hash[self.STRUCTURE_ATTRIBUTE] = user_attrs
+            self._x_control_shape.setPropertyValue(
+                "UserDefinedAttributes", attribute_hash
+            )
+        except Exception as ex:
+            print(f"Error saving tree structure: {ex}")
+
+    def load_structure(self):
+        """Build tree items from the structure stored in the control shape
+
+        Returns False if there is no stored structure or it does not match
+        the shapes of the group, so the caller has to rebuild the tree from
+        the connectors and the shape positions.
+        """
+        if self._x_control_shape is None:
+            return False
+        try:
+            attribute_hash = self._x_control_shape.UserDefinedAttributes
+            if not attribute_hash.hasByName(self.STRUCTURE_ATTRIBUTE):
+                return False
+            structure = attribute_hash.getByName(self.STRUCTURE_ATTRIBUTE).Value
+            data = json.loads(structure)
+            items = data["items"]
+
+            # Stale if shapes were added or removed outside of the extension
+            if data["count"] != len(items) or len(items) != len(
+                self._rectangle_list
+            ):
+                return False
+            if len(self._rectangle_map) != len(self._rectangle_list):
+                return False
+
+            self.init_static_members()
+            tree_items = {}
+            last_children = {}
+            root_item = None
+            for shape_id, dad_id in items:
+                x_shape = self._rectangle_map.get(shape_id)
+                if x_shape is None or shape_id in tree_items:
+                    return False
+
+                if dad_id == 0:
+                    if root_item is not None:
+                        return False
+                    root_item = self.create_tree_item(x_shape, None)
+                    tree_items[shape_id] = root_item
+                    continue
+
+                # Parents always precede their children in the stored order
+                dad = tree_items.get(dad_id)
+                if dad is None:
+                    return False
+                tree_item = self.create_tree_item(x_shape, dad)
+                last_child = last_children.get(dad_id)
+                if last_child is None:
+                    dad.set_first_child(tree_item)
+                else:
+                    last_child.set_first_sibling(tree_item)
+                last_children[dad_id] = tree_item
+                tree_items[shape_id] = tree_item
+
+            if root_item is None:
+                return False
+
+            self._x_root_shape = root_item.get_rectangle_shape()
+            self._root_item = root_item
+            self.set_positions()
+            return True
+        except Exception as ex:
+            print(f"Error loading tree structure: {ex}")
+            return False
+
+    def init_static_members(self):
+        """Reset static layout members of the tree items - can be overridden"""
+
     def get_tree_item(self, shape):
         """Get tree item for a given shape"""
         if self._x_root_shape is not None:
@@ -14,8 +14,9 @@ OrgChart class - Main organization chart implementation
 Python port of OrgChart.java
 """
 
-from utils import generate_icon_svg
-from ...diagram import Diagram
+from icon_store import IconStore
+from utils import get_icon_render_args, render_icon_svgs
+from ...diagram import Diagram, changes_diagram
 from ..organization_chart import OrganizationChart
 from .orgchart_tree import OrgChartTree
 from .orgchart_tree_item import OrgChartTreeItem
@@ -49,6 +50,7 @@ class OrgChart(OrganizationChart):
         """Get diagram type name"""
         return "OrbatDiagram"
 
+    @changes_diagram
     def create_diagram(self, datas):
         """Create diagram from data"""
         if isinstance(datas, int):
@@ -299,22 +301,63 @@ class OrgChart(OrganizationChart):
         self._diagram_tree.set_lists()
         self._diagram_tree.set_tree()
 
+    @changes_diagram
     def paste_subtree(self, target_tree_item, clipboard_item, script=None):
         """Paste copied subtree as children of target item"""
+        return bool(self.paste_subtrees(target_tree_item, [clipboard_item], script))
+
+    @changes_diagram
+    def paste_subtrees(self, target_tree_item, clipboard_items, script=None):
+        """Paste copied subtrees as the last children of target item
+
+        The subtrees are flattened first, so every unique symbol is rendered
+        once, shape ids are reserved at once and all shapes are inserted
+        while the document controllers are locked.
+
+        Returns:
+            List of the new tree items of the pasted subtree roots, empty if
+            the paste failed
+        """
         if self._diagram_tree is None:
-            return False
-        if target_tree_item is None or clipboard_item is None:
-            return False
+            return []
+        if target_tree_item is None or not clipboard_items:
+            return []
 
         try:
-            self._paste_script = script
-            self._paste_item_recursive(target_tree_item, clipboard_item)
-            return True
+            entries = self._flatten_clipboard_items(clipboard_items)
+            svgs = self._render_paste_symbols(entries, script)
+
+            # Ids are reserved with one scan of the shapes
+            first_shape_id = self.get_top_shape_id() + 1
+            base_level = self._calculate_actual_level(target_tree_item)
+
+            new_items = []
+            self._x_model.lockControllers()
+            try:
+                for i, (clipboard_item, parent_index, depth) in enumerate(entries):
+                    parent_tree_item = (
+                        target_tree_item if parent_index < 0 else new_items[parent_index]
+                    )
+                    new_items.append(
+                        self._paste_item(
+                            parent_tree_item,
+                            clipboard_item,
+                            first_shape_id + i,
+                            base_level + depth,
+                            svgs[i],
+                        )
+                    )
+            finally:
+                self._x_model.unlockControllers()
+
+            return [
+                new_items[i]
+                for i, (_item, parent_index, _depth) in enumerate(entries)
+                if parent_index < 0
+            ]
         except Exception as ex:
             print(f"Error pasting subtree: {ex}")
-            return False
-        finally:
-            self._paste_script = None
+            return []
 
     def _calculate_actual_level(self, tree_item):
         """Calculate actual tree level by traversing up to root via _dad chain"""
@@ -325,24 +368,61 @@ class OrgChart(OrganizationChart):
             current = current.get_dad()
         return level
 
-    def _paste_item_recursive(self, parent_tree_item, clipboard_item):
-        """Recursively paste a ClipboardItem and its children"""
-        top_shape_id = self.get_top_shape_id() + 1
-        x_new_shape = self.create_shape(Diagram.DIAGRAM_SHAPE_TYPE, top_shape_id)
+    def _flatten_clipboard_items(self, clipboard_items):
+        """Get (clipboard item, index of parent entry, depth) in pre-order
+
+        Subtree roots have parent index -1 and depth 1, parents always come
+        before their children.
+        """
+        entries = []
+        stack = [(item, -1, 1) for item in reversed(clipboard_items)]
+        while stack:
+            clipboard_item, parent_index, depth = stack.pop()
+            index = len(entries)
+            entries.append((clipboard_item, parent_index, depth))
+            for child in reversed(clipboard_item.children):
+                stack.append((child, index, depth + 1))
+        return entries
+
+    def _render_paste_symbols(self, entries, script):
+        """Get the 32 px SVG of every entry, None for entries without symbol
+
+        Icons are looked up in the icon store, the missing unique symbols
+        are rendered with one script invocation.
+        """
+        svgs = [None] * len(entries)
+        if script is None:
+            return svgs
+
+        indexes = []
+        render_args_list = []
+        for i, (clipboard_item, _parent_index, _depth) in enumerate(entries):
+            render_args = get_icon_render_args(clipboard_item.attributes, 32.0)
+            if render_args is not None:
+                indexes.append(i)
+                render_args_list.append(render_args)
+        if not render_args_list:
+            return svgs
+
+        rendered = IconStore.get_instance(self._x_context).get_svgs(
+            render_args_list,
+            lambda missing: render_icon_svgs(script, missing),
+        )
+        for i, svg_data in zip(indexes, rendered):
+            svgs[i] = svg_data
+        return svgs
+
+    def _paste_item(self, parent_tree_item, clipboard_item, shape_id, level, svg_data):
+        """Create the shape, tree item and connector of one pasted item"""
+        x_new_shape = self.create_shape(Diagram.DIAGRAM_SHAPE_TYPE, shape_id)
         self._x_shapes.add(x_new_shape)
         self._diagram_tree.add_to_rectangles(x_new_shape)
 
-        if self._paste_script and "MilSymCode" in clipboard_item.attributes:
-            svg_data = generate_icon_svg(
-                self._paste_script, clipboard_item.attributes, 32.0
+        if svg_data:
+            self.set_new_shape_properties(
+                x_new_shape, Diagram.DIAGRAM_SHAPE_TYPE, svg_data
             )
-            if svg_data:
-                self.set_new_shape_properties(
-                    x_new_shape, Diagram.DIAGRAM_SHAPE_TYPE, svg_data
-                )
-                self._copy_attributes_to_shape(x_new_shape, clipboard_item.attributes)
-            else:
-                self.set_shape_properties(x_new_shape, Diagram.DIAGRAM_SHAPE_TYPE)
+            self._copy_attributes_to_shape(x_new_shape, clipboard_item.attributes)
         else:
             self.set_shape_properties(x_new_shape, Diagram.DIAGRAM_SHAPE_TYPE)
 
@@ -359,17 +439,13 @@ class OrgChart(OrganizationChart):
 
         self.set_move_protect_of_shape(x_new_shape)
 
-        x_connector_shape = self.create_shape(Diagram.CONNECTOR_SHAPE, top_shape_id)
+        x_connector_shape = self.create_shape(Diagram.CONNECTOR_SHAPE, shape_id)
         self._x_shapes.add(x_connector_shape)
         self.set_move_protect_of_shape(x_connector_shape)
         self._diagram_tree.add_to_connectors(x_connector_shape)
 
         end_shape_conn_pos = 0
-
-        # Calculate actual level by traversing up the tree (parent's level + 1)
-        parent_actual_level = self._calculate_actual_level(parent_tree_item)
-        new_item_level = parent_actual_level + 1
-        if new_item_level > OrgChartTree.LAST_HOR_LEVEL:
+        if level > OrgChartTree.LAST_HOR_LEVEL:
             end_shape_conn_pos = 3
 
         self.set_connector_shape_props(
@@ -380,9 +456,6 @@ class OrgChart(OrganizationChart):
             end_shape_conn_pos,
         )
 
-        for child_clipboard in clipboard_item.children:
-            self._paste_item_recursive(new_tree_item, child_clipboard)
-
         return new_tree_item
 
     def _copy_attributes_to_shape(self, shape, attributes):
@@ -397,6 +470,7 @@ class OrgChart(OrganizationChart):
             attribute_hash[name] = user_attrs
         shape.setPropertyValue("UserDefinedAttributes", attribute_hash)
 
+    @changes_diagram
     def add_shape(self, x_selected_shape=None):
         """Add new shape to diagram
 
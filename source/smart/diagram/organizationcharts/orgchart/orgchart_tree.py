@@ -184,14 +184,27 @@ class OrgChartTree(OrganizationChartTree):
 
         return x_first_sibling_shape
 
-    def refresh(self):
-        """Refresh the tree"""
+    def init_static_members(self):
+        """Reset static layout members of the tree items"""
+        OrgChartTreeItem.init_static_members()
+
+    def create_tree_item(self, x_shape, dad):
+        """Create a tree item for shape"""
+        return OrgChartTreeItem(self, x_shape, dad, 0, 0.0)
+
+    def set_positions(self):
+        """Set levels and positions of items"""
         OrgChartTreeItem.init_static_members()
         self._root_item.set_level(0)
         self._root_item.set_pos(0.0)
         self._root_item.set_positions_of_items()
+
+    def refresh(self):
+        """Refresh the tree"""
+        self.set_positions()
         self._root_item.set_measure_props()
         self._root_item.display()
+        self.save_structure()
 
     def refresh_connector_props(self):
         """Refresh connector properties when tree structure has changed"""
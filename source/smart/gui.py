@@ -9,7 +9,6 @@
 import uno
 
 from symbol_dialog import open_symbol_dialog
-from control_dialog import ControlDlgHandler
 from ..utils import get_package_location
 
 from com.sun.star.awt import WindowAttribute, WindowDescriptor
@@ -112,6 +111,8 @@ class Gui:
 
             # Create handler first
             model = self._x_frame.getController().getModel()
+            from control_dialog import ControlDlgHandler
+
             new_listener = ControlDlgHandler(self, self._x_context, model)
 
             # Create dialog with handler to ensure proper binding
@@ -7,7 +7,6 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import platform
-from symbol_dialog_handler import SymbolDialogHandler
 
 
 def open_symbol_dialog(
@@ -28,6 +27,9 @@ def open_symbol_dialog(
     )
 
     try:
+        # Imported here so the symbol catalog is only loaded when needed
+        from symbol_dialog_handler import SymbolDialogHandler
+
         handler = SymbolDialogHandler(
             ctx,
             model,
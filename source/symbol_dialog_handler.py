@@ -13,7 +13,8 @@ import unohelper
 from com.sun.star.awt import XDialogEventHandler
 from com.sun.star.awt.ImageScaleMode import ISOTROPIC
 from com.sun.star.beans import NamedValue
-from data import symbols_data
+from data import catalog
+from data import sidc_codec
 from data import country_data
 from utils import (
     createMilSymbolScriptInstance,
@@ -22,6 +23,7 @@ from utils import (
     insertSvgGraphic,
 )
 from translator import Translator
+from preview_store import PreviewStore
 from com.sun.star.view.SelectionType import SINGLE
 from com.sun.star.awt import XFocusListener, XKeyListener, XMouseListener
 from com.sun.star.awt.Key import UP, DOWN, LEFT, RIGHT, RETURN
@@ -124,8 +126,8 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         if not is_reset:
             self.dialog.getControl("btReality").getModel().State = 1
             self.dialog.getControl("btFriend").getModel().State = 1
-            self.context = symbols_data.BUTTONS["CONTEXT"]["btReality"]
-            self.affiliation = symbols_data.BUTTONS["AFFILIATION"]["btFriend"]
+            self.context = catalog.BUTTONS["CONTEXT"]["btReality"]
+            self.affiliation = catalog.BUTTONS["AFFILIATION"]["btFriend"]
 
         self.dialog.getControl("btPresent").getModel().State = 1
         self.dialog.getControl("btNotApplicableReinReduc").getModel().State = 1
@@ -134,15 +136,15 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         self.dialog.getControl("btTarget").getModel().State = 1
         self.dialog.getControl("btNotApplicableSignature").getModel().State = 1
 
-        self.version = symbols_data.VERSION
-        self.status = symbols_data.BUTTONS["STATUS"]["btPresent"]
-        self.reinforced = symbols_data.BUTTONS["REINFORCED_REDUCED"][
+        self.version = catalog.VERSION
+        self.status = catalog.BUTTONS["STATUS"]["btPresent"]
+        self.reinforced = catalog.BUTTONS["REINFORCED_REDUCED"][
             "btNotApplicableReinReduc"
         ]
-        self.stack = symbols_data.BUTTONS["STACK"]["btStack1"]
-        self.color = symbols_data.BUTTONS["COLOR"]["btLight"]
-        self.signature = symbols_data.BUTTONS["SIGNATURE"]["btNotApplicableSignature"]
-        self.engagement = symbols_data.BUTTONS["ENGAGEMENT"]["btTarget"]
+        self.stack = catalog.BUTTONS["STACK"]["btStack1"]
+        self.color = catalog.BUTTONS["COLOR"]["btLight"]
+        self.signature = catalog.BUTTONS["SIGNATURE"]["btNotApplicableSignature"]
+        self.engagement = catalog.BUTTONS["ENGAGEMENT"]["btTarget"]
 
     def tree_mapping(self):
         tree_names = (
@@ -189,11 +191,11 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
     def init_default_values(self, selected_index=4, update_country=True):
         self.init_default_tree(update_country)
 
-        label = self.translator.translate(symbols_data.SYMBOLS[selected_index]["label"])
+        label = self.translator.translate(catalog.SYMBOLS[selected_index]["label"])
         listbox_control = self.dialog.getControl("ltbSymbolSet")
         listbox_control.addItems([label], 0)
         listbox_control.selectItemPos(0, True)
-        self.symbolSet = symbols_data.SYMBOLS[selected_index]["value"]
+        self.symbolSet = catalog.SYMBOLS[selected_index]["value"]
 
         current_symbol = self.get_current_symbol(selected_index)
 
@@ -253,7 +255,7 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
 
     def populate_symbolSet(self, selected_index):
         self.fill_tree_control(
-            "treeSymbolSet", "ltbSymbolSet", symbols_data.SYMBOLS, selected_index
+            "treeSymbolSet", "ltbSymbolSet", catalog.SYMBOLS, selected_index
         )
 
     def populate_mainIcon(self, current_symbol, selected_index):
@@ -328,22 +330,20 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
             mutable_tree_data_model.setRoot(root_node)
 
             if listbox_name == "ltbCountry":
-                BASE_ICON_URL = "vnd.sun.star.extension://com.collabora.milsymbol/img/preview/countries"
+                icon_dir = "countries"
             elif listbox_name == "ltbSymbolSet":
-                BASE_ICON_URL = "vnd.sun.star.extension://com.collabora.milsymbol/img/preview/symbol_set"
+                icon_dir = "symbol_set"
             else:
                 category = self.symbol_id.lower()
                 sub_category = re.sub(r"(?<!^)(?=[A-Z])", "_", tree_name[4:]).lower()
-                BASE_ICON_URL = (
-                    f"vnd.sun.star.extension://com.collabora.milsymbol/img/preview/"
-                    f"{category}/{sub_category}"
-                )
+                icon_dir = f"{category}/{sub_category}"
 
+            previews = PreviewStore.get_instance(self.ctx)
             for idx, item in enumerate(items):
                 img_file = item.get("img")
                 if listbox_name == "ltbCountry":
                     img_file = item.get("value") + ".png"
-                icon_url = f"{BASE_ICON_URL}/{img_file}"
+                icon_url = previews.get_url(f"{icon_dir}/{img_file}")
 
                 label = self.translator.translate(item["label"])
                 node = mutable_tree_data_model.createNode(label, False)
@@ -373,7 +373,7 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         tbSearch_ctrl = self.dialog.getControl("tbSearch")
         tbSearch_ctrl.Text = self.translator.translate(node_name)
 
-        groups = symbols_data.SYMBOL_DETAILS.get(category, {})
+        groups = catalog.SYMBOL_DETAILS.get(category, {})
         labels = groups.get("MainIcon", [])
 
         self.search_index = next(
@@ -387,7 +387,7 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         )
 
         if self.search_index is not None:
-            keys = list(symbols_data.SYMBOL_DETAILS.keys())
+            keys = list(catalog.SYMBOL_DETAILS.keys())
             symbolSet_index = keys.index(category)
             self.current_symbolSet_index = symbolSet_index
             index = self.search_index
@@ -446,9 +446,9 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         self.updatePreview()
 
     def get_current_symbol(self, selected_index):
-        symbol_meta = symbols_data.SYMBOLS[selected_index]
+        symbol_meta = catalog.SYMBOLS[selected_index]
         self.symbol_id = symbol_meta["id"]
-        current_symbol = symbols_data.SYMBOL_DETAILS[self.symbol_id]
+        current_symbol = catalog.SYMBOL_DETAILS[self.symbol_id]
         self.tree_category_name = self.translator.translate(symbol_meta["label"])
         return current_symbol
 
@@ -543,15 +543,7 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         if selected_index is not None:
             index = selected_index
         else:
-            symbolSet_item = next(
-                (
-                    item
-                    for item in symbols_data.SYMBOLS
-                    if item["value"] == self.symbolSet
-                ),
-                None,
-            )
-            index = symbols_data.SYMBOLS.index(symbolSet_item)
+            index = catalog.get_symbol_set_lookup()[self.symbolSet][0]
             self.search_index = None
 
         self.init_default_values(index)
@@ -637,17 +629,10 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
             self.tree_ctrls["treeCountry"].setVisible(False)
 
     def button_handler(self, dialog, active_button_id, updatePreview=True):
-        group_name = None
-        group_buttons = None
-
-        for name, buttons in symbols_data.BUTTONS.items():
-            if active_button_id in buttons:
-                group_name = name
-                group_buttons = buttons
-                break
-
-        if group_buttons is None:
+        group_name = catalog.get_button_group(active_button_id)
+        if group_name is None:
             return False
+        group_buttons = catalog.BUTTONS[group_name]
 
         for button_id in group_buttons:
             self.update_button(
@@ -661,7 +646,7 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         state = 0
         if button_id == active_button_id:
             state = 1
-            group_buttons = symbols_data.BUTTONS.get(group_name)
+            group_buttons = catalog.BUTTONS.get(group_name)
             value = group_buttons.get(button_id)
 
             if group_name == "CONTEXT":
@@ -710,23 +695,19 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
             imgPreview.Graphic = graphic
 
     def create_sidc(self):
-        sidc = [
-            self.version,
-            self.context,
-            self.affiliation,
-            self.symbolSet,
-            self.status,
-            self.headTaskDummy,
-            self.echelonMobility,
-            self.mainIcon,
-            self.firstIcon[-2:],
-            self.secondIcon[-2:],
-            self.firstIcon[0],
-            self.secondIcon[0],
-            "00000",
-            "000",  # Country flag
-        ]
-        self.sidc = "".join(sidc)
+        sidc = sidc_codec.Sidc(
+            version=self.version,
+            context=self.context,
+            affiliation=self.affiliation,
+            symbol_set=self.symbolSet,
+            status=self.status,
+            hq_tf_dummy=self.headTaskDummy,
+            echelon_mobility=self.echelonMobility,
+            entity=self.mainIcon,
+            first_icon=self.firstIcon,
+            second_icon=self.secondIcon,
+        )
+        self.sidc = sidc_codec.encode(sidc)
 
         return self.sidc
 
@@ -834,7 +815,7 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
 
     def update_tree_controls(self):
         symbolSet_index, symbolSet_label = self.find_index_and_label(
-            symbols_data.SYMBOLS, self.symbolSet
+            catalog.get_symbol_set_lookup(), self.symbolSet
         )
         label = self.translator.translate(symbolSet_label)
         listbox_control = self.dialog.getControl("ltbSymbolSet")
@@ -842,10 +823,11 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         listbox_control.selectItemPos(0, True)
 
         self.current_symbolSet_index = symbolSet_index
-        current_symbol = self.get_current_symbol(symbolSet_index)
+        self.get_current_symbol(symbolSet_index)
 
         mainIcon_index, mainIcon_label = self.find_index_and_label(
-            current_symbol["MainIcon"], self.mainIcon
+            catalog.get_table_lookup(self.symbol_id, "MainIcon"),
+            self.mainIcon,
         )
         self.ui_indexes["treeMainIcon"] = mainIcon_index
         label = self.translator.translate(mainIcon_label)
@@ -854,7 +836,8 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         listbox_control.selectItemPos(0, True)
 
         firstIcon_index, firstIcon_label = self.find_index_and_label(
-            current_symbol["FirstIconModifier"], self.firstIcon
+            catalog.get_table_lookup(self.symbol_id, "FirstIconModifier"),
+            self.firstIcon,
         )
         self.ui_indexes["treeFirstIcon"] = firstIcon_index
         label = self.translator.translate(firstIcon_label)
@@ -863,7 +846,8 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         listbox_control.selectItemPos(0, True)
 
         secondIcon_index, secondIcon_label = self.find_index_and_label(
-            current_symbol["SecondIconModifier"], self.secondIcon
+            catalog.get_table_lookup(self.symbol_id, "SecondIconModifier"),
+            self.secondIcon,
         )
         self.ui_indexes["treeSecondIcon"] = secondIcon_index
         label = self.translator.translate(secondIcon_label)
@@ -872,7 +856,8 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         listbox_control.selectItemPos(0, True)
 
         echelonMobility_index, echelonMobility_label = self.find_index_and_label(
-            current_symbol["EchelonMobility"], self.echelonMobility
+            catalog.get_table_lookup(self.symbol_id, "EchelonMobility"),
+            self.echelonMobility,
         )
         self.ui_indexes["treeEchelonMobility"] = echelonMobility_index
         label = self.translator.translate(echelonMobility_label)
@@ -881,7 +866,8 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         listbox_control.selectItemPos(0, True)
 
         headTaskDummy_index, headTaskDummy_label = self.find_index_and_label(
-            current_symbol["HeadquartersTaskforceDummy"], self.headTaskDummy
+            catalog.get_table_lookup(self.symbol_id, "HeadquartersTaskforceDummy"),
+            self.headTaskDummy,
         )
         self.ui_indexes["treeHeadTaskDummy"] = headTaskDummy_index
         label = self.translator.translate(headTaskDummy_label)
@@ -890,7 +876,7 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         listbox_control.selectItemPos(0, True)
 
         country_index, country_label = self.find_index_and_label(
-            country_data.COUNTRY_CODES, self.country
+            catalog.get_country_lookup(), self.country
         )
         self.ui_indexes["treeCountry"] = country_index
         label = self.translator.translate(country_label)
@@ -898,15 +884,11 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         listbox_control.addItems([label], 0)
         listbox_control.selectItemPos(0, True)
 
-    def find_index_and_label(self, items, value):
-        return next(
-            (
-                (i, item["label"])
-                for i, item in enumerate(items)
-                if item["value"] == value
-            ),
-            (0, None),
-        )
+    def find_index_and_label(self, lookup, value):
+        entry = lookup.get(value)
+        if entry is None:
+            return 0, None
+        return entry[0], entry[1]
 
     def update_buttons_state(self, dialog):
         self.set_button_state(dialog, self.stack, "STACK")
@@ -919,11 +901,9 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
         self.set_button_state(dialog, self.status, "STATUS")
 
     def set_button_state(self, dialog, option, group_button):
-        group_buttons = symbols_data.BUTTONS.get(group_button, {})
-        for key, val in group_buttons.items():
-            if val == option:
-                self.button_handler(dialog, key, False)
-                break
+        button_id = catalog.get_button_id(group_button, option)
+        if button_id is not None:
+            self.button_handler(dialog, button_id, False)
 
     def get_attrs(self, shape, tree_node_value):
         attrs = {}
@@ -944,17 +924,22 @@ class SymbolDialogHandler(unohelper.Base, XDialogEventHandler):
 
         for element, value in other_attrs.items():
             if element == "MilSymCode":
-                self.version = value[0:2]
-                self.context = value[2]
-                self.affiliation = value[3]
-                self.symbolSet = value[4:6]
-                self.status = value[6]
-                self.headTaskDummy = value[7]
-                self.echelonMobility = value[8:10]
-                self.mainIcon = value[10:16]
-                self.firstIcon = value[20] + value[16:18]
-                self.secondIcon = value[21] + value[18:20]
-                # others value[23:]
+                try:
+                    sidc = sidc_codec.decode(value)
+                except ValueError as e:
+                    # e.g. edited outside of the extension, start a new symbol
+                    print(f"Error reading symbol attributes: {e}")
+                    return {}
+                self.version = sidc.version
+                self.context = sidc.context
+                self.affiliation = sidc.affiliation
+                self.symbolSet = sidc.symbol_set
+                self.status = sidc.status
+                self.headTaskDummy = sidc.hq_tf_dummy
+                self.echelonMobility = sidc.echelon_mobility
+                self.mainIcon = sidc.entity
+                self.firstIcon = sidc.first_icon
+                self.secondIcon = sidc.second_icon
             elif element == "MilSymCountry":
                 self.country = value
             else:
@@ -1028,7 +1013,7 @@ class SearchTextboxKeyListener(unohelper.Base, XKeyListener):
         TOKEN_SPLIT = re.compile(r"[ /-]+").split
         translate = self.dialog_handler.translator.translate
 
-        for category_name, data in symbols_data.SYMBOL_DETAILS.items():
+        for category_name, data in catalog.SYMBOL_DETAILS.items():
             for icon in data.get("MainIcon", []):
                 raw = icon.get("label", "")
                 label = translate(raw)
@@ -1133,13 +1118,13 @@ class SearchTextboxKeyListener(unohelper.Base, XKeyListener):
         root_node = mutable_tree_data_model.createNode("root_node", False)
         mutable_tree_data_model.setRoot(root_node)
 
-        BASE_ICON_URL = "vnd.sun.star.extension://com.collabora.milsymbol/img/preview"
+        previews = PreviewStore.get_instance(self.ctx)
 
         for idx, (label, img, category) in enumerate(items):
             node = mutable_tree_data_model.createNode(label, False)
             node.DataValue = (idx, category)
             category = category.replace(" - ", "_").replace(" ", "_").lower()
-            icon_url = f"{BASE_ICON_URL}/{category}/main_icon/{img}"
+            icon_url = previews.get_url(f"{category}/main_icon/{img}")
             node.setCollapsedGraphicURL(icon_url)
             root_node.appendChild(node)
 
@@ -0,0 +1,141 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Human-readable labels of symbol identification codes
+
+The catalog only maps labels to codes. SymbolLabelIndex is the reverse
+index: it translates the tables of a symbol set once, on first use, and
+caches the composed label of every (symbol set, entity, modifiers,
+echelon) combination it has resolved. There is one index per locale.
+
+A label lists the translated texts the symbol dialog shows for the code,
+in the order of its list boxes, e.g. "Infantry, Mechanized, Battalion".
+"""
+
+from data import catalog
+from data import sidc_codec
+from translator import Translator
+
+# Tables of a symbol set that contribute to the label of a code, in the
+# order of the list boxes of the symbol dialog
+LABEL_TABLES = (
+    ("entity", "MainIcon"),
+    ("first_icon", "FirstIconModifier"),
+    ("second_icon", "SecondIconModifier"),
+    ("echelon_mobility", "EchelonMobility"),
+)
+
+
+class SymbolLabelIndex:
+    """Reverse index from SIDC fields to translated labels, per locale"""
+
+    _instances = {}
+
+    def __init__(self, strings):
+        self._strings = strings
+        # symbol set value -> {table name: {value: translated label}}
+        self._table_labels = {}
+        # (symbol set, entity, first icon, second icon, echelon) -> label
+        self._labels = {}
+
+    @classmethod
+    def get_instance(cls, ctx):
+        """Get the index of the current office locale"""
+        translator = Translator(ctx)
+        locale_tag = translator.get_locale_tag()
+        index = cls._instances.get(locale_tag)
+        if index is None:
+            index = SymbolLabelIndex(translator.get_strings())
+            cls._instances[locale_tag] = index
+        return index
+
+    @classmethod
+    def clear(cls):
+        """Drop the indexes of all locales"""
+        cls._instances.clear()
+
+    def translate(self, key):
+        """Translate like Translator.translate(), which the dialog uses"""
+        return self._strings.get(key, key)
+
+    def get_table_labels(self, symbol_set, table_name):
+        """Get {value: translated label} of a table of a symbol set, or None"""
+        tables = self._table_labels.get(symbol_set)
+        if tables is None:
+            entry = catalog.get_symbol_set_lookup().get(symbol_set)
+            if entry is None:
+                return None
+            set_id = catalog.SYMBOLS[entry[0]]["id"]
+            tables = {}
+            for _field, name in LABEL_TABLES:
+                tables[name] = {
+                    value: self.translate(label)
+                    for value, (_i, label, _img) in catalog.get_table_lookup(
+                        set_id, name
+                    ).items()
+                    # all-zero values are placeholders like "Unspecified" or
+                    # "Not Applicable", they add nothing to a label
+                    if label and value.strip("0")
+                }
+            self._table_labels[symbol_set] = tables
+        return tables.get(table_name)
+
+    def get_label(self, sidc_code):
+        """Get label like "Infantry Battalion" of a SIDC, None if unknown"""
+        try:
+            sidc = sidc_codec.decode(sidc_code)
+        except ValueError:
+            return None
+        return self._get_label(
+            sidc.symbol_set,
+            sidc.entity,
+            sidc.first_icon,
+            sidc.second_icon,
+            sidc.echelon_mobility,
+        )
+
+    def get_labels(self, sidc_codes):
+        """Get the labels of a batch of SIDCs, None for unknown codes"""
+        columns = sidc_codec.decode_many(sidc_codes)
+        return [
+            self._get_label(*key) if key[0] is not None else None
+            for key in zip(
+                columns["symbol_set"],
+                columns["entity"],
+                columns["first_icon"],
+                columns["second_icon"],
+                columns["echelon_mobility"],
+            )
+        ]
+
+    def _get_label(self, symbol_set, entity, first_icon, second_icon, echelon):
+        key = (symbol_set, entity, first_icon, second_icon, echelon)
+        if key in self._labels:
+            return self._labels[key]
+
+        label = None
+        entity_labels = self.get_table_labels(symbol_set, "MainIcon")
+        if entity_labels is not None and entity_labels.get(entity):
+            values = {
+                "entity": entity,
+                "first_icon": first_icon,
+                "second_icon": second_icon,
+                "echelon_mobility": echelon,
+            }
+            parts = []
+            for field, table_name in LABEL_TABLES:
+                text = (self.get_table_labels(symbol_set, table_name) or {}).get(
+                    values[field]
+                )
+                if text:
+                    parts.append(text)
+            label = ", ".join(parts)
+
+        self._labels[key] = label
+        return label
@@ -32,6 +32,7 @@ class Translator:
         if not Translator._initialized:
             self._x_context = x_context
             self._resource_cache = {}
+            self._strings_cache = {}
             Translator._initialized = True
 
     def get_locale(self):
@@ -82,6 +83,33 @@ class Translator:
 
         return x_resources
 
+    def get_locale_tag(self):
+        """Get locale as a language tag like "en-US", empty if unknown"""
+        locale = self.get_locale()
+        if locale is None:
+            return ""
+        return "-".join(part for part in (locale.Language, locale.Country) if part)
+
+    def get_strings(self, dialog_name="Strings"):
+        """Get all translated strings of a resource file as {key: string}"""
+        # Keyed like the SymbolLabelIndex instances built from the strings
+        cache_key = (self.get_locale_tag(), dialog_name)
+        strings = self._strings_cache.get(cache_key)
+        if strings is not None:
+            return strings
+
+        strings = {}
+        x_resources = self.get_string_resource(dialog_name)
+        if x_resources is not None:
+            try:
+                for resource_id in x_resources.getResourceIDs():
+                    strings[resource_id] = x_resources.resolveString(resource_id)
+            except Exception as ex:
+                print(f"Error reading strings of {dialog_name}: {ex}")
+
+        self._strings_cache[cache_key] = strings
+        return strings
+
     def translate(self, key, dialog_name="Strings"):
         """
         Get translated string from resource file
@@ -0,0 +1,135 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Memory bounded log of ORBAT undo actions
+
+The document undo manager owns the undo actions, the log keeps track of
+the ones registered by the extension to release their data. Actions
+refer to shapes by name and store attribute diffs instead of snapshots,
+and report the approximate size of their data with get_size().
+
+When the log exceeds its memory budget, the payloads of the oldest actions
+are released. Their steps stay on the undo stack, next to the steps of
+other edits of the document, as no-ops titled TRUNCATED_TITLE; the undo
+manager itself is never cleared.
+"""
+
+import sys
+
+from collections import deque
+
+# Title of the undo steps whose payload was released
+TRUNCATED_TITLE = "Undo history truncated"
+
+
+def estimate_size(data):
+    """Approximate number of bytes held by plain data
+
+    Counts strings, numbers, containers and the attributes of plain
+    objects like ClipboardItem, shared objects are counted once.
+    """
+    size = 0
+    seen = set()
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if item is None or id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__") and not isinstance(item, type):
+            stack.extend(vars(item).values())
+    return size
+
+
+def diff_attributes(original, edited):
+    """Get {name: (original value, edited value)} of the changed attributes
+
+    A value is None on the side where the attribute does not exist.
+    """
+    changes = {}
+    for name in original.keys() | edited.keys():
+        old_value = original.get(name)
+        new_value = edited.get(name)
+        if old_value != new_value:
+            changes[name] = (old_value, new_value)
+    return changes
+
+
+def apply_attribute_diff(attributes, changes, side):
+    """Get attributes with one side (0 original, 1 edited) of changes applied"""
+    result = dict(attributes)
+    for name, values in changes.items():
+        value = values[side]
+        if value is None:
+            result.pop(name, None)
+        else:
+            result[name] = value
+    return result
+
+
+class UndoLog:
+    """Registered undo actions, released oldest first beyond a memory budget"""
+
+    DEFAULT_MAX_BYTES = 1024 * 1024
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self._max_bytes = max_bytes
+        # (action, size) in registration order
+        self._entries = deque()
+        self._total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_total_bytes(self):
+        return self._total_bytes
+
+    def set_max_bytes(self, max_bytes):
+        """Change the memory budget, releasing actions that no longer fit"""
+        self._max_bytes = max_bytes
+        self._evict()
+
+    def add(self, undo_manager, action):
+        """Register an action with the undo manager and track its size"""
+        undo_manager.addUndoAction(action)
+        size = action.get_size()
+        self._entries.append((action, size))
+        self._total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        """Release the oldest actions until the log fits its budget
+
+        The newest action is always kept, so the last step can be undone.
+        """
+        while self._total_bytes > self._max_bytes and len(self._entries) > 1:
+            action, size = self._entries.popleft()
+            self._total_bytes -= size
+            self._release(action)
+            action.Title = TRUNCATED_TITLE
+
+    def clear(self):
+        """Release all actions, e.g. before the document is closed"""
+        while self._entries:
+            action, _size = self._entries.popleft()
+            self._release(action)
+        self._total_bytes = 0
+
+    @staticmethod
+    def _release(action):
+        try:
+            action.clear_references()
+        except Exception as e:
+            print(f"Error clearing undo action references: {e}")
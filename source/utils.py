@@ -6,6 +6,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import json
 import os
 import xml.etree.ElementTree as ET
 
@@ -13,6 +14,7 @@ import uno
 
 from com.sun.star.awt import Point, Size
 from com.sun.star.beans import NamedValue, PropertyValue
+from com.sun.star.beans.PropertyAttribute import REMOVEABLE
 from com.sun.star.xml import AttributeData
 
 
@@ -89,6 +91,73 @@ def is_orbat_feature_enabled(ctx):
     return default_state
 
 
+# Document user-defined property listing the ORBAT diagrams of the document
+ORBAT_MARKER_PROPERTY = "MilSymOrbatDiagrams"
+
+
+def get_orbat_marker(model):
+    """Get the ids of the ORBAT diagrams recorded in the document properties.
+
+    Returns a set of diagram ids (as strings), empty for documents known to
+    have no diagrams, or None if the document has no marker and has to be
+    scanned for diagrams
+    """
+    try:
+        user_props = model.getDocumentProperties().getUserDefinedProperties()
+        if not user_props.getPropertySetInfo().hasPropertyByName(
+            ORBAT_MARKER_PROPERTY
+        ):
+            return None
+        # Older markers map the ids to page indexes
+        return {
+            str(diagram_id)
+            for diagram_id in json.loads(
+                user_props.getPropertyValue(ORBAT_MARKER_PROPERTY)
+            )
+        }
+    except Exception as e:
+        print(f"Warning: Could not read ORBAT marker: {e}")
+        return None
+
+
+def set_orbat_marker(model, diagrams):
+    """Record the ORBAT diagram ids of the document in the document properties
+
+    An empty marker is kept, it records that the document has no diagrams.
+    """
+    try:
+        user_props = model.getDocumentProperties().getUserDefinedProperties()
+        value = json.dumps(sorted(diagrams))
+        if user_props.getPropertySetInfo().hasPropertyByName(ORBAT_MARKER_PROPERTY):
+            user_props.setPropertyValue(ORBAT_MARKER_PROPERTY, value)
+        else:
+            user_props.addProperty(ORBAT_MARKER_PROPERTY, REMOVEABLE, value)
+    except Exception as e:
+        print(f"Warning: Could not write ORBAT marker: {e}")
+
+
+def get_orbat_diagram_id(shape_name):
+    """Get the diagram id of a shape named like "OrbatDiagram3-GroupShape" """
+    diagram_name = shape_name.split("-", 1)[0]
+    return int("".join(c for c in diagram_name if c.isdigit()) or "0")
+
+
+def register_orbat_diagram(model, diagram_id):
+    """Add a diagram to the ORBAT marker of the document"""
+    diagrams = get_orbat_marker(model) or set()
+    if str(diagram_id) not in diagrams:
+        diagrams.add(str(diagram_id))
+        set_orbat_marker(model, diagrams)
+
+
+def unregister_orbat_diagram(model, diagram_id):
+    """Remove a diagram from the ORBAT marker of the document"""
+    diagrams = get_orbat_marker(model)
+    if diagrams is not None and str(diagram_id) in diagrams:
+        diagrams.discard(str(diagram_id))
+        set_orbat_marker(model, diagrams)
+
+
 def parse_svg_dimensions(svg_data, scale_factor=1):
     """Parse SVG dimensions and return width and height in 1/100mm units.
 
@@ -253,6 +322,33 @@ def insertGraphicAttributes(shape, params):
     shape.setPropertyValue("UserDefinedAttributes", attributeHash)
 
 
+# Symbol attributes passed to the renderer, as (attribute, option name)
+ICON_RENDER_OPTIONS = (
+    ("MilSymStack", "stack"),
+    ("MilSymReinforced", "reinforced"),
+    ("MilSymStaff", "staff"),
+    ("MilSymSpecialheadquarters", "specialheadquarters"),
+    ("MilSymCountrycode", "countrycode"),
+)
+
+
+def get_icon_render_args(attributes, size):
+    """Get the arguments rendering an icon of the symbol attributes
+
+    Returns:
+        [sidc, (option name, value), ...] or None if there is no symbol code
+    """
+    sidc_code = attributes.get("MilSymCode")
+    if not sidc_code:
+        return None
+
+    args = [sidc_code, ("size", size)]
+    for attribute, option in ICON_RENDER_OPTIONS:
+        if attribute in attributes:
+            args.append((option, attributes[attribute]))
+    return args
+
+
 def generate_icon_svg(script, attributes, size):
     """Generate SVG icon from symbol attributes
 
@@ -263,30 +359,12 @@ def generate_icon_svg(script, attributes, size):
         SVG string data or None if generation fails
     """
     try:
-        sidc_code = attributes.get("MilSymCode")
-        if not sidc_code:
+        render_args = get_icon_render_args(attributes, size)
+        if render_args is None:
             return None
 
-        args = [sidc_code, NamedValue("size", size)]
-
-        if "MilSymStack" in attributes:
-            args.append(NamedValue("stack", attributes["MilSymStack"]))
-
-        if "MilSymReinforced" in attributes:
-            args.append(NamedValue("reinforced", attributes["MilSymReinforced"]))
-
-        if "MilSymStaff" in attributes:
-            args.append(NamedValue("staff", attributes["MilSymStaff"]))
-
-        if "MilSymSpecialheadquarters" in attributes:
-            args.append(
-                NamedValue(
-                    "specialheadquarters", attributes["MilSymSpecialheadquarters"]
-                )
-            )
-
-        if "MilSymCountrycode" in attributes:
-            args.append(NamedValue("countrycode", attributes["MilSymCountrycode"]))
+        args = [render_args[0]]
+        args.extend(NamedValue(name, value) for name, value in render_args[1:])
 
         result = script.invoke(args, (), ())
         svg_data = str(result[0])
@@ -297,6 +375,41 @@ def generate_icon_svg(script, attributes, size):
         return None
 
 
+def render_icon_svgs(script, render_args_list):
+    """Render many icons with one script invocation
+
+    Args:
+        render_args_list: List of arguments from get_icon_render_args
+
+    Returns:
+        List of SVG string data, None for the icons that failed
+    """
+    if not render_args_list:
+        return []
+
+    try:
+        requests = [[args[0], dict(args[1:])] for args in render_args_list]
+        result = script.invoke(["batch", json.dumps(requests)], (), ())
+        svgs = json.loads(str(result[0]))
+        if isinstance(svgs, list) and len(svgs) == len(render_args_list):
+            return [svg_data or None for svg_data in svgs]
+    except Exception as e:
+        print(f"Error rendering icon batch, rendering one by one: {e}")
+
+    # Scripts without batch support render one icon per invocation
+    svgs = []
+    for args in render_args_list:
+        try:
+            invoke_args = [args[0]]
+            invoke_args.extend(NamedValue(name, value) for name, value in args[1:])
+            result = script.invoke(invoke_args, (), ())
+            svgs.append(str(result[0]) or None)
+        except Exception as e:
+            print(f"Error generating icon SVG: {e}")
+            svgs.append(None)
+    return svgs
+
+
 def create_graphic_from_svg(ctx, svg_data):
     """Create XGraphic from SVG data"""
     try:
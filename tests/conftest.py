@@ -0,0 +1,21 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Unit tests of the modules that do not need a running office
+
+LibreOffice puts the source directory of the extension on sys.path, so the
+modules import each other by absolute names. The tests do the same.
+"""
+
+import os
+import sys
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "source")
+if SOURCE_DIR not in sys.path:
+    sys.path.insert(0, SOURCE_DIR)
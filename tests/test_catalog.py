@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import pickle
+
+import pytest
+
+from data import catalog
+
+
+@pytest.fixture
+def catalog_dir(tmp_path, monkeypatch):
+    """Point the catalog at an empty artifact directory"""
+    monkeypatch.setattr(catalog, "CATALOG_DIR", str(tmp_path))
+    catalog.clear_cache()
+    yield tmp_path
+    catalog.clear_cache()
+
+
+def write_index(directory, index):
+    with open(os.path.join(directory, catalog.INDEX_FILE), "wb") as f:
+        pickle.dump(index, f, protocol=catalog.PICKLE_PROTOCOL)
+
+
+def test_compiled_artifacts_are_used(catalog_dir):
+    count = catalog.compile_catalog(str(catalog_dir))
+    catalog.clear_cache()
+
+    index = catalog.get_index()
+    assert index["source_digest"] == catalog._get_source_digest()
+    assert len(catalog.get_symbol_set_ids()) == count
+    set_id = catalog.get_symbol_set_ids()[0]
+    with open(os.path.join(catalog_dir, f"{set_id}.pickle"), "rb") as f:
+        assert catalog.load_symbol_set(set_id) == pickle.load(f)
+
+
+def test_missing_artifacts_fall_back_to_source(catalog_dir):
+    index = catalog.get_index()
+
+    assert index["source_digest"] is None
+    assert index["set_ids"]
+    assert catalog.VERSION == index["version"]
+
+
+def test_stale_index_falls_back_to_source(catalog_dir):
+    catalog.compile_catalog(str(catalog_dir))
+    index = catalog._build_index_from_source()
+    index["source_digest"] = "0" * 40
+    index["set_ids"] = ["STALE"]
+    write_index(catalog_dir, index)
+    catalog.clear_cache()
+
+    assert catalog.get_index()["source_digest"] is None
+    assert "STALE" not in catalog.get_symbol_set_ids()
+
+
+def test_index_without_lookups_falls_back_to_source(catalog_dir):
+    write_index(
+        catalog_dir, {"source_digest": catalog._get_source_digest(), "set_ids": []}
+    )
+
+    assert catalog.get_index()["source_digest"] is None
+
+
+def test_corrupt_index_falls_back_to_source(catalog_dir):
+    with open(os.path.join(catalog_dir, catalog.INDEX_FILE), "wb") as f:
+        f.write(b"not a pickle")
+
+    assert catalog.get_index()["source_digest"] is None
+
+
+def test_missing_symbol_set_artifact_falls_back_to_source(catalog_dir):
+    catalog.compile_catalog(str(catalog_dir))
+    set_id = catalog.get_symbol_set_ids()[0]
+    os.remove(os.path.join(catalog_dir, f"{set_id}.pickle"))
+    catalog.clear_cache()
+
+    from data import symbols_data
+
+    assert catalog.load_symbol_set(set_id) == symbols_data.SYMBOL_DETAILS[set_id]
+
+
+def test_value_lookup_keeps_first_entry():
+    items = [
+        {"value": "01", "label": "First", "img": "a.svg"},
+        {"value": "02", "label": "Second"},
+        {"value": "01", "label": "Duplicate"},
+    ]
+
+    assert catalog.build_value_lookup(items) == {
+        "01": (0, "First", "a.svg"),
+        "02": (1, "Second", None),
+    }
+
+
+def test_symbol_details_is_keyed_by_set_id(catalog_dir):
+    set_ids = catalog.get_symbol_set_ids()
+
+    assert list(catalog.SYMBOL_DETAILS) == set_ids
+    assert "MainIcon" in catalog.SYMBOL_DETAILS[set_ids[0]]
+    with pytest.raises(KeyError):
+        catalog.SYMBOL_DETAILS["UNKNOWN"]
@@ -0,0 +1,121 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from favorites_index import (
+    FavoritesIndex,
+    get_search_text,
+    matching_words,
+    split_words,
+)
+from favorites_store import FavoritesStore
+
+sqlite3 = pytest.importorskip("sqlite3")
+
+CATEGORIES = {
+    "Infantry": [
+        {"name": "Rifle Platoon", "params": {"sidc": "130310001412110000", "a": "1"}},
+        {"name": "HQ Company", "params": {"sidc": "130310001012110000"}},
+    ],
+    "Armor": [
+        {"name": "Tank-Platoon", "params": {"sidc": "130310001412050000"}},
+        {"name": "Recon", "params": {"sidc": "1303", "unique": "Bravo Two"}},
+    ],
+}
+
+QUERIES = [
+    "platoon",
+    "PLA",
+    "tank platoon",
+    "infantry hq",
+    "13031000141",
+    "bravo",
+    "armor recon",
+    "armor rifle",
+    "missing",
+]
+
+
+def search_linearly(categories, query_words):
+    return {
+        (category_name, entry["name"])
+        for category_name, entries in categories.items()
+        for entry in entries
+        if matching_words(query_words, get_search_text(category_name, entry))
+    }
+
+
+def open_index(tmp_path, fts_module):
+    connection = sqlite3.connect(str(tmp_path / "index.sqlite"))
+    index = FavoritesIndex(connection, fts_module)
+    try:
+        index._create_tables()
+    except sqlite3.Error:
+        connection.close()
+        pytest.skip(f"SQLite has no {fts_module}")
+    return index
+
+
+@pytest.fixture(params=["fts5", "fts4"])
+def index(request, tmp_path):
+    index = open_index(tmp_path, request.param)
+    yield index
+    index.close()
+
+
+def test_split_words():
+    assert split_words("Tank-Platoon  HQ_2") == ["tank", "platoon", "hq_2"]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_index_matches_linear_search(index, query):
+    index.rebuild(CATEGORIES, "1")
+    query_words = split_words(query)
+
+    assert index.search(query_words) == search_linearly(CATEGORIES, query_words)
+
+
+def test_update_replaces_entries(index):
+    index.rebuild(CATEGORIES, "1")
+    renamed = {"name": "Scout", "params": {"sidc": "1303"}}
+
+    index.update([("Armor", "Recon")], [("Armor", renamed)], "2")
+
+    assert index.search(["recon"]) == set()
+    assert index.search(["scout"]) == {("Armor", "Scout")}
+    assert index.is_current("2")
+    assert not index.is_current("1")
+
+
+def test_other_fts_module_rebuilds_tables(tmp_path):
+    index = open_index(tmp_path, "fts5")
+    index.rebuild(CATEGORIES, "1")
+    index.close()
+
+    index = open_index(tmp_path, "fts4")
+    try:
+        assert not index.is_current("1")
+        assert index.search(["platoon"]) == set()
+    finally:
+        index.close()
+
+
+@pytest.mark.parametrize("query", QUERIES + [""])
+def test_store_search_without_index_matches_index(tmp_path, query):
+    store = FavoritesStore(str(tmp_path))
+    for category_name, entries in CATEGORIES.items():
+        for entry in entries:
+            store.add_symbol(category_name, entry["name"], entry["params"], "<svg/>")
+
+    assert store._index is not None
+    indexed = store.search(query)
+    store._drop_index(RuntimeError("test"))
+
+    assert store._index is None
+    assert store.search(query) == indexed
@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import json
+import os
+
+import pytest
+
+from favorites_store import (
+    MANIFEST_FILE,
+    FavoritesStore,
+    _diff_entries,
+    _make_entry,
+)
+
+SVG = "<svg/>"
+
+
+def make_entries(*names, sidc="1"):
+    return [_make_entry("C", name, {"sidc": sidc}) for name in names]
+
+
+def apply_changes(entries, changes):
+    """Apply changes the way a sidebar tree does"""
+    entries = list(entries)
+    for change in changes:
+        if change[0] == "remove":
+            entries = [entry for entry in entries if entry["name"] != change[2]]
+        elif change[0] == "update":
+            index = [entry["name"] for entry in entries].index(change[2]["name"])
+            entries[index] = change[2]
+        elif change[0] == "insert":
+            entries.insert(change[2], change[3])
+    return entries
+
+
+@pytest.mark.parametrize(
+    "old_names, new_names",
+    [
+        ((), ("A", "B")),
+        (("A", "B"), ()),
+        (("A", "B", "C"), ("A", "C")),
+        (("A", "C"), ("A", "B", "C", "D")),
+        (("A", "B", "C"), ("C", "A", "B")),
+        (("A", "B"), ("X", "B", "Y")),
+    ],
+)
+def test_diff_entries_replays_to_new_entries(old_names, new_names):
+    old_entries = make_entries(*old_names)
+    new_entries = make_entries(*new_names)
+
+    changes = _diff_entries("C", old_entries, new_entries)
+
+    assert apply_changes(old_entries, changes) == new_entries
+
+
+def test_diff_entries_updates_changed_symbols_in_place():
+    old_entries = make_entries("A", "B")
+    new_entries = [old_entries[0], _make_entry("C", "B", {"sidc": "2"})]
+
+    assert _diff_entries("C", old_entries, new_entries) == [
+        ("update", "C", new_entries[1])
+    ]
+
+
+def test_diff_entries_of_equal_entries_is_empty():
+    assert _diff_entries("C", make_entries("A", "B"), make_entries("A", "B")) == []
+
+
+def write_legacy(directory, category, name, params, svg=SVG):
+    category_path = os.path.join(directory, category)
+    os.makedirs(category_path, exist_ok=True)
+    with open(os.path.join(category_path, name + ".json"), "w") as f:
+        json.dump(params, f)
+    with open(os.path.join(category_path, name + ".svg"), "w") as f:
+        f.write(svg)
+
+
+def test_legacy_favorites_are_migrated_in_order(tmp_path):
+    write_legacy(tmp_path, "Units", "Second", {"sidc": "2", "order_index": 2})
+    write_legacy(tmp_path, "Units", "First", {"sidc": "1", "order_index": 1})
+
+    store = FavoritesStore(str(tmp_path))
+
+    assert [entry["name"] for entry in store.get_symbols("Units")] == [
+        "First",
+        "Second",
+    ]
+    assert store.get_symbol("Units", "First")["params"] == {"sidc": "1"}
+    with open(tmp_path / MANIFEST_FILE) as f:
+        manifest = json.load(f)
+    assert [entry["name"] for entry in manifest["categories"]["Units"]] == [
+        "First",
+        "Second",
+    ]
+
+
+def test_legacy_files_added_later_are_picked_up(tmp_path):
+    write_legacy(tmp_path, "Units", "First", {"sidc": "1"})
+    FavoritesStore(str(tmp_path)).load()
+    write_legacy(tmp_path, "Units", "Later", {"sidc": "3"})
+
+    store = FavoritesStore(str(tmp_path))
+
+    assert [entry["name"] for entry in store.get_symbols("Units")] == [
+        "First",
+        "Later",
+    ]
+
+
+def test_removed_legacy_symbol_is_not_migrated_again(tmp_path):
+    write_legacy(tmp_path, "Units", "First", {"sidc": "1"})
+    write_legacy(tmp_path, "Units", "Second", {"sidc": "2"})
+    store = FavoritesStore(str(tmp_path))
+
+    assert store.remove_symbol("Units", "First")
+
+    assert not os.path.exists(tmp_path / "Units" / "First.json")
+    assert not FavoritesStore(str(tmp_path)).has_symbol("Units", "First")
+
+
+def test_renamed_legacy_symbol_keeps_its_file(tmp_path):
+    write_legacy(tmp_path, "Units", "Old", {"sidc": "1"})
+    store = FavoritesStore(str(tmp_path))
+
+    store.rename_symbol("Units", "Old", "New")
+
+    assert os.path.exists(tmp_path / "Units" / "New.json")
+    assert os.path.exists(tmp_path / "Units" / "New.svg")
+    assert FavoritesStore(str(tmp_path)).get_symbol_names("Units") == {"New"}
+
+
+def test_changes_of_another_store_are_merged(tmp_path):
+    first = FavoritesStore(str(tmp_path))
+    second = FavoritesStore(str(tmp_path))
+    first.add_symbol("Units", "A", {"sidc": "1"}, SVG)
+    second.load()
+    first.add_symbol("Units", "B", {"sidc": "2"}, SVG)
+
+    changes = []
+    second.add_listener(changes.append)
+    second.add_symbol("Units", "C", {"sidc": "3"}, SVG)
+
+    assert [entry["name"] for entry in second.get_symbols("Units")] == [
+        "A",
+        "B",
+        "C",
+    ]
+    assert changes == [
+        [("insert", "Units", 1, first.get_symbol("Units", "B"))],
+        [("insert", "Units", 2, second.get_symbol("Units", "C"))],
+    ]
+    first.load(reload=True)
+    assert first.get_symbol_names("Units") == {"A", "B", "C"}
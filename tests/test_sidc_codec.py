@@ -0,0 +1,111 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from data import sidc_codec
+
+# Friendly land unit, infantry, with both icon modifiers and a country
+VALID_SIDC = "130310000012110001021000000276"
+
+
+def test_decode_splits_fields():
+    sidc = sidc_codec.decode(VALID_SIDC)
+
+    assert sidc.version == "13"
+    assert sidc.affiliation == "3"
+    assert sidc.symbol_set == "10"
+    assert sidc.entity == "121100"
+    assert sidc.modifier1 == "01"
+    assert sidc.modifier2 == "02"
+    assert sidc.first_icon == "101"
+    assert sidc.second_icon == "002"
+    assert sidc.country == "276"
+
+
+def test_encode_round_trips():
+    assert sidc_codec.encode(sidc_codec.decode(VALID_SIDC)) == VALID_SIDC
+    assert sidc_codec.decode(VALID_SIDC).to_string() == VALID_SIDC
+
+
+def test_short_codes_are_padded():
+    sidc = sidc_codec.decode(VALID_SIDC[:20])
+
+    assert sidc.to_string() == VALID_SIDC[:20] + "0" * 10
+    assert sidc.country == "000"
+
+
+@pytest.mark.parametrize(
+    "code", [None, 130310, "", "1303100000", "13031000001211000102x", "1" * 31]
+)
+def test_malformed_codes(code):
+    assert not sidc_codec.is_well_formed(code)
+    with pytest.raises(ValueError):
+        sidc_codec.decode(code)
+    assert sidc_codec.validate(code) == [sidc_codec.FORMAT_ERROR]
+
+
+def test_sidc_fields_default_to_zeros():
+    sidc = sidc_codec.Sidc(symbol_set="10", first_icon="123")
+
+    assert sidc.to_string() == "0000100000000000" + "2300" + "10" + "0" * 8
+    assert sidc.modifier1_sector == "1"
+    assert sidc.modifier1 == "23"
+
+
+def test_sidc_rejects_unknown_fields():
+    with pytest.raises(TypeError):
+        sidc_codec.Sidc(unknown="1")
+
+
+def test_encode_rejects_wrong_field_length():
+    sidc = sidc_codec.decode(VALID_SIDC)
+    sidc.entity = "12"
+
+    with pytest.raises(ValueError):
+        sidc_codec.encode(sidc)
+
+
+def test_sidc_equality():
+    assert sidc_codec.decode(VALID_SIDC) == sidc_codec.decode(VALID_SIDC)
+    assert sidc_codec.decode(VALID_SIDC) != sidc_codec.decode(VALID_SIDC[:20])
+
+
+def test_valid_code_has_no_errors():
+    assert sidc_codec.validate(VALID_SIDC[:20]) == []
+
+
+@pytest.mark.parametrize(
+    "offset, digits, field",
+    [
+        (0, "99", "version"),
+        (3, "9", "affiliation"),
+        (4, "99", "symbol_set"),
+        (10, "999999", "entity"),
+    ],
+)
+def test_unknown_values_are_reported(offset, digits, field):
+    code = VALID_SIDC[:offset] + digits + VALID_SIDC[offset + len(digits) :]
+
+    assert field in sidc_codec.validate(code)
+
+
+def test_validate_many_reports_invalid_codes_only():
+    codes = [VALID_SIDC[:20], "123", VALID_SIDC[:10] + "999999" + VALID_SIDC[16:20]]
+
+    assert sidc_codec.validate_many(codes) == {
+        1: [sidc_codec.FORMAT_ERROR],
+        2: ["entity"],
+    }
+
+
+def test_decode_many_has_none_for_malformed_codes():
+    columns = sidc_codec.decode_many([VALID_SIDC, "x"])
+
+    assert columns["entity"] == ["121100", None]
+    assert columns["first_icon"] == ["101", None]
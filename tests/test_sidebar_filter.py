@@ -0,0 +1,206 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from favorites_store import FavoritesStore
+from sidebar_filter import FavoritesTreeFilter
+
+SVG = "<svg/>"
+
+
+class FakeNode:
+    """Tree node with the XMutableTreeNode methods used by the filter"""
+
+    def __init__(self, name):
+        self.name = name
+        self.children = []
+
+    def appendChild(self, node):
+        self.children.append(node)
+
+    def insertChildByIndex(self, index, node):
+        self.children.insert(index, node)
+
+    def removeChildByIndex(self, index):
+        del self.children[index]
+
+
+class FakeNodeFactory:
+    def create_category_node(self, category_name):
+        return FakeNode(category_name)
+
+    def create_symbol_node(self, category_name, entry):
+        return FakeNode(entry["name"])
+
+    def update_symbol_node(self, node, category_name, entry):
+        node.name = entry["name"]
+
+
+class CountingStore(FavoritesStore):
+    searches = 0
+
+    def search(self, text):
+        self.searches += 1
+        return super().search(text)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CountingStore(str(tmp_path))
+    for category_name, symbol_name, params in [
+        ("Armor", "Tank Platoon", {"sidc": "10"}),
+        ("Armor", "Recon", {"sidc": "11"}),
+        ("Infantry", "Rifle Platoon", {"sidc": "20"}),
+        ("Infantry", "Rifle Squad", {"sidc": "21"}),
+    ]:
+        store.add_symbol(category_name, symbol_name, params, SVG)
+    return store
+
+
+@pytest.fixture
+def tree_filter(store):
+    """Filter of a tree built like the sidebar builds it"""
+    tree_filter = FavoritesTreeFilter(store, FakeNodeFactory())
+    root_node = FakeNode("Favorites")
+    categories = []
+    for category_name in store.get_category_names():
+        category_node = FakeNode(category_name)
+        root_node.appendChild(category_node)
+        symbols = []
+        for entry in store.get_symbols(category_name):
+            symbol_node = FakeNode(entry["name"])
+            category_node.appendChild(symbol_node)
+            symbols.append((entry["name"], symbol_node))
+        categories.append((category_name, category_node, symbols))
+    tree_filter.set_tree(root_node, categories)
+    store.add_listener(tree_filter.apply_changes)
+    return tree_filter
+
+
+def get_shown(tree_filter):
+    """Get {category: [symbol names]} of the attached nodes"""
+    return {
+        category_node.name: [node.name for node in category_node.children]
+        for category_node in tree_filter._root_node.children
+    }
+
+
+def test_filter_detaches_and_reattaches_nodes(tree_filter):
+    all_symbols = get_shown(tree_filter)
+
+    reattached = tree_filter.filter("platoon")
+    assert reattached == []
+    assert get_shown(tree_filter) == {
+        "Armor": ["Tank Platoon"],
+        "Infantry": ["Rifle Platoon"],
+    }
+
+    tree_filter.filter("recon")
+    assert get_shown(tree_filter) == {"Armor": ["Recon"]}
+
+    reattached = tree_filter.filter("")
+    assert get_shown(tree_filter) == all_symbols
+    assert [node.name for node in reattached] == ["Infantry"]
+
+
+def test_narrowing_filters_the_last_matches(store, tree_filter):
+    tree_filter.filter("ri")
+    searches = store.searches
+
+    tree_filter.filter("rif")
+    tree_filter.filter("rifle sq")
+
+    assert store.searches == searches
+    assert get_shown(tree_filter) == {"Infantry": ["Rifle Squad"]}
+
+    tree_filter.filter("tank")
+    assert store.searches == searches + 1
+
+
+def test_repeated_queries_are_cached(store, tree_filter):
+    tree_filter.filter("recon")
+    tree_filter.filter("tank")
+    searches = store.searches
+
+    tree_filter.filter("recon")
+
+    assert store.searches == searches
+    assert get_shown(tree_filter) == {"Armor": ["Recon"]}
+
+
+def test_inserted_symbols_follow_the_filter(store, tree_filter):
+    tree_filter.filter("platoon")
+
+    store.add_symbol("Armor", "Mortar Platoon", {"sidc": "12"}, SVG, index=0)
+    store.add_symbol("Armor", "Scout", {"sidc": "13"}, SVG)
+    store.add_symbol("Support", "Signal Platoon", {"sidc": "30"}, SVG)
+
+    assert get_shown(tree_filter) == {
+        "Armor": ["Mortar Platoon", "Tank Platoon"],
+        "Infantry": ["Rifle Platoon"],
+        "Support": ["Signal Platoon"],
+    }
+    assert tree_filter.get_node("Armor", "Scout").name == "Scout"
+    assert not tree_filter.is_shown("Armor", "Scout")
+
+    tree_filter.filter("")
+    assert get_shown(tree_filter)["Armor"] == [
+        "Mortar Platoon",
+        "Tank Platoon",
+        "Recon",
+        "Scout",
+    ]
+
+
+def test_renamed_symbols_follow_the_filter(store, tree_filter):
+    tree_filter.filter("platoon")
+
+    store.rename_symbol("Armor", "Tank Platoon", "Tank Company")
+    store.rename_symbol("Armor", "Recon", "Recon Platoon")
+
+    # Renames are applied to the current matches, not searched again
+    assert get_shown(tree_filter) == {
+        "Armor": ["Recon Platoon"],
+        "Infantry": ["Rifle Platoon"],
+    }
+
+
+def test_removing_the_last_shown_symbol_detaches_its_category(store, tree_filter):
+    tree_filter.filter("recon")
+
+    store.remove_symbol("Armor", "Recon")
+    assert get_shown(tree_filter) == {}
+
+    tree_filter.filter("")
+    assert get_shown(tree_filter) == {
+        "Armor": ["Tank Platoon"],
+        "Infantry": ["Rifle Platoon", "Rifle Squad"],
+    }
+
+    store.remove_symbol("Armor", "Tank Platoon")
+    assert get_shown(tree_filter) == {"Infantry": ["Rifle Platoon", "Rifle Squad"]}
+    assert tree_filter.is_current()
+
+
+def test_missed_changes_are_not_applied(store, tree_filter):
+    store.remove_listener(tree_filter.apply_changes)
+    store.remove_symbol("Armor", "Recon")
+    store.add_listener(tree_filter.apply_changes)
+
+    store.remove_symbol("Armor", "Tank Platoon")
+
+    assert not tree_filter.is_current()
+    assert get_shown(tree_filter)["Armor"] == ["Tank Platoon", "Recon"]
+
+
+def test_filter_before_set_tree_shows_nothing(store):
+    tree_filter = FavoritesTreeFilter(store, FakeNodeFactory())
+
+    assert tree_filter.filter("platoon") == []
+    assert not tree_filter.is_current()
@@ -0,0 +1,128 @@
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from undo_log import (
+    TRUNCATED_TITLE,
+    UndoLog,
+    apply_attribute_diff,
+    diff_attributes,
+    estimate_size,
+)
+
+
+class FakeUndoManager:
+    def __init__(self):
+        self.actions = []
+
+    def addUndoAction(self, action):
+        self.actions.append(action)
+
+
+class FakeAction:
+    def __init__(self, size, title="Edit"):
+        self.Title = title
+        self.size = size
+        self.cleared = False
+
+    def get_size(self):
+        return self.size
+
+    def clear_references(self):
+        self.cleared = True
+
+
+def test_actions_are_registered_and_counted():
+    undo_manager = FakeUndoManager()
+    log = UndoLog(max_bytes=100)
+    actions = [FakeAction(30), FakeAction(40)]
+    for action in actions:
+        log.add(undo_manager, action)
+
+    assert undo_manager.actions == actions
+    assert len(log) == 2
+    assert log.get_total_bytes() == 70
+    assert not any(action.cleared for action in actions)
+
+
+def test_oldest_actions_are_released_beyond_budget():
+    undo_manager = FakeUndoManager()
+    log = UndoLog(max_bytes=100)
+    actions = [FakeAction(40), FakeAction(40), FakeAction(40)]
+    for action in actions:
+        log.add(undo_manager, action)
+
+    assert len(log) == 2
+    assert log.get_total_bytes() == 80
+    assert actions[0].cleared and actions[0].Title == TRUNCATED_TITLE
+    assert not actions[1].cleared and actions[1].Title == "Edit"
+    # Released steps stay on the undo stack
+    assert undo_manager.actions == actions
+
+
+def test_newest_action_is_kept_even_if_too_large():
+    log = UndoLog(max_bytes=100)
+    small, large = FakeAction(10), FakeAction(500)
+    log.add(FakeUndoManager(), small)
+    log.add(FakeUndoManager(), large)
+
+    assert len(log) == 1
+    assert log.get_total_bytes() == 500
+    assert small.cleared and not large.cleared
+
+
+def test_lowering_the_budget_releases_actions():
+    log = UndoLog(max_bytes=100)
+    actions = [FakeAction(30), FakeAction(30), FakeAction(30)]
+    for action in actions:
+        log.add(FakeUndoManager(), action)
+
+    log.set_max_bytes(50)
+
+    assert len(log) == 1
+    assert log.get_total_bytes() == 30
+    assert [action.cleared for action in actions] == [True, True, False]
+
+
+def test_clear_releases_everything():
+    log = UndoLog()
+    actions = [FakeAction(10), FakeAction(20)]
+    for action in actions:
+        log.add(FakeUndoManager(), action)
+
+    log.clear()
+
+    assert len(log) == 0
+    assert log.get_total_bytes() == 0
+    assert all(action.cleared for action in actions)
+
+
+def test_estimate_size_counts_shared_objects_once():
+    text = "x" * 1000
+    single = estimate_size([text])
+
+    assert estimate_size([text, text]) < 2 * single
+    assert estimate_size({"a": text}) > len(text)
+
+
+def test_estimate_size_counts_object_attributes():
+    assert estimate_size(FakeAction("x" * 1000)) > 1000
+
+
+def test_attribute_diff_round_trips():
+    original = {"name": "A", "rank": "1", "removed": "x"}
+    edited = {"name": "B", "rank": "1", "added": "y"}
+
+    changes = diff_attributes(original, edited)
+
+    assert changes == {
+        "name": ("A", "B"),
+        "removed": ("x", None),
+        "added": (None, "y"),
+    }
+    assert apply_attribute_diff(original, changes, 1) == edited
+    assert apply_attribute_diff(edited, changes, 0) == original
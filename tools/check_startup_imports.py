@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Measure the import cost of the extension's startup module.
+
+source/main.py is loaded for every new office view (OnViewCreated job), so it
+must only pull in the listener and registry code. This script imports it with
+`python -X importtime`, prints the most expensive modules and fails if the
+total exceeds the budget or if a module that is meant to be loaded lazily
+was imported.
+
+Run it with the Python interpreter of the LibreOffice installation, so that
+`uno` and `officehelper` can be imported:
+
+    /usr/lib/libreoffice/program/python tools/check_startup_imports.py
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source")
+
+# Modules that must not be imported when main.py is loaded
+LAZY_MODULES = (
+    "data.symbols_data",
+    "data.catalog",
+    "data.country_data",
+    "symbol_dialog_handler",
+    "control_dialog",
+    "sidebar",
+    "smart.controller",
+    "translator",
+)
+
+DEFAULT_BUDGET_MS = 100.0
+
+
+def measure(module):
+    """Import module in a fresh interpreter and return {name: (self_us, cumulative_us)}"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [SOURCE_DIR, env.get("PYTHONPATH")])
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SOURCE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Importing {module} failed")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help=f"maximum cumulative import time of main (default {DEFAULT_BUDGET_MS})",
+    )
+    parser.add_argument(
+        "--top", type=int, default=15, help="number of modules to list"
+    )
+    args = parser.parse_args()
+
+    timings = measure("main")
+    total_ms = timings.get("main", (0, 0))[1] / 1000.0
+
+    print(f"{'self [ms]':>10} {'cumulative [ms]':>16}  module")
+    by_self = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (self_us, cumulative_us) in by_self[: args.top]:
+        print(f"{self_us / 1000.0:10.2f} {cumulative_us / 1000.0:16.2f}  {name}")
+    print(f"\nmain: {total_ms:.2f} ms (budget {args.budget_ms:.2f} ms)")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in timings]
+    if eager:
+        print("Imported at startup but meant to be lazy: " + ", ".join(eager))
+        failed = True
+    if total_ms > args.budget_ms:
+        print("Startup import budget exceeded")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
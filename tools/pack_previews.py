@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Pack the preview icons of the symbol dialog into one archive.
+
+The archive is an uncompressed zip of img/preview, the PNG files are already
+compressed and stored members can be read without inflating. Its central
+directory is the index used by source/preview_store.py. build.sh ships the
+archive instead of the loose files:
+
+    python3 tools/pack_previews.py img/preview build_temp/img/preview.zip
+"""
+
+import argparse
+import os
+import sys
+import zipfile
+
+# Fixed member time, so packing the same files gives the same archive
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def pack_previews(preview_dir, pack_path):
+    """Write all files below preview_dir to pack_path, return their count"""
+    paths = []
+    for dir_path, dir_names, file_names in os.walk(preview_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.startswith("."):
+                continue
+            path = os.path.join(dir_path, file_name)
+            paths.append(os.path.relpath(path, preview_dir))
+
+    os.makedirs(os.path.dirname(os.path.abspath(pack_path)), exist_ok=True)
+    tmp_path = pack_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as pack:
+        for relative_path in paths:
+            info = zipfile.ZipInfo(relative_path.replace(os.sep, "/"), ZIP_DATE_TIME)
+            with open(os.path.join(preview_dir, relative_path), "rb") as f:
+                pack.writestr(info, f.read())
+    os.replace(tmp_path, pack_path)
+    return len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("preview_dir", help="directory of the preview icons")
+    parser.add_argument("pack_path", help="archive to write")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.preview_dir):
+        print(f"No preview directory: {args.preview_dir}", file=sys.stderr)
+        return 1
+
+    count = pack_previews(args.preview_dir, args.pack_path)
+    size = os.path.getsize(args.pack_path)
+    print(f"Packed {count} previews into {args.pack_path} ({size // 1024} KiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+
+# SPDX-FileCopyrightText: Collabora Productivity and contributors
+#
+# SPDX-License-Identifier: MPL-2.0
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Render the preview icons of the symbol dialog with the bundled milsymbol.
+
+Every entry of the catalog in source/data/symbols_data.py gets the preview
+named by its "img": the symbol sets, the main icons, icon modifiers,
+echelons and headquarters of every symbol set, and the country flags. The
+previews are rendered by milsymbol/milsymbol.js, the renderer combine.sh
+builds for the extension, so they cannot drift from the symbols the
+extension inserts.
+
+The previews are written to preview_cache, which is ignored by git, the
+checked-in img/preview is only read: every preview gets the pixel size of
+its checked-in counterpart, or the most common size of its directory for
+new entries, so the dialog layout does not change.
+
+The renderer runs in node worker processes, one per CPU by default, with
+the batch mode of milsymbol.js. The SVGs are rasterized to PNG with
+rsvg-convert, which is checked on a test image first. preview_cache/
+.index.json records a digest of the renderer and the render arguments of
+every preview, only previews whose digest changed are rendered again, and
+previews of removed catalog entries are deleted.
+
+Run it after combine.sh, build.sh does when RENDER_PREVIEWS is set:
+
+    python3 tools/render_previews.py
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SOURCE_DIR = os.path.join(ROOT_DIR, "source")
+DEFAULT_RENDERER = os.path.join(ROOT_DIR, "milsymbol", "milsymbol.js")
+DEFAULT_OUTPUT_DIR = os.path.join(ROOT_DIR, "preview_cache")
+DEFAULT_REFERENCE_DIR = os.path.join(ROOT_DIR, "img", "preview")
+INDEX_FILE = ".index.json"
+
+# Change to render all previews again, e.g. after changing the options
+PREVIEW_FORMAT = 1
+PREVIEW_OPTIONS = {"size": "20"}
+# Friendly symbols, like the default of the dialog
+AFFILIATION = "3"
+# Previews rendered by one call of a worker
+BATCH_SIZE = 100
+# (width, height) of previews without checked-in counterpart in their directory
+DEFAULT_SIZE = (25, 25)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Rasterized by check_rasterizer(), wider than the target size on purpose
+TEST_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="40" height="20">'
+    '<rect width="40" height="20" fill="#80e0ff"/></svg>'
+)
+
+# Tree of the symbol dialog -> directory of its previews
+TABLE_DIRECTORIES = {
+    "MainIcon": "main_icon",
+    "FirstIconModifier": "first_icon",
+    "SecondIconModifier": "second_icon",
+    "EchelonMobility": "echelon_mobility",
+    "HeadquartersTaskforceDummy": "head_task_dummy",
+}
+
+# Table -> field of the SIDC set to the value of its entries
+TABLE_FIELDS = {
+    "MainIcon": "entity",
+    "FirstIconModifier": "first_icon",
+    "SecondIconModifier": "second_icon",
+    "EchelonMobility": "echelon_mobility",
+    "HeadquartersTaskforceDummy": "hq_tf_dummy",
+}
+
+# Renders JSON lines of [{"sidc", "options"} or {"flag"}] into JSON lines of
+# SVG lists. The renderer script is compiled once per worker.
+WORKER_SCRIPT = r"""
+const fs = require("fs");
+const readline = require("readline");
+const vm = require("vm");
+
+const script = new vm.Script(fs.readFileSync(process.argv[1], "utf8"));
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+    const jobs = JSON.parse(line);
+    const symbols = jobs
+        .filter((job) => job.sidc !== undefined)
+        .map((job) => [job.sidc, job.options]);
+    const context = vm.createContext({
+        ARGUMENTS: ["batch", JSON.stringify(symbols)],
+    });
+    const svgs = JSON.parse(script.runInContext(context));
+    const results = jobs.map((job) =>
+        job.sidc !== undefined ? svgs.shift() : context.COUNTRY_FLAGS[job.flag] || ""
+    );
+    process.stdout.write(JSON.stringify(results) + "\n");
+});
+"""
+
+
+def get_jobs():
+    """Get {preview path: render job} of every catalog entry with a preview"""
+    sys.path.insert(0, SOURCE_DIR)
+    from data import country_data, sidc_codec, symbols_data
+
+    jobs = {}
+    conflicts = []
+
+    def add(path, job):
+        if jobs.setdefault(path, job) != job:
+            conflicts.append(path)
+
+    def symbol_job(**fields):
+        sidc = sidc_codec.Sidc(version="10", affiliation=AFFILIATION, **fields)
+        return {"sidc": sidc_codec.encode(sidc), "options": PREVIEW_OPTIONS}
+
+    for symbol_set in symbols_data.SYMBOLS:
+        set_value = symbol_set["value"]
+        add(f"symbol_set/{symbol_set['img']}", symbol_job(symbol_set=set_value))
+
+        tables = symbols_data.SYMBOL_DETAILS.get(symbol_set["id"], {})
+        for table_name, items in tables.items():
+            directory = TABLE_DIRECTORIES.get(table_name)
+            if directory is None:
+                continue
+            for item in items:
+                if not item.get("img"):
+                    continue
+                path = f"{symbol_set['id'].lower()}/{directory}/{item['img']}"
+                fields = {TABLE_FIELDS[table_name]: item["value"]}
+                add(path, symbol_job(symbol_set=set_value, **fields))
+
+    for country in country_data.COUNTRY_CODES:
+        if country["value"]:
+            add(f"countries/{country['value']}.png", {"flag": country["value"]})
+
+    for path in conflicts:
+        print(f"Warning: {path} is used by entries with different symbols")
+    return jobs
+
+
+def get_digest(renderer_digest, job, size):
+    key = json.dumps([PREVIEW_FORMAT, renderer_digest, job, size], sort_keys=True)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def get_png_size(path):
+    """Get (width, height) of a PNG file, None if it is no PNG"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(24)
+    except OSError:
+        return None
+    if len(header) < 24 or not header.startswith(PNG_SIGNATURE):
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def get_sizes(reference_dir, paths):
+    """Get {path: (width, height)} matching the checked-in previews
+
+    A new preview gets the most common size of the checked-in previews of
+    its directory, DEFAULT_SIZE if there are none.
+    """
+    sizes = {}
+    directory_sizes = {}
+    for path in paths:
+        size = get_png_size(os.path.join(reference_dir, *path.split("/")))
+        if size is not None:
+            sizes[path] = size
+            counts = directory_sizes.setdefault(path.rsplit("/", 1)[0], {})
+            counts[size] = counts.get(size, 0) + 1
+
+    for path in paths:
+        if path not in sizes:
+            counts = directory_sizes.get(path.rsplit("/", 1)[0])
+            sizes[path] = max(counts, key=counts.get) if counts else DEFAULT_SIZE
+    return sizes
+
+
+def read_index(output_dir):
+    try:
+        with open(os.path.join(output_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("previews", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def write_index(output_dir, previews):
+    path = os.path.join(output_dir, INDEX_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"format": PREVIEW_FORMAT, "previews": previews}, f, indent=1)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+class Worker:
+    """A node process rendering batches of previews"""
+
+    def __init__(self, renderer):
+        self._process = subprocess.Popen(
+            ["node", "-e", WORKER_SCRIPT, renderer],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+        )
+
+    def render(self, jobs):
+        """Get the SVG of every job, "" for unknown flags"""
+        self._process.stdin.write(json.dumps(jobs) + "\n")
+        self._process.stdin.flush()
+        line = self._process.stdout.readline()
+        if not line:
+            raise RuntimeError("Renderer process exited")
+        return json.loads(line)
+
+    def close(self):
+        self._process.stdin.close()
+        self._process.wait()
+
+
+def rasterize(rasterizer, svg_data, path, size):
+    """Write the PNG of svg_data, scaled to size (width, height), to path"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    width, height = size
+    subprocess.run(
+        [
+            rasterizer,
+            "--format",
+            "png",
+            "--width",
+            str(width),
+            "--height",
+            str(height),
+            "--output",
+            tmp_path,
+        ],
+        input=svg_data.encode("utf-8"),
+        check=True,
+    )
+    os.replace(tmp_path, path)
+
+
+def check_rasterizer(rasterizer):
+    """Get an error message if rasterizer does not write PNGs of the given size"""
+    size = (25, 21)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "test.png")
+        try:
+            rasterize(rasterizer, TEST_SVG, path, size)
+        except (OSError, subprocess.CalledProcessError) as e:
+            return f"{rasterizer} failed: {e}"
+        result = get_png_size(path)
+    if result != size:
+        return f"{rasterizer} wrote a {result} PNG instead of {size}"
+    return None
+
+
+def render_batch(workers, rasterizer, output_dir, batch):
+    """Render [(path, job, size, digest)] on a free worker, return {path: digest}"""
+    worker = workers.get()
+    try:
+        svgs = worker.render([job for _path, job, _size, _digest in batch])
+    finally:
+        workers.put(worker)
+
+    rendered = {}
+    for (path, _job, size, digest), svg_data in zip(batch, svgs):
+        if not svg_data:
+            print(f"Warning: nothing rendered for {path}")
+            continue
+        file_path = os.path.join(output_dir, *path.split("/"))
+        rasterize(rasterizer, svg_data, file_path, size)
+        rendered[path] = digest
+    return rendered
+
+
+def render_previews(
+    renderer, output_dir, reference_dir, rasterizer, worker_count, force=False
+):
+    """Render the changed previews, return (rendered, unchanged, removed) counts"""
+    with open(renderer, "rb") as f:
+        renderer_digest = hashlib.sha1(
+            f.read() + WORKER_SCRIPT.encode("utf-8")
+        ).hexdigest()
+
+    jobs = get_jobs()
+    sizes = get_sizes(reference_dir, jobs)
+    previous = {} if force else read_index(output_dir)
+    previews = {}
+    pending = []
+    for path, job in sorted(jobs.items()):
+        digest = get_digest(renderer_digest, job, sizes[path])
+        file_path = os.path.join(output_dir, *path.split("/"))
+        if previous.get(path) == digest and os.path.exists(file_path):
+            previews[path] = digest
+        else:
+            pending.append((path, job, sizes[path], digest))
+    unchanged = len(previews)
+
+    removed = 0
+    for path in previous:
+        if path not in jobs:
+            try:
+                os.remove(os.path.join(output_dir, *path.split("/")))
+                removed += 1
+            except FileNotFoundError:
+                pass
+
+    batches = [
+        pending[i : i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)
+    ]
+    worker_count = max(1, min(worker_count, len(batches)))
+    workers = queue.Queue()
+    for _i in range(worker_count):
+        workers.put(Worker(renderer))
+    try:
+        with concurrent.futures.ThreadPoolExecutor(worker_count) as executor:
+            futures = [
+                executor.submit(render_batch, workers, rasterizer, output_dir, batch)
+                for batch in batches
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                previews.update(future.result())
+    finally:
+        # Keep what was rendered, so an interrupted run resumes
+        os.makedirs(output_dir, exist_ok=True)
+        write_index(output_dir, previews)
+        while not workers.empty():
+            workers.get().close()
+
+    return len(previews) - unchanged, unchanged, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--renderer",
+        default=DEFAULT_RENDERER,
+        help="combined milsymbol.js (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_OUTPUT_DIR,
+        help="directory to render the previews to (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--reference",
+        default=DEFAULT_REFERENCE_DIR,
+        help="checked-in previews giving the sizes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--rasterizer",
+        default="rsvg-convert",
+        help="SVG to PNG converter (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="render all previews again"
+    )
+    args = parser.parse_args()
+
+    for program in ("node", args.rasterizer):
+        if shutil.which(program) is None:
+            print(f"{program} is required to render previews", file=sys.stderr)
+            return 1
+    if not os.path.exists(args.renderer):
+        print(f"No renderer {args.renderer}, run combine.sh first", file=sys.stderr)
+        return 1
+    error = check_rasterizer(args.rasterizer)
+    if error is not None:
+        print(error, file=sys.stderr)
+        return 1
+
+    rendered, unchanged, removed = render_previews(
+        args.renderer,
+        args.output,
+        args.reference,
+        args.rasterizer,
+        args.jobs,
+        args.force,
+    )
+    print(
+        f"Rendered {rendered} previews, {unchanged} unchanged, {removed} removed"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())